@@ -33,6 +33,61 @@ DEBUG = os.getenv('DJANGO_DEBUG', 'True').lower() == 'true'
 # URL base para enlaces públicos (certificados, verificación, etc.)
 BASE_URL = os.getenv('BASE_URL', 'http://localhost:8000')
 
+# Procesos para renderizar lotes de certificados en paralelo (1 = secuencial)
+LOTE_PROCESOS = int(os.getenv('LOTE_PROCESOS', '1'))
+
+# Motor de renderizado de certificados: 'plantilla_word' (DOCX + conversión)
+# o 'fondo_pdf' (campos estampados sobre media/plantillas/plantilla_certificadopdf.pdf)
+MOTOR_CERTIFICADO = os.getenv('MOTOR_CERTIFICADO', 'plantilla_word')
+
+# Cómo estampa el motor fondo_pdf el QR: 'vectorial' (trazados PDF nativos) o 'imagen' (PNG)
+QR_MODO = os.getenv('QR_MODO', 'vectorial')
+
+# Cargar al arrancar la plantilla, las fuentes y el motor de renderizado (AppConfig.ready).
+# Pensado para workers que generan certificados; con preload_app de gunicorn se hace una vez.
+CERTIFICADOS_PRECALENTAR = os.getenv('CERTIFICADOS_PRECALENTAR', 'False').lower() == 'true'
+
+# Carpeta con los TTF de Times New Roman (times.ttf, timesbd.ttf, ...) o Liberation Serif para los
+# PDFs armados con reportlab; además se buscan en fuentes/ y en las rutas de fuentes del sistema
+FUENTES_PDF_DIR = os.getenv('FUENTES_PDF_DIR', '')
+
+# Conversor DOCX → PDF: 'local' (docx2pdf o reportlab), 'libreoffice' (pool de unoserver)
+# o la ruta de una clase que herede de generador.conversion_utils.ConversorPDF
+CONVERSOR_PDF = os.getenv('CONVERSOR_PDF', 'local')
+LIBREOFFICE_INSTANCIAS = int(os.getenv('LIBREOFFICE_INSTANCIAS', '2'))
+LIBREOFFICE_COMANDO = os.getenv('LIBREOFFICE_COMANDO', 'unoserver')
+# Segundos de espera por cada conversión; una instancia que no responde se reemplaza
+LIBREOFFICE_TIMEOUT = int(os.getenv('LIBREOFFICE_TIMEOUT', '120'))
+
+# Espacio máximo en disco para los PDFs emitidos en media/certificados (0 = sin límite).
+# Al superarlo se eliminan los menos usados; se vuelven a renderizar cuando se piden.
+CERTIFICADOS_ALMACEN_LIMITE_MB = int(os.getenv('CERTIFICADOS_ALMACEN_LIMITE_MB', '1024'))
+
+# Caché de Django. Por defecto cada proceso (cada worker de gunicorn) tiene la suya en memoria;
+# con CACHE_URL=redis://host:6379/1 (requiere `pip install redis`) todos comparten la misma
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Segundos que la verificación pública guarda en caché (CACHES) un certificado
+# encontrado y una consulta de un ID inexistente; las consultas negativas sólo se
+# guardan con una caché compartida (CACHE_URL), ver verificacion_utils
+VERIFICACION_CACHE_SEGUNDOS = int(os.getenv('VERIFICACION_CACHE_SEGUNDOS', '300'))
+VERIFICACION_CACHE_NEGATIVA_SEGUNDOS = int(os.getenv('VERIFICACION_CACHE_NEGATIVA_SEGUNDOS', '60'))
+# Máximo de IDs por solicitud en la verificación masiva (/api/verificar/)
+VERIFICACION_LOTE_MAXIMO = int(os.getenv('VERIFICACION_LOTE_MAXIMO', '500'))
+
+# Máximo de certificados en una exportación a Excel: el XLSX se arma completo antes
+# de enviarse; las exportaciones más grandes deben hacerse en CSV (en streaming)
+EXPORTACION_XLSX_MAXIMO_FILAS = int(os.getenv('EXPORTACION_XLSX_MAXIMO_FILAS', '100000'))
+
+# Direcciones que pueden leer /metrics (histogramas por etapa en formato Prometheus)
+METRICAS_IPS_PERMITIDAS = [
+    ip.strip() for ip in os.getenv('METRICAS_IPS_PERMITIDAS', '127.0.0.1,::1').split(',') if ip.strip()
+]
+
 ALLOWED_HOSTS = [
     os.environ.get("RAILWAY_STATIC_URL", "web-production-0ffc.up.railway.app"),
     "localhost",
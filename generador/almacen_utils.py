@@ -0,0 +1,176 @@
+"""
+Almacén en disco de los PDFs emitidos, direccionado por contenido.
+Cada PDF se guarda como MEDIA_ROOT/certificados/<ab>/<cd>/<sha256>.pdf, así que
+los archivos idénticos se comparten. El almacén respeta un presupuesto de disco
+(settings.CERTIFICADOS_ALMACEN_LIMITE_MB) desalojando los menos usados; un PDF
+desalojado se vuelve a renderizar cuando se solicita.
+"""
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from django.conf import settings
+
+DIRECTORIO_ALMACEN = 'certificados'
+PATRON_RUTA_ALMACEN = re.compile(rf'^{DIRECTORIO_ALMACEN}/([0-9a-f]{{2}})/([0-9a-f]{{2}})/\1\2[0-9a-f]{{60}}\.pdf$')
+
+# Tras desalojar, el almacén queda por debajo de esta fracción del presupuesto
+# para no tener que recorrerlo de nuevo en la siguiente escritura
+FRACCION_TRAS_DESALOJO = 0.9
+
+# Cada proceso (p. ej. cada worker de gunicorn) vuelve a medir el almacén en disco
+# tras escribir esta fracción del presupuesto, así también cuenta lo que escribieron
+# los demás: entre N procesos el exceso queda acotado a N veces esta fracción
+FRACCION_RECUENTO = 0.05
+
+
+class AlmacenPDF:
+    """
+    Archivos PDF direccionados por su hash SHA-256 con escritura atómica
+    y desalojo LRU (la fecha de modificación se actualiza en cada lectura)
+    """
+
+    def __init__(self, raiz, limite_bytes=0):
+        self.raiz = raiz
+        self.limite_bytes = limite_bytes
+        self._uso = None
+        self._sin_recontar = 0
+        self._lock = threading.Lock()
+
+    def ruta_relativa(self, digest):
+        # Es la que se guarda en CertificadoGenerado.ruta_pdf, relativa a MEDIA_ROOT
+        return f'{DIRECTORIO_ALMACEN}/{digest[:2]}/{digest[2:4]}/{digest}.pdf'
+
+    def ruta_absoluta(self, ruta_relativa):
+        return os.path.join(os.path.dirname(self.raiz), *ruta_relativa.split('/'))
+
+    def es_ruta_del_almacen(self, ruta_relativa):
+        return bool(PATRON_RUTA_ALMACEN.match(ruta_relativa or ''))
+
+    def guardar(self, contenido):
+        """
+        Guarda el PDF y devuelve su ruta relativa a MEDIA_ROOT.
+        Si ya existe un archivo con el mismo contenido sólo se marca como usado.
+        """
+        digest = hashlib.sha256(contenido).hexdigest()
+        relativa = self.ruta_relativa(digest)
+        ruta = self.ruta_absoluta(relativa)
+
+        if self._marcar_uso(ruta):
+            return relativa
+
+        directorio = os.path.dirname(ruta)
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(contenido)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+        self._sumar_uso(len(contenido))
+        return relativa
+
+    def leer(self, ruta_relativa):
+        """
+        Contenido del PDF o None si no está en el almacén (nunca guardado o desalojado)
+        """
+        if not self.es_ruta_del_almacen(ruta_relativa):
+            return None
+        ruta = self.ruta_absoluta(ruta_relativa)
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+        except FileNotFoundError:
+            return None
+        self._marcar_uso(ruta)
+        return contenido
+
+    def _marcar_uso(self, ruta):
+        try:
+            os.utime(ruta, None)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _archivos(self):
+        for directorio, _, nombres in os.walk(self.raiz):
+            for nombre in nombres:
+                if not nombre.endswith('.pdf'):
+                    continue
+                ruta = os.path.join(directorio, nombre)
+                try:
+                    stat = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, ruta
+
+    def uso_total(self):
+        return sum(tamano for _, tamano, _ in self._archivos())
+
+    def _sumar_uso(self, tamano):
+        if not self.limite_bytes:
+            return
+        with self._lock:
+            # El uso se mide recorriendo el disco y, entre recuentos, se estima con lo escrito por este proceso
+            self._sin_recontar += tamano
+            if self._uso is None or self._sin_recontar >= self.limite_bytes * FRACCION_RECUENTO:
+                self._uso = self.uso_total()
+                self._sin_recontar = 0
+            else:
+                self._uso += tamano
+            excedido = self._uso > self.limite_bytes
+        if excedido:
+            self.desalojar()
+
+    def desalojar(self, objetivo=None):
+        """
+        Elimina los PDFs usados hace más tiempo hasta bajar del objetivo.
+        Devuelve la cantidad de archivos eliminados.
+        """
+        if objetivo is None:
+            objetivo = int(self.limite_bytes * FRACCION_TRAS_DESALOJO)
+        with self._lock:
+            archivos = sorted(self._archivos())
+            uso = sum(tamano for _, tamano, _ in archivos)
+            eliminados = 0
+            for _, tamano, ruta in archivos:
+                if uso <= objetivo:
+                    break
+                try:
+                    os.unlink(ruta)
+                except FileNotFoundError:
+                    pass
+                uso -= tamano
+                eliminados += 1
+            self._uso = uso
+            self._sin_recontar = 0
+            return eliminados
+
+
+_almacen_cache = None
+_almacen_lock = threading.Lock()
+
+
+def obtener_almacen_pdf():
+    """
+    Almacén configurado para el proceso; se recrea si cambian MEDIA_ROOT o el presupuesto
+    """
+    global _almacen_cache
+    raiz = os.path.join(settings.MEDIA_ROOT, DIRECTORIO_ALMACEN)
+    limite = int(getattr(settings, 'CERTIFICADOS_ALMACEN_LIMITE_MB', 0) * 1024 * 1024)
+
+    almacen = _almacen_cache
+    if almacen and almacen.raiz == raiz and almacen.limite_bytes == limite:
+        return almacen
+
+    with _almacen_lock:
+        almacen = _almacen_cache
+        if not (almacen and almacen.raiz == raiz and almacen.limite_bytes == limite):
+            almacen = AlmacenPDF(raiz, limite)
+            _almacen_cache = almacen
+        return almacen
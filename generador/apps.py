@@ -1,6 +1,21 @@
+import logging
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class GeneradorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'generador'
+
+    def ready(self):
+        # Precalentamiento opcional de los workers que renderizan certificados.
+        # Con preload_app de gunicorn se hace una sola vez en el proceso maestro y
+        # los workers heredan la plantilla, las fuentes y los módulos ya cargados.
+        if getattr(settings, 'CERTIFICADOS_PRECALENTAR', False):
+            from .document_utils import precalentar_renderizado
+            try:
+                precalentar_renderizado()
+            except Exception:
+                logger.exception('No se pudo precalentar el renderizado de certificados')
@@ -0,0 +1,72 @@
+"""
+Búsqueda de texto sobre los certificados emitidos (nombre, DNI y carrera).
+En SQLite se usa una tabla FTS5 mantenida por triggers y en PostgreSQL un índice
+de trigramas (pg_trgm); ambos se crean en la migración 0008_busqueda_certificados.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from .listado_utils import COLUMNAS_LISTADO
+from .models import CertificadoGenerado
+
+LIMITE_BUSQUEDA = 50
+
+TABLA_CERTIFICADOS = 'generador_certificadogenerado'
+TABLA_FTS = 'generador_certificadogenerado_fts'
+
+# Expresión indexada con trigramas en PostgreSQL
+EXPRESION_TRIGRAMAS = "(nombre || ' ' || dni || ' ' || carrera)"
+
+
+def terminos_busqueda(texto):
+    """
+    Palabras de la búsqueda (letras y dígitos), sin operadores ni comillas
+    """
+    return re.findall(r'\w+', texto or '')
+
+
+def _ids_sqlite(terminos, limite):
+    # Cada término se busca como prefijo ("GARC"*); bm25 ordena por relevancia
+    consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY rank LIMIT %s',
+            [consulta, limite]
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _ids_postgresql(terminos, limite):
+    condiciones = ' AND '.join(f'{EXPRESION_TRIGRAMAS} ILIKE %s' for _ in terminos)
+    parametros = [f'%{termino}%' for termino in terminos]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {TABLA_CERTIFICADOS} WHERE {condiciones} '
+            f'ORDER BY similarity({EXPRESION_TRIGRAMAS}, %s) DESC, fecha_generacion DESC LIMIT %s',
+            parametros + [' '.join(terminos), limite]
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def buscar_certificados(texto, limite=LIMITE_BUSQUEDA):
+    """
+    Certificados que coinciden con todas las palabras buscadas (nombre parcial,
+    inicio del DNI o carrera), ordenados por relevancia
+    """
+    terminos = terminos_busqueda(texto)
+    if not terminos:
+        return []
+
+    if connection.vendor == 'sqlite':
+        ids = _ids_sqlite(terminos, limite)
+    elif connection.vendor == 'postgresql':
+        ids = _ids_postgresql(terminos, limite)
+    else:
+        # Otras bases de datos: búsqueda sin índice de texto
+        filtro = Q()
+        for termino in terminos:
+            filtro &= Q(nombre__icontains=termino) | Q(dni__startswith=termino) | Q(carrera__icontains=termino)
+        ids = list(CertificadoGenerado.objects.filter(filtro).order_by('-fecha_generacion').values_list('id', flat=True)[:limite])
+
+    filas = {fila['id']: fila for fila in CertificadoGenerado.objects.filter(id__in=ids).values(*COLUMNAS_LISTADO)}
+    return [filas[pk] for pk in ids if pk in filas]
@@ -0,0 +1,258 @@
+"""
+Backends de conversión DOCX → PDF.
+El backend activo se elige con settings.CONVERSOR_PDF ('local', 'libreoffice'
+o la ruta de una clase propia, útil para reemplazarlo en pruebas).
+"""
+import os
+import abc
+import atexit
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from io import BytesIO
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ConversorPDF(abc.ABC):
+    """
+    Interfaz común de los conversores: reciben el DOCX en bytes y devuelven el PDF en bytes
+    """
+
+    @abc.abstractmethod
+    def convertir(self, docx_bytes):
+        """
+        PDF en bytes del DOCX recibido
+        """
+
+    def cerrar(self):
+        pass
+
+
+class ConversorLocal(ConversorPDF):
+    """
+    Comportamiento original: docx2pdf si está instalado y, si no, PDF directo con reportlab
+    """
+
+    def convertir(self, docx_bytes):
+        try:
+            from docx2pdf import convert
+        except ImportError:
+            from .document_utils import generar_pdf_directo
+            return generar_pdf_directo(BytesIO(docx_bytes))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            docx_path = os.path.join(directorio, 'certificado.docx')
+            pdf_path = os.path.join(directorio, 'certificado.pdf')
+            with open(docx_path, 'wb') as f:
+                f.write(docx_bytes)
+            convert(docx_path, pdf_path)
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class _TransporteConTimeout(xmlrpc.client.Transport):
+    """
+    Transporte XML-RPC cuyas conexiones vencen a los `timeout` segundos sin respuesta
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conexion = super().make_connection(host)
+        conexion.timeout = self.timeout
+        return conexion
+
+
+class _InstanciaLibreOffice:
+    """
+    Un proceso unoserver (LibreOffice headless) con su propio perfil de usuario
+    """
+
+    def __init__(self, comando, timeout_arranque, timeout_conversion):
+        self.puerto = _puerto_libre()
+        self.puerto_uno = _puerto_libre()
+        self.perfil = tempfile.mkdtemp(prefix='lo_perfil_')
+        self.proceso = subprocess.Popen(
+            [
+                comando,
+                '--interface', '127.0.0.1',
+                '--port', str(self.puerto),
+                '--uno-port', str(self.puerto_uno),
+                '--user-installation', f'file://{self.perfil}',
+                '--quiet',
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._esperar_arranque(timeout_arranque)
+        self.proxy = xmlrpc.client.ServerProxy(
+            f'http://127.0.0.1:{self.puerto}',
+            transport=_TransporteConTimeout(timeout_conversion),
+            allow_none=True
+        )
+
+    def _esperar_arranque(self, timeout):
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise RuntimeError('El servidor de LibreOffice terminó durante el arranque')
+            try:
+                with socket.create_connection(('127.0.0.1', self.puerto), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.cerrar()
+        raise TimeoutError('LibreOffice no respondió a tiempo')
+
+    def convertir(self, docx_bytes):
+        resultado = self.proxy.convert(None, xmlrpc.client.Binary(docx_bytes), None, 'pdf')
+        return resultado.data if isinstance(resultado, xmlrpc.client.Binary) else resultado
+
+    def cerrar(self):
+        if self.proceso.poll() is None:
+            self.proceso.terminate()
+            try:
+                self.proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+        shutil.rmtree(self.perfil, ignore_errors=True)
+
+
+class ConversorLibreOffice(ConversorPDF):
+    """
+    Pool de procesos LibreOffice headless que permanecen activos entre conversiones.
+    Los documentos se envían en memoria por XML-RPC (unoserver), así que cada
+    certificado evita el arranque de la suite ofimática y los archivos temporales.
+    Una instancia que no responde en `timeout_conversion` segundos se trata como caída.
+    """
+
+    def __init__(self, instancias=2, comando='unoserver', timeout_arranque=60, timeout_conversion=120):
+        self.instancias = instancias
+        self.comando = comando
+        self.timeout_arranque = timeout_arranque
+        self.timeout_conversion = timeout_conversion
+        self._pool = None
+        self._activas = []
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.cerrar)
+
+    def _asegurar_pool(self):
+        # Tras un fork (p. ej. workers de gunicorn) cada proceso arranca su propio pool,
+        # y también se vuelve a arrancar si no queda ninguna instancia activa
+        if self._pool is not None and self._pid == os.getpid() and self._activas:
+            return
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid() and self._activas:
+                return
+            self._pool = queue.Queue()
+            self._activas = []
+            self._pid = os.getpid()
+            for _ in range(self.instancias):
+                instancia = _InstanciaLibreOffice(self.comando, self.timeout_arranque, self.timeout_conversion)
+                self._activas.append(instancia)
+                self._pool.put(instancia)
+
+    def _tomar_instancia(self):
+        while True:
+            pool = self._pool
+            try:
+                return pool.get(timeout=1)
+            except queue.Empty:
+                # Si todas las instancias se descartaron nadie devolverá una al pool
+                if not self._activas:
+                    raise RuntimeError('No queda ninguna instancia de LibreOffice activa')
+
+    def _reemplazar(self, instancia):
+        """
+        Cierra una instancia caída y arranca otra en su lugar. Si la nueva no arranca
+        la excepción se propaga y el pool queda con una instancia menos.
+        """
+        instancia.cerrar()
+        with self._lock:
+            self._activas = [activa for activa in self._activas if activa is not instancia]
+        nueva = _InstanciaLibreOffice(self.comando, self.timeout_arranque, self.timeout_conversion)
+        with self._lock:
+            self._activas.append(nueva)
+        return nueva
+
+    def convertir(self, docx_bytes):
+        self._asegurar_pool()
+        pool = self._pool
+        instancia = self._tomar_instancia()
+        try:
+            try:
+                return instancia.convertir(docx_bytes)
+            except (OSError, xmlrpc.client.ProtocolError):
+                # El proceso murió o dejó de responder (el vencimiento del socket, TimeoutError,
+                # también es un OSError): se reemplaza y se reintenta una vez
+                caida, instancia = instancia, None
+                instancia = self._reemplazar(caida)
+                return instancia.convertir(docx_bytes)
+        finally:
+            # Una instancia caída que no se pudo reemplazar nunca vuelve al pool
+            if instancia is not None:
+                pool.put(instancia)
+
+    def cerrar(self):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            for instancia in self._activas:
+                instancia.cerrar()
+            self._activas = []
+            self._pool = None
+
+
+CONVERSORES = {
+    'local': ConversorLocal,
+    'libreoffice': ConversorLibreOffice,
+}
+
+_conversor_cache = None
+_conversor_lock = threading.Lock()
+
+
+def obtener_conversor():
+    """
+    Devuelve el conversor configurado, creado una sola vez por proceso
+    """
+    global _conversor_cache
+    nombre = getattr(settings, 'CONVERSOR_PDF', 'local')
+
+    cache = _conversor_cache
+    if cache and cache[0] == nombre:
+        return cache[1]
+
+    with _conversor_lock:
+        if _conversor_cache and _conversor_cache[0] == nombre:
+            return _conversor_cache[1]
+        if _conversor_cache:
+            _conversor_cache[1].cerrar()
+
+        if nombre == 'libreoffice':
+            conversor = ConversorLibreOffice(
+                instancias=getattr(settings, 'LIBREOFFICE_INSTANCIAS', 2),
+                comando=getattr(settings, 'LIBREOFFICE_COMANDO', 'unoserver'),
+                timeout_conversion=getattr(settings, 'LIBREOFFICE_TIMEOUT', 120),
+            )
+        elif nombre in CONVERSORES:
+            conversor = CONVERSORES[nombre]()
+        else:
+            conversor = import_string(nombre)()
+        _conversor_cache = (nombre, conversor)
+        return conversor
@@ -4,107 +4,120 @@ Utilidades optimizadas para la generación de certificados usando plantillas Wor
 from docxtpl import DocxTemplate, InlineImage, RichText
 from docx.shared import Mm, Pt
 from docx import Document
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.platypus import Paragraph, Spacer
 import qrcode
 import os
+import copy
+import hashlib
 import json
 import datetime
 import tempfile
+import threading
 from django.conf import settings
+from django.db import transaction
 from io import BytesIO
 import uuid
 from .models import CertificadoGenerado
+from .almacen_utils import obtener_almacen_pdf
+from .conversion_utils import obtener_conversor
+from .estilos_pdf_utils import obtener_contexto_reportlab
+from .metricas_utils import medir
+from .pdf_utils import generar_certificado_sobre_fondo, obtener_fondo_pdf, ruta_fondo_pdf
+from .verificacion_utils import invalidar_verificacion
 
-def generar_certificado_desde_plantilla(datos, qr_path, id_certificado):
+# Caché por proceso de plantillas Word ya analizadas: {ruta: ((mtime_ns, tamaño), Document)}
+_plantillas_cache = {}
+_plantillas_lock = threading.Lock()
+
+def obtener_plantilla_word(plantilla_path):
     """
-    Genera un certificado usando la plantilla Word existente
+    Devuelve una copia lista para renderizar de la plantilla Word.
+    El DOCX se descomprime y analiza una sola vez por proceso; si el archivo
+    cambia en disco (mtime o tamaño) la caché se invalida automáticamente.
+    """
+    stat = os.stat(plantilla_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _plantillas_lock:
+        entrada = _plantillas_cache.get(plantilla_path)
+        if entrada is None or entrada[0] != version:
+            entrada = (version, Document(plantilla_path))
+            _plantillas_cache[plantilla_path] = entrada
+        # Copia profunda del árbol XML: mucho más barata que volver a leer el ZIP
+        documento = copy.deepcopy(entrada[1])
+
+    plantilla = DocxTemplate(plantilla_path)
+    plantilla.docx = documento
+    return plantilla
+
+def limpiar_cache_plantillas():
+    """
+    Vacía la caché de plantillas Word (útil en pruebas o tras reemplazar la plantilla)
     """
-    print("🔄 Preparando plantilla Word...")
+    with _plantillas_lock:
+        _plantillas_cache.clear()
+
+def renderizar_docx_certificado(datos, qr, id_certificado):
+    """
+    Rellena la plantilla Word con los datos del certificado y devuelve el DOCX en bytes
+    """
+    with medir('plantilla', 'plantilla_word'):
+        return _renderizar_docx(datos, qr, id_certificado)
+
+def _renderizar_docx(datos, qr, id_certificado):
     # Ruta a la plantilla Word en la carpeta plantillas_word
     plantilla_path = os.path.join(settings.BASE_DIR, 'plantillas_word', 'plantilla_certificado.docx')
     
     if not os.path.exists(plantilla_path):
-        print("❌ Error: No se encontró la plantilla Word")
         raise FileNotFoundError(f"No se encontró la plantilla de certificado Word en {plantilla_path}")
     
-    print("✅ Plantilla Word encontrada")
-    # Crear un archivo temporal para el resultado
-    temp_docx = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-    temp_docx.close()
+    # Obtener una copia de la plantilla desde la caché del proceso
+    doc = obtener_plantilla_word(plantilla_path)
     
-    try:
-        # Cargar la plantilla
-        doc = DocxTemplate(plantilla_path)
-        
-        # Crear un RichText para el nombre con Times New Roman
-        nombre_rt = RichText()
-        nombre_rt.add(datos['nombre'], font='Times New Roman', size=56, bold=True, italic=True)
-        
-        # Preparar el código QR como imagen inline
-        qr_image = InlineImage(doc, qr_path, width=Mm(30), height=Mm(30))
-        
-        # Contexto para la plantilla
-        context = {
-            # Usamos RichText para conservar estilo si la plantilla lo admite
-            'nombre': nombre_rt,
-            'carrera': datos['carrera'],
-            'qr_code': qr_image,
-            'id_certificado': id_certificado,
-            'fecha': datetime.datetime.now().strftime("%d de %B de %Y")
-        }
-        
-        # Renderizar la plantilla
-        doc.render(context)
-        doc.save(temp_docx.name)
-        
-        # Convertir a PDF
-        pdf_content = convertir_a_pdf(temp_docx.name)
-        return pdf_content
-        
-    finally:
-        # Limpiar archivo temporal
-        if os.path.exists(temp_docx.name):
-            os.unlink(temp_docx.name)
-
-def convertir_a_pdf(docx_path):
-    """
-    Convierte el documento Word a PDF
-    """
-    print("🔄 Iniciando conversión a PDF...")
-    try:
-        # Intentar usar docx2pdf si está disponible
-        print("📄 Intentando usar docx2pdf...")
-        from docx2pdf import convert
-        temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        temp_pdf.close()
-        
-        try:
-            convert(docx_path, temp_pdf.name)
-            with open(temp_pdf.name, 'rb') as f:
-                pdf_content = f.read()
-            return pdf_content
-        finally:
-            if os.path.exists(temp_pdf.name):
-                os.unlink(temp_pdf.name)
-                
-    except ImportError:
-        # Si docx2pdf no está disponible, usar generación PDF directa
-        return generar_pdf_directo(docx_path)
+    # Crear un RichText para el nombre con Times New Roman
+    nombre_rt = RichText()
+    nombre_rt.add(datos['nombre'], font='Times New Roman', size=56, bold=True, italic=True)
+    
+    # Preparar el código QR como imagen inline
+    qr_image = InlineImage(doc, qr.imagen(), width=Mm(30), height=Mm(30))
+    
+    # Contexto para la plantilla
+    context = {
+        # Usamos RichText para conservar estilo si la plantilla lo admite
+        'nombre': nombre_rt,
+        'carrera': datos['carrera'],
+        'qr_code': qr_image,
+        'id_certificado': id_certificado,
+        'fecha': datetime.datetime.now().strftime("%d de %B de %Y")
+    }
+    
+    # Renderizar la plantilla en memoria
+    doc.render(context)
+    docx_buffer = BytesIO()
+    doc.save(docx_buffer)
+    return docx_buffer.getvalue()
 
-def generar_pdf_directo(docx_path):
+def generar_certificado_desde_plantilla(datos, qr, id_certificado):
     """
-    Fallback mínimo: extrae el texto del DOCX y lo convierte a PDF.
+    Genera un certificado usando la plantilla Word existente
+    """
+    return convertir_a_pdf(renderizar_docx_certificado(datos, qr, id_certificado))
+
+def convertir_a_pdf(docx_bytes):
     """
-    buffer = BytesIO()
-    pdf_doc = SimpleDocTemplate(buffer, pagesize=A4,
-                               rightMargin=72, leftMargin=72,
-                               topMargin=72, bottomMargin=18)
+    Convierte el documento Word (bytes) a PDF con el conversor configurado en
+    settings.CONVERSOR_PDF (ver conversion_utils)
+    """
+    with medir('conversion', 'plantilla_word'):
+        return obtener_conversor().convertir(docx_bytes)
 
-    # Estilos
-    styles = getSampleStyleSheet()
-    normal_style = styles['Normal']
+def generar_pdf_directo(docx_path):
+    """
+    Fallback mínimo: extrae el texto del DOCX (ruta o archivo en memoria) y lo convierte a PDF.
+    """
+    # Fuentes y estilos compartidos por el proceso
+    contexto = obtener_contexto_reportlab()
+    normal_style = contexto.estilos['normal']
 
     story = []
 
@@ -119,34 +132,19 @@ def generar_pdf_directo(docx_path):
         # Si por alguna razón no podemos leer el DOCX, generar un PDF vacío
         story.append(Paragraph("", normal_style))
 
-    pdf_doc.build(story)
-    contenido = buffer.getvalue()
-    buffer.close()
-    return contenido
+    return contexto.construir_pdf(story)
 
-def generar_qr_optimizado(dni, nombre, carrera, codigo):
+def construir_url_verificacion(id_certificado):
     """
-    Genera un código QR optimizado con información del certificado
+    URL pública de verificación usando BASE_URL de settings si está definida
     """
-    # Generar ID único
-    id_certificado = str(uuid.uuid4())
-    fecha_generacion = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Construir URL de verificación usando BASE_URL de settings si está definida
     base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-    url_verificacion = f"{base_url}/verificar/{id_certificado}/"
-    
-    # Datos para el QR
-    datos_qr = {
-        'id_certificado': id_certificado,
-        'dni': dni,
-        'nombre': nombre,
-        'carrera': carrera,
-        'fecha_generacion': fecha_generacion,
-        'url': url_verificacion
-    }
-    
-    # Crear código QR
+    return f"{base_url}/verificar/{id_certificado}/"
+
+def crear_qr(url_verificacion):
+    """
+    Código QR de la URL de verificación (sin renderizar)
+    """
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -155,76 +153,262 @@ def generar_qr_optimizado(dni, nombre, carrera, codigo):
     )
     qr.add_data(url_verificacion)
     qr.make(fit=True)
-    
-    # Generar imagen
-    qr_image = qr.make_image(fill_color="black", back_color="white")
-    
-    # Guardar QR
-    qr_dir = os.path.join(settings.MEDIA_ROOT, 'qr')
-    os.makedirs(qr_dir, exist_ok=True)
-    qr_path = os.path.join(qr_dir, f'qr_{id_certificado}.png')
-    qr_image.save(qr_path)
-    
-    # Guardar en base de datos
-    certificado = CertificadoGenerado(
-        id_certificado=id_certificado,
-        codigo=codigo,
-        dni=dni,
-        nombre=nombre,
-        carrera=carrera,
-        ruta_qr=qr_path,
-        url_verificacion=url_verificacion
+    return qr
+
+class CodigoQR:
+    """
+    Código QR de un certificado generado en memoria, sin archivos intermedios.
+    Los motores usan la matriz para dibujarlo como vector o la imagen PNG.
+    """
+
+    def __init__(self, url_verificacion):
+        self.url_verificacion = url_verificacion
+        self._qr = crear_qr(url_verificacion)
+        self._png = None
+
+    @property
+    def matriz(self):
+        return self._qr.get_matrix()
+
+    def png(self):
+        if self._png is None:
+            buffer = BytesIO()
+            self._qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+            self._png = buffer.getvalue()
+        return self._png
+
+    def imagen(self):
+        """
+        PNG como archivo en memoria (InlineImage, ImageReader y RLImage lo aceptan)
+        """
+        return BytesIO(self.png())
+
+def generar_certificado_pdf(nombre, carrera, id_certificado, qr):
+    """
+    Genera el PDF del certificado directamente con reportlab sobre el fondo PDF,
+    sin plantilla Word ni conversión
+    """
+    return generar_certificado_sobre_fondo({'nombre': nombre, 'carrera': carrera}, qr, id_certificado)
+
+# Motores de renderizado disponibles para crear_certificado_completo
+MOTORES_CERTIFICADO = {
+    # Plantilla Word renderizada con docxtpl y convertida a PDF
+    'plantilla_word': generar_certificado_desde_plantilla,
+    # Fondo PDF precargado con los campos variables estampados encima
+    'fondo_pdf': generar_certificado_sobre_fondo,
+}
+
+def obtener_motor_certificado(motor=None):
+    """
+    Devuelve la función de renderizado del motor indicado o del configurado en settings.MOTOR_CERTIFICADO
+    """
+    motor = motor or getattr(settings, 'MOTOR_CERTIFICADO', 'plantilla_word')
+    try:
+        return MOTORES_CERTIFICADO[motor]
+    except KeyError:
+        raise ValueError(f"Motor de certificado desconocido: {motor}")
+
+def precalentar_renderizado(motor=None):
+    """
+    Deja cargados en el proceso la plantilla del motor, su versión y las fuentes,
+    para que la primera emisión no pague la lectura de archivos ni la carga de fuentes
+    """
+    motor = motor or getattr(settings, 'MOTOR_CERTIFICADO', 'plantilla_word')
+    plantilla_path = ruta_plantilla_motor(motor)
+    if os.path.exists(plantilla_path):
+        if motor == 'fondo_pdf':
+            obtener_fondo_pdf()
+        else:
+            obtener_plantilla_word(plantilla_path)
+        version_plantilla(motor)
+
+    from reportlab.pdfbase import pdfmetrics
+    for fuente in ('Times-Roman', 'Times-Bold', 'Times-BoldItalic', 'Helvetica'):
+        pdfmetrics.getFont(fuente)
+    obtener_contexto_reportlab()
+
+def renderizar_certificado(datos, id_certificado, url_verificacion, motor=None):
+    """
+    Genera el PDF de un certificado con un ID ya asignado, sin tocar la base de datos.
+    Se usa desde procesos de trabajo que no comparten la conexión del proceso padre.
+    """
+    renderizar = obtener_motor_certificado(motor)
+    return renderizar(datos, CodigoQR(url_verificacion), id_certificado)
+
+def ruta_plantilla_motor(motor):
+    """
+    Archivo de plantilla del que depende cada motor de renderizado
+    """
+    if motor == 'fondo_pdf':
+        return ruta_fondo_pdf()
+    return os.path.join(settings.BASE_DIR, 'plantillas_word', 'plantilla_certificado.docx')
+
+# Hash de la plantilla por (ruta, mtime_ns, tamaño) para no releerla en cada emisión
+_versiones_cache = {}
+
+def version_plantilla(motor=None):
+    """
+    Identificador de la versión de plantilla con la que se emite un certificado:
+    motor + hash del contenido del archivo de plantilla
+    """
+    motor = motor or getattr(settings, 'MOTOR_CERTIFICADO', 'plantilla_word')
+    ruta = ruta_plantilla_motor(motor)
+    stat = os.stat(ruta)
+    clave = (ruta, stat.st_mtime_ns, stat.st_size)
+
+    digest = _versiones_cache.get(clave)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(bloque)
+        digest = sha.hexdigest()[:16]
+        _versiones_cache[clave] = digest
+    return f'{motor}:{digest}'
+
+def guardar_pdf_almacenado(contenido):
+    """
+    Guarda el PDF emitido en el almacén y devuelve la ruta para CertificadoGenerado.ruta_pdf
+    """
+    with medir('almacen'):
+        return obtener_almacen_pdf().guardar(contenido)
+
+def leer_pdf_almacenado(ruta_pdf):
+    """
+    Contenido del PDF emitido o None si no está en el almacén
+    """
+    with medir('almacen'):
+        return obtener_almacen_pdf().leer(ruta_pdf)
+
+def motor_de_version(version):
+    """
+    Motor con el que se emitió un certificado según su version_plantilla
+    """
+    motor = (version or '').split(':', 1)[0]
+    return motor if motor in MOTORES_CERTIFICADO else None
+
+def obtener_pdf_certificado(certificado):
+    """
+    PDF de un certificado ya emitido: se lee del almacén y, si fue desalojado
+    (o nunca se guardó), se renderiza de nuevo con el mismo ID y se vuelve a guardar
+    """
+    contenido = leer_pdf_almacenado(certificado.ruta_pdf)
+    if contenido is not None:
+        return contenido
+
+    datos = {
+        'dni': certificado.dni,
+        'nombre': certificado.nombre,
+        'carrera': certificado.carrera,
+        'codigo': certificado.codigo,
+    }
+    contenido = renderizar_certificado(
+        datos, certificado.id_certificado, certificado.url_verificacion,
+        motor=motor_de_version(certificado.version_plantilla)
     )
-    certificado.save()
-    
-    return qr_path, id_certificado, url_verificacion
+    certificado.ruta_pdf = guardar_pdf_almacenado(contenido)
+    with medir('bd'):
+        CertificadoGenerado.objects.filter(pk=certificado.pk).update(ruta_pdf=certificado.ruta_pdf)
+    return contenido
 
-def crear_certificado_completo(datos, formato='pdf'):
+def buscar_certificado_emitido(dni, codigo, version):
     """
-    Crear certificado y devolverlo en memoria listo para descargar
+    Certificado ya emitido para el estudiante con esa versión de plantilla, si existe
+    """
+    with medir('bd'):
+        return CertificadoGenerado.objects.filter(
+            dni=dni, codigo=codigo, version_plantilla=version
+        ).order_by('fecha_generacion').first()
+
+def registrar_certificado_emitido(datos, id_certificado, url_verificacion, version, ruta_pdf):
+    """
+    Registra el certificado ya renderizado. Si otra emisión simultánea registró
+    primero uno para el mismo estudiante y versión (certgen_emision_uniq), devuelve
+    ese certificado. Devuelve (certificado, creado).
+    """
+    with medir('bd'):
+        with transaction.atomic():
+            certificado, creado = CertificadoGenerado.objects.get_or_create(
+                dni=datos['dni'],
+                codigo=datos['codigo'],
+                version_plantilla=version,
+                defaults={
+                    'id_certificado': id_certificado,
+                    'nombre': datos['nombre'],
+                    'carrera': datos['carrera'],
+                    'ruta_pdf': ruta_pdf,
+                    'url_verificacion': url_verificacion,
+                }
+            )
+    if creado:
+        # Descarta una consulta negativa del ID hecha antes del registro
+        invalidar_verificacion([id_certificado])
+    return certificado, creado
+
+def crear_certificado_completo(datos, formato='pdf', motor=None):
+    """
+    Crear certificado y devolverlo en memoria listo para descargar.
+    `motor` elige el renderizado ('plantilla_word' o 'fondo_pdf'); por defecto settings.MOTOR_CERTIFICADO.
+    La emisión es idempotente: si el estudiante ya tiene un certificado con la misma
+    versión de plantilla se reutiliza su ID y su PDF almacenado. El registro se crea
+    recién cuando el PDF está renderizado y guardado, así un error al renderizar no
+    deja certificados sin PDF que la verificación daría por válidos.
+    Cada etapa se mide con metricas_utils.medir (QR, plantilla, conversión, almacén y base de datos).
     """
-    print("\n🔵 Iniciando proceso de generación de certificado...")
-    print(f"📋 Datos recibidos: Nombre={datos.get('nombre')}, Carrera={datos.get('carrera')}")
-    
     try:
-        print("🔄 Generando código QR...")
-        qr_path, id_certificado, url_verificacion = generar_qr_optimizado(
-            datos['dni'],
-            datos['nombre'],
-            datos['carrera'],
-            datos['codigo']
-        )
-        print(f"✅ Código QR generado: {id_certificado}")
-
-        try:
-            print("🔄 Generando certificado desde plantilla...")
-            contenido = generar_certificado_desde_plantilla(
+        motor = motor or getattr(settings, 'MOTOR_CERTIFICADO', 'plantilla_word')
+        renderizar = obtener_motor_certificado(motor)
+
+        with medir('total', motor):
+            version = version_plantilla(motor)
+            
+            mime_type = 'application/pdf'
+            extension = 'pdf'
+            nombre_archivo = f'certificado_{datos["nombre"].replace(" ", "_")}.{extension}'
+            
+            existente = buscar_certificado_emitido(datos['dni'], datos['codigo'], version)
+            if existente:
+                return {
+                    'contenido': obtener_pdf_certificado(existente),
+                    'mime_type': mime_type,
+                    'nombre_archivo': nombre_archivo,
+                    'id_certificado': str(existente.id_certificado),
+                    'reutilizado': True
+                }
+            
+            id_certificado = str(uuid.uuid4())
+            url_verificacion = construir_url_verificacion(id_certificado)
+            with medir('qr'):
+                qr = CodigoQR(url_verificacion)
+
+            contenido = renderizar(
                 datos,
-                qr_path,
+                qr,
                 id_certificado
             )
-            print("✅ Certificado generado exitosamente")
             
-            mime_type = 'application/pdf'
-            extension = 'pdf'
+            ruta_pdf = guardar_pdf_almacenado(contenido)
+
+            certificado, creado = registrar_certificado_emitido(
+                datos, id_certificado, url_verificacion, version, ruta_pdf
+            )
+            if not creado:
+                # Otra descarga simultánea del mismo estudiante registró antes su certificado
+                return {
+                    'contenido': obtener_pdf_certificado(certificado),
+                    'mime_type': mime_type,
+                    'nombre_archivo': nombre_archivo,
+                    'id_certificado': str(certificado.id_certificado),
+                    'reutilizado': True
+                }
 
-            print("💾 Actualizando registro en base de datos...")
-            # Guardar ruta PDF en base de datos (opcional)
-            certificado = CertificadoGenerado.objects.get(id_certificado=id_certificado)
-            certificado.ruta_pdf = f'/certificados/certificado_{id_certificado}.{extension}'  # solo referencia
-            print("✅ Base de datos actualizada")
-            certificado.save()
-
-            return {
-                'contenido': contenido,
-                'mime_type': mime_type,
-                'nombre_archivo': f'certificado_{datos["nombre"].replace(" ", "_")}.{extension}',
-                'id_certificado': id_certificado
-            }
-
-        finally:
-            if os.path.exists(qr_path):
-                os.unlink(qr_path)
+        return {
+            'contenido': contenido,
+            'mime_type': mime_type,
+            'nombre_archivo': nombre_archivo,
+            'id_certificado': id_certificado,
+            'reutilizado': False
+        }
 
     except Exception as e:
         raise Exception(f"Error al crear certificado: {str(e)}")
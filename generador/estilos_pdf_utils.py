@@ -0,0 +1,188 @@
+"""
+Contexto de reportlab compartido por los PDFs que se arman con platypus
+(generar_pdf_directo y las alternativas sin conversión de views.py).
+Las fuentes TrueType de Times New Roman se registran una vez por proceso y los
+estilos de párrafo se construyen una sola vez; cada renderizado sólo arma su
+contenido. Si no se encuentra Times New Roman (ni Liberation Serif, con sus mismas
+métricas) se usan las fuentes Times incorporadas en reportlab.
+"""
+import os
+import threading
+from io import BytesIO
+from django.conf import settings
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate
+
+FAMILIA_TIMES_NEW_ROMAN = 'TimesNewRoman'
+
+# Fuentes incorporadas en reportlab (sin archivos ni incrustación)
+FUENTES_TIMES_INCORPORADAS = {
+    'normal': 'Times-Roman',
+    'negrita': 'Times-Bold',
+    'cursiva': 'Times-Italic',
+    'negrita_cursiva': 'Times-BoldItalic',
+}
+
+# Nombres de archivo de cada variante, según cómo las instala cada sistema
+ARCHIVOS_TIMES_NEW_ROMAN = (
+    # Windows y paquetes msttcorefonts
+    {'normal': 'times.ttf', 'negrita': 'timesbd.ttf', 'cursiva': 'timesi.ttf', 'negrita_cursiva': 'timesbi.ttf'},
+    {'normal': 'Times_New_Roman.ttf', 'negrita': 'Times_New_Roman_Bold.ttf',
+     'cursiva': 'Times_New_Roman_Italic.ttf', 'negrita_cursiva': 'Times_New_Roman_Bold_Italic.ttf'},
+    # macOS
+    {'normal': 'Times New Roman.ttf', 'negrita': 'Times New Roman Bold.ttf',
+     'cursiva': 'Times New Roman Italic.ttf', 'negrita_cursiva': 'Times New Roman Bold Italic.ttf'},
+    # Liberation Serif: libre y con las mismas métricas que Times New Roman
+    {'normal': 'LiberationSerif-Regular.ttf', 'negrita': 'LiberationSerif-Bold.ttf',
+     'cursiva': 'LiberationSerif-Italic.ttf', 'negrita_cursiva': 'LiberationSerif-BoldItalic.ttf'},
+)
+
+DIRECTORIOS_FUENTES_SISTEMA = (
+    r'C:\Windows\Fonts',
+    '/usr/share/fonts/truetype/msttcorefonts',
+    '/usr/share/fonts/truetype/liberation',
+    '/usr/share/fonts/truetype/liberation2',
+    '/usr/share/fonts/liberation-serif',
+    '/Library/Fonts',
+    '/System/Library/Fonts/Supplemental',
+)
+
+
+def buscar_fuentes_times_new_roman(directorios):
+    """
+    Rutas de las cuatro variantes de Times New Roman en el primer directorio que
+    las tenga todas, o None si no se encuentran
+    """
+    for directorio in directorios:
+        for archivos in ARCHIVOS_TIMES_NEW_ROMAN:
+            rutas = {variante: os.path.join(directorio, nombre) for variante, nombre in archivos.items()}
+            if all(os.path.isfile(ruta) for ruta in rutas.values()):
+                return rutas
+    return None
+
+
+def registrar_fuentes_times(directorios):
+    """
+    Registra Times New Roman como familia de reportlab (para que <b> e <i> elijan la
+    variante correcta) y devuelve el nombre registrado de cada variante.
+    El TTF se analiza una sola vez aquí; cada PDF sólo incrusta los glifos que usa.
+    """
+    rutas = buscar_fuentes_times_new_roman(directorios)
+    if rutas is None:
+        return dict(FUENTES_TIMES_INCORPORADAS)
+
+    sufijos = {'normal': '', 'negrita': '-Bold', 'cursiva': '-Italic', 'negrita_cursiva': '-BoldItalic'}
+    fuentes = {variante: FAMILIA_TIMES_NEW_ROMAN + sufijo for variante, sufijo in sufijos.items()}
+    registradas = pdfmetrics.getRegisteredFontNames()
+    for variante, nombre in fuentes.items():
+        if nombre not in registradas:
+            pdfmetrics.registerFont(TTFont(nombre, rutas[variante]))
+    pdfmetrics.registerFontFamily(
+        FAMILIA_TIMES_NEW_ROMAN,
+        normal=fuentes['normal'],
+        bold=fuentes['negrita'],
+        italic=fuentes['cursiva'],
+        boldItalic=fuentes['negrita_cursiva'],
+    )
+    return fuentes
+
+
+class ContextoReportlab:
+    """
+    Fuentes y estilos de párrafo de los certificados armados con platypus.
+    Se construye una vez por proceso. Los estilos sólo se leen, pero las fuentes
+    TrueType registradas guardan el subconjunto de glifos del documento en curso
+    mientras se arma, así que construir_pdf arma un PDF a la vez por proceso.
+    """
+
+    def __init__(self, directorios_fuentes):
+        # También lo toma pdf_utils.generar_capa_variable cuando dibuja con fuentes TrueType
+        self.bloqueo = threading.Lock()
+        self.fuentes = registrar_fuentes_times(directorios_fuentes)
+        muestra = getSampleStyleSheet()
+        self.estilos = {
+            'normal': ParagraphStyle(
+                'CertificadoNormal',
+                parent=muestra['Normal'],
+                fontName=self.fuentes['normal']
+            ),
+            'titulo': ParagraphStyle(
+                'TituloPersonalizado',
+                parent=muestra['Heading1'],
+                fontSize=24,
+                spaceAfter=30,
+                alignment=TA_CENTER,
+                fontName=self.fuentes['negrita']
+            ),
+            # Nombre del estudiante como en la plantilla Word: Times New Roman, negrita y cursiva
+            'nombre': ParagraphStyle(
+                'NombrePersonalizado',
+                parent=muestra['Normal'],
+                fontSize=18,
+                leading=22,
+                spaceAfter=20,
+                alignment=TA_CENTER,
+                fontName=self.fuentes['negrita_cursiva']
+            ),
+            'texto': ParagraphStyle(
+                'TextoPersonalizado',
+                parent=muestra['Normal'],
+                fontSize=12,
+                spaceAfter=15,
+                alignment=TA_LEFT,
+                fontName=self.fuentes['normal']
+            ),
+        }
+
+    @property
+    def usa_times_new_roman(self):
+        return self.fuentes['normal'] == FAMILIA_TIMES_NEW_ROMAN
+
+    def construir_pdf(self, story):
+        """
+        PDF A4 (márgenes de los certificados) con el contenido indicado, en bytes
+        """
+        buffer = BytesIO()
+        documento = SimpleDocTemplate(buffer, pagesize=A4,
+                                      rightMargin=72, leftMargin=72,
+                                      topMargin=72, bottomMargin=18)
+        # El estado de subconjunto de cada TTFont es compartido entre hilos
+        with self.bloqueo:
+            documento.build(story)
+        return buffer.getvalue()
+
+
+def directorios_fuentes():
+    """
+    Directorios donde se busca Times New Roman: settings.FUENTES_PDF_DIR,
+    la carpeta fuentes/ del proyecto y las rutas habituales de cada sistema
+    """
+    directorios = [getattr(settings, 'FUENTES_PDF_DIR', ''), os.path.join(settings.BASE_DIR, 'fuentes')]
+    return tuple(d for d in directorios if d) + DIRECTORIOS_FUENTES_SISTEMA
+
+
+# Contexto del proceso: (directorios, ContextoReportlab)
+_contexto_cache = None
+_contexto_lock = threading.Lock()
+
+
+def obtener_contexto_reportlab():
+    """
+    Contexto de reportlab del proceso, creado la primera vez que se pide
+    """
+    global _contexto_cache
+    directorios = directorios_fuentes()
+    cache = _contexto_cache
+    if cache and cache[0] == directorios:
+        return cache[1]
+
+    with _contexto_lock:
+        if _contexto_cache and _contexto_cache[0] == directorios:
+            return _contexto_cache[1]
+        contexto = ContextoReportlab(directorios)
+        _contexto_cache = (directorios, contexto)
+        return contexto
@@ -0,0 +1,123 @@
+"""
+Exportación del registro de certificados emitidos a CSV o XLSX.
+Las filas se leen por bloques con iterator(), así la memoria no depende del tamaño
+de la tabla. El CSV se envía a medida que se escriben las filas; el XLSX es un ZIP
+que sólo puede enviarse completo, así que se arma antes en un archivo temporal y
+tiene un máximo de filas (settings.EXPORTACION_XLSX_MAXIMO_FILAS).
+"""
+import csv
+import datetime
+import tempfile
+from django.utils import timezone
+from .models import CertificadoGenerado
+
+# (campo, encabezado) en el orden de las columnas exportadas
+COLUMNAS_EXPORTACION = (
+    ('id_certificado', 'ID de verificación'),
+    ('dni', 'DNI'),
+    ('codigo', 'Código'),
+    ('nombre', 'Nombres'),
+    ('carrera', 'Carrera'),
+    ('fecha_generacion', 'Fecha de generación'),
+    ('url_verificacion', 'URL de verificación'),
+)
+
+TAMANO_BLOQUE_EXPORTACION = 2000
+TAMANO_FRAGMENTO_ARCHIVO = 64 * 1024
+
+FORMATOS_EXPORTACION = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def leer_fecha(texto):
+    """
+    Fecha YYYY-MM-DD de un filtro o None si está vacía o no es válida
+    """
+    try:
+        return datetime.date.fromisoformat(texto.strip()) if texto else None
+    except ValueError:
+        return None
+
+
+def consulta_exportacion(desde=None, hasta=None, carrera=''):
+    """
+    Certificados a exportar en orden de emisión. El rango de fechas (ambos extremos
+    incluidos) y la carrera se resuelven con certgen_fecha_idx y certgen_carrera_idx.
+    """
+    consulta = CertificadoGenerado.objects.all()
+    if carrera:
+        consulta = consulta.filter(carrera=carrera.strip())
+    if desde:
+        inicio = timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min))
+        consulta = consulta.filter(fecha_generacion__gte=inicio)
+    if hasta:
+        fin = timezone.make_aware(datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time.min))
+        consulta = consulta.filter(fecha_generacion__lt=fin)
+    return consulta.order_by('fecha_generacion', 'id')
+
+
+def filas_exportacion(consulta):
+    campos = [campo for campo, _ in COLUMNAS_EXPORTACION]
+    for fila in consulta.values_list(*campos).iterator(chunk_size=TAMANO_BLOQUE_EXPORTACION):
+        yield [
+            timezone.localtime(valor).replace(tzinfo=None) if isinstance(valor, datetime.datetime) else
+            str(valor) if valor is not None else ''
+            for valor in fila
+        ]
+
+
+class _Linea:
+    """
+    Destino de csv.writer que devuelve la línea escrita en lugar de guardarla
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def iterar_csv(consulta):
+    """
+    CSV por fragmentos (con BOM para que Excel reconozca UTF-8)
+    """
+    escritor = csv.writer(_Linea())
+    yield '\ufeff' + escritor.writerow([encabezado for _, encabezado in COLUMNAS_EXPORTACION])
+    lineas = []
+    for fila in filas_exportacion(consulta):
+        lineas.append(escritor.writerow([
+            valor.strftime('%Y-%m-%d %H:%M:%S') if isinstance(valor, datetime.datetime) else valor
+            for valor in fila
+        ]))
+        if len(lineas) >= TAMANO_BLOQUE_EXPORTACION:
+            yield ''.join(lineas)
+            lineas = []
+    if lineas:
+        yield ''.join(lineas)
+
+
+def iterar_xlsx(consulta):
+    """
+    XLSX con un libro en modo sólo escritura. No es streaming: openpyxl vuelca las
+    filas a un archivo temporal y el libro completo se guarda en otro antes de enviar
+    el primer fragmento, así que la respuesta empieza cuando termina la consulta.
+    Para exportaciones grandes conviene el CSV.
+    """
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Certificados')
+    hoja.append([encabezado for _, encabezado in COLUMNAS_EXPORTACION])
+    for fila in filas_exportacion(consulta):
+        hoja.append(fila)
+
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        for fragmento in iter(lambda: archivo.read(TAMANO_FRAGMENTO_ARCHIVO), b''):
+            yield fragmento
+
+
+ITERADORES_EXPORTACION = {
+    'csv': iterar_csv,
+    'xlsx': iterar_xlsx,
+}
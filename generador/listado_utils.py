@@ -0,0 +1,92 @@
+"""
+Listado de certificados emitidos para el panel de administración.
+Se pagina por cursor (fecha_generacion, id) en lugar de OFFSET: cada página es
+una búsqueda en el índice certgen_fecha_idx y no hace falta contar las filas.
+"""
+import base64
+import datetime
+from django.db.models import Q, Value
+from django.db.models.functions import Upper
+from .models import CertificadoGenerado
+
+TAMANO_PAGINA_LISTADO = 10
+
+# Sólo las columnas que muestra la tabla del listado
+COLUMNAS_LISTADO = ('id', 'id_certificado', 'nombre', 'dni', 'carrera', 'fecha_generacion')
+
+SIGUIENTE = 'siguiente'
+ANTERIOR = 'anterior'
+
+
+def codificar_cursor(certificado):
+    texto = f"{certificado['fecha_generacion'].isoformat()}|{certificado['id']}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    (fecha_generacion, id) del cursor o None si no es válido
+    """
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, pk = texto.split('|')
+        return datetime.datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def filtrar_certificados(consulta, dni='', nombre='', carrera=''):
+    """
+    Filtros del listado, todos resueltos con índices: DNI y carrera exactos y
+    nombre por prefijo sin distinguir mayúsculas (índice certgen_nombre_upper_idx)
+    """
+    if dni:
+        consulta = consulta.filter(dni=dni.strip())
+    if carrera:
+        consulta = consulta.filter(carrera=carrera.strip())
+    if nombre:
+        prefijo = nombre.strip()
+        # Rango en lugar de LIKE para que el índice se use en cualquier base de datos; el
+        # prefijo también pasa por UPPER de la base de datos para que ambos lados coincidan
+        consulta = consulta.alias(nombre_mayusculas=Upper('nombre')).filter(
+            nombre_mayusculas__gte=Upper(Value(prefijo)),
+            nombre_mayusculas__lt=Upper(Value(prefijo + '\uffff'))
+        )
+    return consulta
+
+
+def pagina_certificados(cursor=None, direccion=SIGUIENTE, tamano=TAMANO_PAGINA_LISTADO, **filtros):
+    """
+    Una página del listado, del certificado más reciente al más antiguo.
+    Devuelve las filas y los cursores para la página anterior y la siguiente
+    (None cuando no hay más páginas en esa dirección).
+    """
+    consulta = filtrar_certificados(CertificadoGenerado.objects.all(), **filtros)
+    posicion = decodificar_cursor(cursor) if cursor else None
+    hacia_atras = posicion is not None and direccion == ANTERIOR
+
+    if posicion:
+        fecha, pk = posicion
+        if hacia_atras:
+            consulta = consulta.filter(Q(fecha_generacion__gt=fecha) | Q(fecha_generacion=fecha, id__gt=pk))
+        else:
+            consulta = consulta.filter(Q(fecha_generacion__lt=fecha) | Q(fecha_generacion=fecha, id__lt=pk))
+
+    orden = ('fecha_generacion', 'id') if hacia_atras else ('-fecha_generacion', '-id')
+    # Una fila extra indica si quedan más páginas sin necesidad de un COUNT
+    filas = list(consulta.order_by(*orden).values(*COLUMNAS_LISTADO)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        filas.reverse()
+
+    if hacia_atras:
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, posicion is not None
+
+    return {
+        'certificados': filas,
+        'cursor_siguiente': codificar_cursor(filas[-1]) if filas and hay_siguiente else None,
+        'cursor_anterior': codificar_cursor(filas[0]) if filas and hay_anterior else None,
+    }
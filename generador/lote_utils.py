@@ -0,0 +1,715 @@
+"""
+Utilidades para la generación de certificados en lote
+"""
+import os
+import signal
+import socket
+import uuid
+import zipfile
+import datetime
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .document_utils import (
+    CodigoQR,
+    crear_certificado_completo,
+    construir_url_verificacion,
+    guardar_pdf_almacenado,
+    leer_pdf_almacenado,
+    obtener_pdf_certificado,
+    precalentar_renderizado,
+    renderizar_certificado,
+    version_plantilla
+)
+from .models import CertificadoGenerado, TrabajoLote
+from .pdf_utils import EscritorPDFCombinado
+from .roster_utils import leer_filas_padron
+from .verificacion_utils import invalidar_verificacion
+
+logger = logging.getLogger(__name__)
+
+# Filas del PDF único cuyos certificados nuevos se registran de una sola vez
+TAMANO_LOTE_REGISTROS = 100
+
+# Filas cuyos certificados ya emitidos se buscan con una sola consulta
+TAMANO_BLOQUE_EMITIDOS = 200
+
+# Cada cuántos certificados un trabajo en segundo plano guarda su progreso
+INTERVALO_PROGRESO = 10
+
+# Resultado de cada fila en la emisión a un directorio (emitir_lote_en_directorio)
+GENERADO = 'generado'
+OMITIDO = 'omitido'
+FALLIDO = 'fallido'
+
+
+class SalidaZipStreaming:
+    """
+    Destino de escritura no posicionable para zipfile: acumula los bytes escritos
+    hasta que se recogen con vaciar(), de modo que el ZIP puede enviarse por partes
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def nombre_archivo_lote(datos, extension='pdf'):
+    """
+    Nombre del archivo de un certificado dentro del lote
+    """
+    return f'certificado_{datos["nombre"]}.{extension}'
+
+
+def registrar_error_lote(errores, numero_fila, datos, error):
+    """
+    Anota una fila fallida del lote sin interrumpir la generación del resto
+    """
+    logger.warning('Error al generar certificado para %s (fila %s): %s', datos['nombre'], numero_fila, error)
+    if errores is not None:
+        errores.append({'fila': numero_fila, 'dni': datos['dni'], 'nombre': datos['nombre'], 'error': str(error)})
+
+
+def generar_certificados_lote(filas, errores=None):
+    """
+    Genera los certificados de cada fila del lote uno a uno.
+    Devuelve tuplas (nombre_archivo, contenido); las filas con error se omiten
+    y, si se pasa la lista errores, se anotan en ella. Un estudiante repetido en
+    el lote se genera una sola vez.
+    """
+    vistos = set()
+    for numero_fila, datos in enumerate(filas, start=1):
+        clave = (datos['dni'], datos['codigo'])
+        if clave in vistos:
+            continue
+        vistos.add(clave)
+        try:
+            resultado = crear_certificado_completo(datos, formato='pdf')
+        except Exception as e:
+            registrar_error_lote(errores, numero_fila, datos, e)
+            continue
+        yield nombre_archivo_lote(datos), resultado['contenido']
+
+
+def _cerrar_conexiones_heredadas():
+    """
+    Cierra en el proceso de trabajo las conexiones a la base de datos heredadas del padre.
+    Primero se cierra el descriptor del socket para que el cierre no envíe nada por
+    una conexión que el proceso padre sigue usando.
+    """
+    for conexion in connections.all(initialized_only=True):
+        descriptor = getattr(conexion.connection, 'fileno', None)
+        if callable(descriptor):
+            try:
+                os.close(descriptor())
+            except OSError:
+                pass
+        conexion.close()
+
+
+def _inicializar_worker():
+    """
+    Prepara cada proceso de trabajo: sin las conexiones del padre, con Django
+    configurado y con la plantilla y las fuentes ya cargadas
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+    # Ctrl+C llega a todo el grupo de procesos: sólo el padre lo atiende, así las
+    # filas en curso no terminan como fallidas y se retoman en la próxima ejecución
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _cerrar_conexiones_heredadas()
+    precalentar_renderizado()
+
+
+def _renderizar_en_worker(tarea):
+    """
+    Renderiza un certificado dentro de un proceso de trabajo.
+    Nunca lanza excepciones: los errores se devuelven para reportarlos por fila.
+    """
+    datos, id_certificado, url_verificacion = tarea
+    try:
+        return renderizar_certificado(datos, id_certificado, url_verificacion), None
+    except Exception as e:
+        return None, str(e)
+
+
+def numero_procesos_lote(solicitados=None):
+    """
+    Cantidad de procesos para renderizar un lote, limitada a los núcleos disponibles
+    """
+    if solicitados is None:
+        solicitados = getattr(settings, 'LOTE_PROCESOS', 1)
+    return max(1, min(int(solicitados), os.cpu_count() or 1))
+
+
+# Pool de procesos del proceso actual: (configuración, ProcessPoolExecutor)
+_pool_cache = None
+_pool_lock = threading.Lock()
+
+
+def _configuracion_pool(procesos):
+    # Los procesos de trabajo conservan la configuración con la que se crearon
+    return (
+        procesos,
+        settings.MEDIA_ROOT,
+        getattr(settings, 'MOTOR_CERTIFICADO', 'plantilla_word'),
+        getattr(settings, 'QR_MODO', 'vectorial'),
+        getattr(settings, 'CONVERSOR_PDF', 'local'),
+        getattr(settings, 'FUENTES_PDF_DIR', ''),
+    )
+
+
+def obtener_pool_lote(procesos):
+    """
+    Pool de procesos de renderizado, creado la primera vez que se pide y reutilizado
+    por los lotes siguientes; se recrea si cambia la cantidad de procesos o la configuración
+    """
+    global _pool_cache
+    configuracion = _configuracion_pool(procesos)
+    with _pool_lock:
+        if _pool_cache and _pool_cache[0] == configuracion:
+            return _pool_cache[1]
+        if _pool_cache:
+            _pool_cache[1].shutdown(wait=False, cancel_futures=True)
+        executor = ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker)
+        _pool_cache = (configuracion, executor)
+        return executor
+
+
+def descartar_pool_lote(executor=None):
+    """
+    Descarta el pool (p. ej. si un proceso murió y quedó inutilizable);
+    el próximo lote crea uno nuevo
+    """
+    global _pool_cache
+    with _pool_lock:
+        if _pool_cache and executor in (None, _pool_cache[1]):
+            _pool_cache[1].shutdown(wait=False, cancel_futures=True)
+            _pool_cache = None
+
+
+def _enviar_a_worker(executor, tarea):
+    """
+    Envía el renderizado de una fila al pool. Si el pool quedó inutilizable se
+    descarta y la fila se reporta con error, como cualquier otra falla.
+    """
+    try:
+        return executor.submit(_renderizar_en_worker, tarea)
+    except BrokenProcessPool as e:
+        descartar_pool_lote(executor)
+        futuro = Future()
+        futuro.set_result((None, str(e)))
+        return futuro
+
+
+def _resultado_worker(executor, futuro):
+    """
+    Resultado de una tarea del pool como (contenido, error)
+    """
+    try:
+        return futuro.result()
+    except BrokenProcessPool as e:
+        descartar_pool_lote(executor)
+        return None, str(e)
+    except Exception as e:
+        return None, str(e)
+
+
+def asignar_emisiones(filas, version, tamano=TAMANO_BLOQUE_EMITIDOS, numeradas=False):
+    """
+    Asigna a cada fila del lote el ID con el que se emite su certificado.
+    Los certificados ya emitidos con la misma versión de plantilla se buscan por
+    bloques (una consulta por bloque) y conservan su ID; las filas nuevas reciben
+    un ID provisional que se confirma con reclamar_emisiones.
+    Un estudiante repetido en el lote sólo se emite en su primera fila: las
+    siguientes llegan con id_certificado None para que se omitan.
+    Produce (numero_fila, datos, id_certificado, url_verificacion, emitido, ruta_pdf).
+    Las filas se numeran desde 1, salvo que lleguen `numeradas` como (numero_fila, datos).
+    """
+    vistos = set()
+    filas_iter = iter(filas) if numeradas else enumerate(filas, start=1)
+    while True:
+        bloque = list(islice(filas_iter, tamano))
+        if not bloque:
+            break
+
+        emitidos = {}
+        consulta = CertificadoGenerado.objects.filter(
+            version_plantilla=version,
+            dni__in={datos['dni'] for _, datos in bloque}
+        ).order_by('-fecha_generacion').values_list(
+            'dni', 'codigo', 'id_certificado', 'url_verificacion', 'ruta_pdf'
+        )
+        # Orden descendente: la emisión más antigua queda al final y prevalece
+        for dni, codigo, *emision in consulta:
+            emitidos[(dni, codigo)] = emision
+
+        for numero_fila, datos in bloque:
+            clave = (datos['dni'], datos['codigo'])
+            if clave in vistos:
+                yield numero_fila, datos, None, None, True, None
+                continue
+            vistos.add(clave)
+            if clave in emitidos:
+                id_certificado, url_verificacion, ruta_pdf = emitidos[clave]
+                yield numero_fila, datos, str(id_certificado), url_verificacion, True, ruta_pdf
+            else:
+                id_certificado = str(uuid.uuid4())
+                yield numero_fila, datos, id_certificado, construir_url_verificacion(id_certificado), False, None
+
+
+def reclamar_emisiones(nuevas, version):
+    """
+    Registra de una vez los certificados nuevos de un grupo de filas, antes de entregarlos.
+    `nuevas` es una lista de (datos, id_certificado, url_verificacion, ruta_pdf).
+    Se insertan con bulk_create(ignore_conflicts=True) y se vuelven a leer: si otra
+    emisión simultánea (p. ej. una descarga individual) registró antes al mismo
+    estudiante con esa versión (certgen_emision_uniq), prevalece su registro.
+    Devuelve, en el mismo orden, (certificado, propio); propio indica si el registro
+    vigente es el que insertó esta llamada.
+    """
+    if not nuevas:
+        return []
+
+    CertificadoGenerado.objects.bulk_create([
+        CertificadoGenerado(
+            id_certificado=id_certificado,
+            codigo=datos['codigo'],
+            dni=datos['dni'],
+            nombre=datos['nombre'],
+            carrera=datos['carrera'],
+            ruta_pdf=ruta_pdf,
+            url_verificacion=url_verificacion,
+            version_plantilla=version
+        )
+        for datos, id_certificado, url_verificacion, ruta_pdf in nuevas
+    ], ignore_conflicts=True)
+
+    vigentes = {
+        (certificado.dni, certificado.codigo): certificado
+        for certificado in CertificadoGenerado.objects.filter(
+            version_plantilla=version,
+            dni__in={datos['dni'] for datos, *_ in nuevas}
+        )
+    }
+    reclamadas = []
+    for datos, id_certificado, *_ in nuevas:
+        certificado = vigentes[(datos['dni'], datos['codigo'])]
+        reclamadas.append((certificado, str(certificado.id_certificado) == id_certificado))
+
+    # Descarta consultas negativas de los IDs hechas antes del registro
+    invalidar_verificacion([str(certificado.id_certificado) for certificado, propio in reclamadas if propio])
+    return reclamadas
+
+
+def generar_certificados_lote_paralelo(filas, procesos, errores=None):
+    """
+    Genera los certificados del lote en un pool de procesos.
+    Los resultados se entregan en el mismo orden de las filas; los procesos sólo
+    renderizan y el proceso padre registra los certificados nuevos por grupos con
+    reclamar_emisiones antes de entregarlos, así ningún PDF sale sin su registro.
+    Los certificados ya emitidos se reutilizan desde disco sin volver a renderizarlos.
+    Dentro de una transacción (ATOMIC_REQUESTS o un bloque atomic) se genera en serie.
+    """
+    if connection.in_atomic_block:
+        # No se crean procesos con una transacción abierta: los registros se
+        # insertan fila por fila dentro de ella, como en la generación en serie
+        yield from generar_certificados_lote(filas, errores)
+        return
+
+    version = version_plantilla()
+    emisiones = asignar_emisiones(filas, version)
+
+    en_vuelo = deque()
+    listos = []
+    maximo_en_vuelo = procesos * 4
+    executor = obtener_pool_lote(procesos)
+
+    try:
+        while True:
+            # Mantener una ventana acotada de tareas para no acumular PDFs en memoria
+            while len(en_vuelo) < maximo_en_vuelo:
+                siguiente = next(emisiones, None)
+                if siguiente is None:
+                    break
+                numero_fila, datos, id_certificado, url_verificacion, emitido, ruta_pdf = siguiente
+                if id_certificado is None:
+                    continue
+                contenido = leer_pdf_almacenado(ruta_pdf) if ruta_pdf else None
+                if contenido is not None:
+                    futuro = Future()
+                    futuro.set_result((contenido, None))
+                else:
+                    futuro = _enviar_a_worker(executor, (datos, id_certificado, url_verificacion))
+                en_vuelo.append((numero_fila, datos, id_certificado, url_verificacion, emitido, contenido, futuro))
+
+            if en_vuelo:
+                numero_fila, datos, id_certificado, url_verificacion, emitido, almacenado, futuro = en_vuelo.popleft()
+                contenido, error = _resultado_worker(executor, futuro)
+                if error is not None:
+                    registrar_error_lote(errores, numero_fila, datos, error)
+                    continue
+
+                ruta_pdf = None
+                if almacenado is None:
+                    ruta_pdf = guardar_pdf_almacenado(contenido)
+                    if emitido:
+                        # El PDF había sido desalojado del almacén: se actualiza su ubicación
+                        CertificadoGenerado.objects.filter(id_certificado=id_certificado).update(ruta_pdf=ruta_pdf)
+                listos.append((numero_fila, datos, id_certificado, url_verificacion, emitido, contenido, ruta_pdf))
+                if len(listos) < maximo_en_vuelo and en_vuelo:
+                    continue
+
+            if not listos:
+                break
+            yield from _entregar_reclamados(listos, version, errores)
+            listos = []
+    finally:
+        for *_, futuro in en_vuelo:
+            futuro.cancel()
+
+
+def _entregar_reclamados(listos, version, errores):
+    # Registra los certificados nuevos del grupo y recién entonces los entrega
+    nuevas = [
+        (datos, id_certificado, url_verificacion, ruta_pdf)
+        for _, datos, id_certificado, url_verificacion, emitido, _, ruta_pdf in listos
+        if not emitido
+    ]
+    reclamadas = iter(reclamar_emisiones(nuevas, version))
+    for numero_fila, datos, _, _, emitido, contenido, _ in listos:
+        if not emitido:
+            certificado, propio = next(reclamadas)
+            if not propio:
+                # Otra emisión simultánea registró antes al estudiante: se entrega la suya
+                try:
+                    contenido = obtener_pdf_certificado(certificado)
+                except Exception as e:
+                    registrar_error_lote(errores, numero_fila, datos, e)
+                    continue
+        yield nombre_archivo_lote(datos), contenido
+
+
+def nombre_archivo_directorio(datos):
+    """
+    Nombre del PDF en la emisión a un directorio: DNI y código no se repiten
+    entre estudiantes, a diferencia del nombre
+    """
+    return f'certificado_{datos["dni"]}_{datos["codigo"]}.pdf'
+
+
+def escribir_pdf_directorio(directorio, nombre_archivo, contenido):
+    """
+    Escribe el PDF en el directorio de salida de forma atómica (nunca queda a medias)
+    """
+    ruta = os.path.join(directorio, nombre_archivo)
+    with open(f'{ruta}.tmp', 'wb') as f:
+        f.write(contenido)
+    os.replace(f'{ruta}.tmp', ruta)
+    return ruta
+
+
+def emitir_lote_en_directorio(filas_numeradas, directorio, procesos, version, errores=None):
+    """
+    Emite los certificados del padrón directamente en un directorio, sin pasar por la web.
+    Recibe las filas como (numero_fila, datos), así se pueden reintentar filas sueltas.
+    Sigue la semántica de crear_certificado_completo: los estudiantes que ya tienen
+    un certificado con la versión de plantilla `version` (o que se repiten en el
+    padrón) se omiten y los nuevos se registran con esa versión. Los PDFs se
+    renderizan en un pool de procesos, se escriben y se registran por grupos con
+    reclamar_emisiones antes de entregar cada fila, en orden, como
+    (numero_fila, GENERADO | OMITIDO | FALLIDO).
+    """
+    emisiones = asignar_emisiones(filas_numeradas, version, numeradas=True)
+
+    en_vuelo = deque()
+    escritos = []
+    maximo_en_vuelo = procesos * 4
+    executor = obtener_pool_lote(procesos)
+
+    try:
+        while True:
+            while len(en_vuelo) < maximo_en_vuelo:
+                siguiente = next(emisiones, None)
+                if siguiente is None:
+                    break
+                numero_fila, datos, id_certificado, url_verificacion, emitido, _ = siguiente
+                futuro = None if emitido else _enviar_a_worker(executor, (datos, id_certificado, url_verificacion))
+                en_vuelo.append((numero_fila, datos, id_certificado, url_verificacion, futuro))
+
+            if en_vuelo:
+                numero_fila, datos, id_certificado, url_verificacion, futuro = en_vuelo.popleft()
+                if futuro is None:
+                    escritos.append((numero_fila, datos, id_certificado, url_verificacion, None))
+                else:
+                    contenido, error = _resultado_worker(executor, futuro)
+                    ruta = None
+                    if error is None:
+                        try:
+                            ruta = escribir_pdf_directorio(directorio, nombre_archivo_directorio(datos), contenido)
+                        except OSError as e:
+                            error = str(e)
+                    if error is not None:
+                        registrar_error_lote(errores, numero_fila, datos, error)
+                        yield numero_fila, FALLIDO
+                        continue
+                    escritos.append((numero_fila, datos, id_certificado, url_verificacion, ruta))
+                if len(escritos) < maximo_en_vuelo and en_vuelo:
+                    continue
+
+            if not escritos:
+                break
+            yield from _registrar_escritos(escritos, version)
+            escritos = []
+    finally:
+        for *_, futuro in en_vuelo:
+            if futuro is not None:
+                futuro.cancel()
+
+
+def _registrar_escritos(escritos, version):
+    # El PDF queda en el directorio de salida y no se copia al almacén:
+    # si luego se descarga desde la web se renderiza de nuevo con el mismo ID
+    nuevas = [
+        (datos, id_certificado, url_verificacion, '')
+        for _, datos, id_certificado, url_verificacion, ruta in escritos
+        if ruta is not None
+    ]
+    reclamadas = iter(reclamar_emisiones(nuevas, version))
+    for numero_fila, _, _, _, ruta in escritos:
+        if ruta is None:
+            yield numero_fila, OMITIDO
+            continue
+        _, propio = next(reclamadas)
+        if propio:
+            yield numero_fila, GENERADO
+        else:
+            # Otra emisión simultánea registró antes al estudiante con otro ID
+            os.remove(ruta)
+            yield numero_fila, OMITIDO
+
+
+def iterar_pdf_combinado(filas, errores=None):
+    """
+    Produce un único PDF con todos los certificados del lote, por fragmentos.
+    El fondo se incrusta una sola vez y cada página sólo añade la capa variable
+    del motor fondo_pdf (nombre, ID y QR según QR_MODO), así que la memoria no
+    crece con el lote y las páginas coinciden con los certificados individuales.
+    Los estudiantes que ya tienen certificado conservan su ID y los repetidos
+    en el lote aparecen una sola vez.
+    El escritor se crea antes de devolver el iterador: una configuración inválida
+    (p. ej. una fuente no admitida) falla aquí y no a mitad de la respuesta.
+    """
+    return _iterar_pdf_combinado(EscritorPDFCombinado(), filas, errores)
+
+
+def _iterar_pdf_combinado(escritor, filas, errores):
+    version = version_plantilla('fondo_pdf')
+    emisiones = asignar_emisiones(filas, version)
+    yield escritor.iniciar()
+    while True:
+        # Los certificados nuevos se registran por grupos antes de escribir sus páginas,
+        # con el ID vigente si otra emisión simultánea registró antes al estudiante
+        grupo = list(islice(emisiones, TAMANO_LOTE_REGISTROS))
+        if not grupo:
+            break
+        grupo = [emision for emision in grupo if emision[2] is not None]
+        reclamadas = iter(reclamar_emisiones([
+            (datos, id_certificado, url_verificacion, '')
+            for _, datos, id_certificado, url_verificacion, emitido, _ in grupo
+            if not emitido
+        ], version))
+
+        for numero_fila, datos, id_certificado, url_verificacion, emitido, _ in grupo:
+            propio = False
+            if not emitido:
+                certificado, propio = next(reclamadas)
+                id_certificado, url_verificacion = str(certificado.id_certificado), certificado.url_verificacion
+            try:
+                paginas = escritor.agregar_pagina(
+                    {'nombre': datos['nombre'], 'carrera': datos['carrera'], 'id_certificado': id_certificado},
+                    CodigoQR(url_verificacion)
+                )
+            except Exception as e:
+                if propio:
+                    # Sin página no queda un registro que la verificación daría por válido
+                    CertificadoGenerado.objects.filter(id_certificado=id_certificado).delete()
+                registrar_error_lote(errores, numero_fila, datos, e)
+                continue
+            yield paginas
+    yield escritor.finalizar()
+
+
+def texto_errores_lote(errores):
+    """
+    Resumen legible de las filas que no se pudieron generar
+    """
+    lineas = ['fila\tdni\tnombre\terror']
+    for error in errores:
+        lineas.append(f"{error['fila']}\t{error['dni']}\t{error['nombre']}\t{error['error']}")
+    return '\n'.join(lineas) + '\n'
+
+
+def escribir_errores_zip(zip_file, errores):
+    """
+    Agrega al ZIP el detalle de las filas fallidas, si las hubo
+    """
+    if errores:
+        zip_file.writestr('errores_lote.txt', texto_errores_lote(errores), compress_type=zipfile.ZIP_DEFLATED)
+
+
+def escribir_zip_certificados(zip_file, certificados, errores=None):
+    """
+    Agrega los certificados al ZIP y devuelve cuántos se escribieron.
+    Los PDF ya vienen comprimidos, así que se almacenan sin volver a aplicar deflate.
+    """
+    total = 0
+    for nombre_archivo, contenido in certificados:
+        zip_file.writestr(nombre_archivo, contenido, compress_type=zipfile.ZIP_STORED)
+        total += 1
+    escribir_errores_zip(zip_file, errores)
+    return total
+
+
+def iterar_zip_certificados(certificados, errores=None):
+    """
+    Produce el ZIP del lote por fragmentos: cada certificado se envía en cuanto
+    se termina de generar, sin archivos temporales ni el ZIP completo en memoria
+    """
+    salida = SalidaZipStreaming()
+    with zipfile.ZipFile(salida, 'w') as zip_file:
+        for nombre_archivo, contenido in certificados:
+            zip_file.writestr(nombre_archivo, contenido, compress_type=zipfile.ZIP_STORED)
+            yield salida.vaciar()
+        escribir_errores_zip(zip_file, errores)
+    # Directorio central del ZIP
+    yield salida.vaciar()
+
+
+def identificador_worker():
+    """
+    Nombre con el que un worker se registra en los trabajos que reclama
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reclamar_trabajo_lote(worker, expiracion=None):
+    """
+    Reclama el trabajo pendiente más antiguo para este worker.
+    También recupera trabajos en proceso cuyo worker dejó de informar progreso
+    durante más de `expiracion` segundos. Devuelve None si la cola está vacía.
+    """
+    filtro = Q(estado=TrabajoLote.PENDIENTE)
+    if expiracion:
+        limite = timezone.now() - datetime.timedelta(seconds=expiracion)
+        filtro |= Q(estado=TrabajoLote.EN_PROCESO, fecha_actualizacion__lt=limite)
+
+    with transaction.atomic():
+        candidatos = TrabajoLote.objects.filter(filtro).order_by('fecha_creacion')
+        if connections[candidatos.db].features.has_select_for_update_skip_locked:
+            # Varios workers pueden leer la cola a la vez sin bloquearse entre sí
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        trabajo = candidatos.first()
+        if trabajo is None:
+            return None
+
+        # Actualización condicional: si otro worker lo tomó primero no se modifica ninguna fila
+        # (necesaria en bases de datos sin bloqueo de filas, como SQLite)
+        reclamado = TrabajoLote.objects.filter(
+            pk=trabajo.pk,
+            estado=trabajo.estado,
+            fecha_actualizacion=trabajo.fecha_actualizacion
+        ).update(
+            estado=TrabajoLote.EN_PROCESO,
+            worker=worker,
+            fecha_inicio=timezone.now(),
+            fecha_actualizacion=timezone.now(),
+            procesados=0,
+            fallidos=0
+        )
+    if not reclamado:
+        return None
+
+    trabajo.refresh_from_db()
+    return trabajo
+
+
+def ruta_resultado_lote(trabajo):
+    """
+    Ruta relativa a MEDIA_ROOT del ZIP generado por un trabajo
+    """
+    return os.path.join('lotes', 'resultados', f'certificados_{trabajo.id_trabajo}.zip')
+
+
+def procesar_trabajo_lote(trabajo, procesos=1):
+    """
+    Genera los certificados de un trabajo reclamado y escribe el ZIP en MEDIA_ROOT.
+    El progreso se guarda periódicamente para que pueda consultarse mientras se procesa.
+    """
+    try:
+        filas = list(leer_filas_padron(trabajo.archivo_excel.path, limite=trabajo.cantidad))
+        TrabajoLote.objects.filter(pk=trabajo.pk).update(total=len(filas), fecha_actualizacion=timezone.now())
+
+        errores = []
+        if procesos > 1:
+            certificados = generar_certificados_lote_paralelo(filas, procesos, errores)
+        else:
+            certificados = generar_certificados_lote(filas, errores)
+
+        ruta_relativa = ruta_resultado_lote(trabajo)
+        ruta_absoluta = os.path.join(settings.MEDIA_ROOT, ruta_relativa)
+        os.makedirs(os.path.dirname(ruta_absoluta), exist_ok=True)
+        ruta_temporal = f'{ruta_absoluta}.tmp'
+
+        procesados = 0
+        with zipfile.ZipFile(ruta_temporal, 'w') as zip_file:
+            for nombre_archivo, contenido in certificados:
+                zip_file.writestr(nombre_archivo, contenido, compress_type=zipfile.ZIP_STORED)
+                procesados += 1
+                if procesados % INTERVALO_PROGRESO == 0:
+                    TrabajoLote.objects.filter(pk=trabajo.pk).update(
+                        procesados=procesados,
+                        fallidos=len(errores),
+                        fecha_actualizacion=timezone.now()
+                    )
+            escribir_errores_zip(zip_file, errores)
+        os.replace(ruta_temporal, ruta_absoluta)
+
+        TrabajoLote.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoLote.COMPLETADO,
+            procesados=procesados,
+            fallidos=len(errores),
+            archivo_resultado=ruta_relativa,
+            fecha_fin=timezone.now(),
+            fecha_actualizacion=timezone.now()
+        )
+    except Exception as e:
+        TrabajoLote.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoLote.ERROR,
+            mensaje_error=str(e),
+            fecha_fin=timezone.now(),
+            fecha_actualizacion=timezone.now()
+        )
+    trabajo.refresh_from_db()
+    return trabajo
@@ -0,0 +1,210 @@
+import json
+import math
+import shutil
+import tempfile
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from generador.document_utils import (
+    CodigoQR,
+    construir_url_verificacion,
+    convertir_a_pdf,
+    crear_certificado_completo,
+    renderizar_docx_certificado
+)
+from generador.models import CertificadoGenerado
+from generador.pdf_utils import generar_certificado_sobre_fondo, ruta_fondo_pdf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentil(valores, fraccion):
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada
+    """
+    indice = max(math.ceil(fraccion * len(valores)) - 1, 0)
+    return valores[indice]
+
+
+def rss_maximo_mb():
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB y macOS bytes
+    return round(maximo / 1024 if maximo < 1 << 32 else maximo / (1024 * 1024), 1)
+
+
+def filas_sinteticas(cantidad):
+    for i in range(cantidad):
+        yield {
+            'dni': f'9{i:07d}',
+            'codigo': f'BENCH{i:05d}',
+            'nombre': f'ESTUDIANTE DE PRUEBA NUMERO {i}',
+            'carrera': 'TECNOLOGÍA MÉDICA - TERAPIA FÍSICA Y REHABILITACIÓN',
+        }
+
+
+class _Revertir(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Mide la latencia por etapa de la generación de certificados (QR, plantilla Word, '
+            'conversión, fondo PDF, base de datos y proceso completo) y la compara con una línea base')
+
+    ETAPAS = ('qr_png', 'qr_matriz', 'plantilla_word', 'conversion_pdf', 'fondo_pdf', 'registro_bd',
+              'crear_certificado_completo')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=20,
+                            help='Filas sintéticas del padrón a procesar en cada etapa')
+        parser.add_argument('--calentamiento', type=int, default=1,
+                            help='Ejecuciones previas no medidas por etapa (cargan plantillas y fuentes)')
+        parser.add_argument('--etapas', default=','.join(self.ETAPAS),
+                            help='Etapas a medir, separadas por comas')
+        parser.add_argument('--salida', help='Guardar el resultado JSON en este archivo')
+        parser.add_argument('--linea-base', help='Resultado JSON previo con el que comparar')
+        parser.add_argument('--umbral', type=float, default=0.2,
+                            help='Aumento relativo del p95 tolerado frente a la línea base (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        etapas = [etapa.strip() for etapa in options['etapas'].split(',') if etapa.strip()]
+        desconocidas = set(etapas) - set(self.ETAPAS)
+        if desconocidas:
+            raise CommandError(f"Etapas desconocidas: {', '.join(sorted(desconocidas))}")
+
+        filas = list(filas_sinteticas(options['filas']))
+        media_root = tempfile.mkdtemp(prefix='benchmark_certificados_')
+        inicio = time.perf_counter()
+        try:
+            # Todo se ejecuta en una transacción revertida y con MEDIA_ROOT temporal:
+            # el benchmark no deja certificados ni archivos
+            with override_settings(MEDIA_ROOT=media_root, CERTIFICADO_PDF_FONDO=ruta_fondo_pdf()), \
+                    transaction.atomic():
+                resultados = {
+                    etapa: self.medir(etapa, filas, options['calentamiento']) for etapa in etapas
+                }
+                raise _Revertir
+        except _Revertir:
+            pass
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        informe = {
+            'filas': len(filas),
+            'segundos_totales': round(time.perf_counter() - inicio, 3),
+            'rss_maximo_mb': rss_maximo_mb(),
+            'etapas': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        self.stdout.write(texto)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                f.write(texto + '\n')
+
+        if options['linea_base']:
+            self.comparar(informe, options['linea_base'], options['umbral'])
+
+    def medir(self, etapa, filas, calentamiento=0):
+        preparar = getattr(self, f'preparar_{etapa}', lambda datos: (datos,))
+        operacion = getattr(self, f'etapa_{etapa}')
+        for datos in filas[:calentamiento]:
+            operacion(*preparar(datos))
+
+        tiempos = []
+        for datos in filas:
+            argumentos = preparar(datos)
+            comienzo = time.perf_counter()
+            operacion(*argumentos)
+            tiempos.append(time.perf_counter() - comienzo)
+
+        tiempos.sort()
+        total = sum(tiempos)
+        return {
+            'n': len(tiempos),
+            'p50_ms': round(percentil(tiempos, 0.50) * 1000, 3),
+            'p95_ms': round(percentil(tiempos, 0.95) * 1000, 3),
+            'max_ms': round(tiempos[-1] * 1000, 3),
+            'por_segundo': round(len(tiempos) / total, 2) if total else None,
+        }
+
+    # Cada etapa recibe lo que prepara su preparar_<etapa>, que no se cronometra
+
+    def _qr(self, datos):
+        id_certificado = str(uuid.uuid4())
+        return CodigoQR(construir_url_verificacion(id_certificado)), id_certificado
+
+    def preparar_qr_png(self, datos):
+        return (construir_url_verificacion(str(uuid.uuid4())),)
+
+    def etapa_qr_png(self, url):
+        CodigoQR(url).png()
+
+    preparar_qr_matriz = preparar_qr_png
+
+    def etapa_qr_matriz(self, url):
+        CodigoQR(url).matriz
+
+    def preparar_plantilla_word(self, datos):
+        qr, id_certificado = self._qr(datos)
+        qr.png()
+        return datos, qr, id_certificado
+
+    def etapa_plantilla_word(self, datos, qr, id_certificado):
+        renderizar_docx_certificado(datos, qr, id_certificado)
+
+    def preparar_conversion_pdf(self, datos):
+        return (renderizar_docx_certificado(datos, *self._qr(datos)),)
+
+    def etapa_conversion_pdf(self, docx_bytes):
+        convertir_a_pdf(docx_bytes)
+
+    def preparar_fondo_pdf(self, datos):
+        return (datos, *self._qr(datos))
+
+    def etapa_fondo_pdf(self, datos, qr, id_certificado):
+        generar_certificado_sobre_fondo(datos, qr, id_certificado)
+
+    def etapa_registro_bd(self, datos):
+        id_certificado = str(uuid.uuid4())
+        CertificadoGenerado.objects.create(
+            id_certificado=id_certificado,
+            url_verificacion=construir_url_verificacion(id_certificado),
+            **datos
+        )
+
+    def preparar_crear_certificado_completo(self, datos):
+        # DNI único por medición para que la emisión no se reutilice
+        return ({**datos, 'dni': f'8{uuid.uuid4().int % 10 ** 7:07d}'},)
+
+    def etapa_crear_certificado_completo(self, datos):
+        crear_certificado_completo(datos, formato='pdf')
+
+    def comparar(self, informe, ruta, umbral):
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                base = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer la línea base {ruta}: {e}')
+
+        regresiones = []
+        for etapa, actual in informe['etapas'].items():
+            anterior = base.get('etapas', {}).get(etapa)
+            if not anterior or not anterior.get('p95_ms'):
+                continue
+            cambio = actual['p95_ms'] / anterior['p95_ms'] - 1
+            linea = f"{etapa}: p95 {anterior['p95_ms']:.3f} ms -> {actual['p95_ms']:.3f} ms ({cambio:+.1%})"
+            if cambio > umbral:
+                regresiones.append(linea)
+                self.stderr.write(self.style.ERROR(linea))
+            else:
+                self.stderr.write(linea)
+
+        if regresiones:
+            raise CommandError(f'{len(regresiones)} etapa(s) superan el umbral de {umbral:.0%} frente a la línea base')
+        self.stderr.write(self.style.SUCCESS('Sin regresiones frente a la línea base'))
@@ -0,0 +1,181 @@
+import json
+import os
+import signal
+import time
+from django.core.management.base import BaseCommand, CommandError
+from generador.document_utils import version_plantilla
+from generador.lote_utils import (
+    FALLIDO,
+    GENERADO,
+    emitir_lote_en_directorio,
+    numero_procesos_lote,
+    texto_errores_lote
+)
+from generador.roster_utils import contar_filas_padron, leer_filas_padron
+
+# Cada cuántas filas se anota el avance
+INTERVALO_AVANCE = 200
+
+ARCHIVO_AVANCE = '.avance_emision.json'
+
+
+def identidad_padron(ruta):
+    stat = os.stat(ruta)
+    return {'padron': os.path.abspath(ruta), 'tamano': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def leer_avance(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def escribir_avance(ruta, avance):
+    # Reemplazo atómico: una interrupción nunca deja el archivo de avance a medias
+    with open(f'{ruta}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(avance, f, indent=2)
+    os.replace(f'{ruta}.tmp', ruta)
+
+
+def filas_por_emitir(padron, fila, pendientes):
+    """
+    (numero_fila, datos) de las filas posteriores a `fila` y de las anteriores
+    que quedaron con error, para reintentarlas
+    """
+    for numero_fila, datos in enumerate(leer_filas_padron(padron), start=1):
+        if numero_fila > fila or numero_fila in pendientes:
+            yield numero_fila, datos
+
+
+def _interrumpir(signum, frame):
+    # SIGTERM (p. ej. al detener el servicio) se trata igual que Ctrl+C
+    raise KeyboardInterrupt
+
+
+def formatear_duracion(segundos):
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f'{horas}h{minutos:02d}m{segundos:02d}s' if horas else f'{minutos}m{segundos:02d}s'
+
+
+class Command(BaseCommand):
+    help = (
+        'Emite los certificados de un padrón Excel directamente en un directorio, sin pasar por la web. '
+        'Usa todos los núcleos, omite a los estudiantes que ya tienen certificado y, si se interrumpe, '
+        'la siguiente ejecución continúa desde la última fila anotada y reintenta las filas con error.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('padron', help='Excel con las columnas DNI, NOMBRES, CARRERA y CODIGO')
+        parser.add_argument('salida', help='Directorio donde se escriben los PDFs')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help='Procesos de renderizado (por defecto todos los núcleos)')
+        parser.add_argument('--avance', default=None,
+                            help=f'Archivo de avance (por defecto <salida>/{ARCHIVO_AVANCE})')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Ignorar el avance guardado y empezar desde la primera fila')
+        parser.add_argument('--intervalo', type=float, default=5.0,
+                            help='Segundos entre cada línea de progreso')
+
+    def handle(self, *args, **options):
+        padron = options['padron']
+        salida = options['salida']
+        if not os.path.exists(padron):
+            raise CommandError(f'No existe el padrón {padron}')
+        os.makedirs(salida, exist_ok=True)
+
+        procesos = numero_procesos_lote(options['procesos'])
+        ruta_avance = options['avance'] or os.path.join(salida, ARCHIVO_AVANCE)
+        version = version_plantilla()
+        identidad = identidad_padron(padron)
+
+        avance = None if options['reiniciar'] else leer_avance(ruta_avance)
+        if avance is not None:
+            if {clave: avance.get(clave) for clave in identidad} != identidad:
+                raise CommandError(
+                    f'El avance de {ruta_avance} corresponde a otro padrón o a una versión anterior '
+                    f'del archivo; use --reiniciar para empezar de nuevo'
+                )
+            if avance.get('version_plantilla') != version:
+                raise CommandError(
+                    f'La plantilla cambió desde la ejecución anterior ({avance.get("version_plantilla")}); '
+                    f'use --reiniciar para emitir con la versión actual'
+                )
+            self.stdout.write(
+                f'Reanudando después de la fila {avance["fila"]}; '
+                f'se reintentan {len(avance.get("pendientes", []))} filas con error'
+            )
+        else:
+            avance = {**identidad, 'version_plantilla': version, 'fila': 0,
+                      'generados': 0, 'omitidos': 0, 'fallidos': 0, 'pendientes': []}
+
+        # Filas con error: se anotan en el avance y se reintentan en la próxima ejecución
+        pendientes = set(avance.get('pendientes', []))
+        total = contar_filas_padron(padron)
+        filas = filas_por_emitir(padron, avance['fila'], pendientes)
+        errores = []
+        self.stdout.write(f'Emitiendo en {salida} con {procesos} procesos')
+
+        comienzo = time.monotonic()
+        ultimo_reporte = comienzo
+        filas_sesion = 0
+        generados_sesion = 0
+        resultados = emitir_lote_en_directorio(filas, salida, procesos, version, errores=errores)
+        senal_anterior = signal.signal(signal.SIGTERM, _interrumpir)
+        try:
+            for numero_fila, estado in resultados:
+                if estado == FALLIDO:
+                    pendientes.add(numero_fila)
+                else:
+                    pendientes.discard(numero_fila)
+                    avance['generados' if estado == GENERADO else 'omitidos'] += 1
+                # Los reintentos son filas anteriores: el avance nunca retrocede
+                avance['fila'] = max(avance['fila'], numero_fila)
+                filas_sesion += 1
+                generados_sesion += estado == GENERADO
+
+                if filas_sesion % INTERVALO_AVANCE == 0:
+                    self.anotar_avance(ruta_avance, avance, pendientes)
+
+                ahora = time.monotonic()
+                if ahora - ultimo_reporte >= options['intervalo']:
+                    ultimo_reporte = ahora
+                    self.reportar(avance, total, filas_sesion, generados_sesion, ahora - comienzo)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f'Interrumpido; la próxima ejecución continuará después de la fila {avance["fila"]}'
+            )
+        finally:
+            signal.signal(signal.SIGTERM, senal_anterior)
+            resultados.close()
+            self.anotar_avance(ruta_avance, avance, pendientes)
+            if errores:
+                with open(os.path.join(salida, 'errores_lote.txt'), 'a', encoding='utf-8') as f:
+                    f.write(texto_errores_lote(errores))
+
+        transcurrido = time.monotonic() - comienzo
+        self.reportar(avance, total, filas_sesion, generados_sesion, transcurrido)
+        self.stdout.write(self.style.SUCCESS(
+            f'Emisión completada: {avance["generados"]} generados, {avance["omitidos"]} omitidos '
+            f'(ya emitidos), {avance["fallidos"]} con error'
+            f'{" (se reintentan en la próxima ejecución)" if avance["fallidos"] else ""}'
+        ))
+
+    def anotar_avance(self, ruta_avance, avance, pendientes):
+        # Cada fila entregada ya está registrada: una fila anotada siempre está en la base de datos
+        avance['pendientes'] = sorted(pendientes)
+        avance['fallidos'] = len(pendientes)
+        escribir_avance(ruta_avance, avance)
+
+    def reportar(self, avance, total, filas_sesion, generados_sesion, transcurrido):
+        filas_por_segundo = filas_sesion / transcurrido if transcurrido else 0.0
+        linea = (
+            f'Fila {avance["fila"]}{f"/{total}" if total else ""}: '
+            f'{generados_sesion / transcurrido if transcurrido else 0.0:.1f} certificados/s'
+        )
+        if total and filas_por_segundo:
+            restantes = max(total - avance['fila'], 0)
+            linea += f', ETA {formatear_duracion(restantes / filas_por_segundo)}'
+        self.stdout.write(linea)
@@ -0,0 +1,30 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from generador.roster_utils import importar_padron, ruta_padron
+
+
+class Command(BaseCommand):
+    help = (
+        'Reemplaza el padrón de estudiantes de la base de datos por el de un Excel '
+        '(por defecto el último subido, media/plantillas/BD_CERTIFICADOS.xlsx)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('padron', nargs='?', default=None,
+                            help='Excel con las columnas DNI, NOMBRES, CARRERA y CODIGO')
+
+    def handle(self, *args, **options):
+        padron = options['padron'] or ruta_padron()
+        if not os.path.exists(padron):
+            raise CommandError(f'No existe el padrón {padron}')
+
+        try:
+            resumen = importar_padron(padron)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Padrón reemplazado: {resumen["insertadas"]} nuevos, {resumen["actualizadas"]} actualizados, '
+            f'{resumen["eliminadas"]} retirados y {resumen["omitidas"]} filas repetidas '
+            f'({resumen["leidas"]} filas en {resumen["segundos"]:.2f} s)'
+        ))
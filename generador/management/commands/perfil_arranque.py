@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Paquetes del motor de renderizado que un worker de sólo verificación no debería cargar
+PAQUETES_RENDERIZADO = (
+    'docxtpl', 'docx', 'reportlab', 'qrcode', 'PIL', 'pypdf', 'openpyxl', 'pandas', 'numpy', 'lxml'
+)
+
+# Lo que hace un worker de gunicorn al arrancar: configurar Django y cargar las URLs
+CODIGO_ARRANQUE = '''
+import importlib, sys, time
+comienzo = time.perf_counter()
+import django
+django.setup()
+importlib.import_module({modulo!r})
+segundos = time.perf_counter() - comienzo
+try:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    rss_mb = 0
+print(segundos, rss_mb, ' '.join(sorted(sys.modules)))
+'''
+
+
+def leer_importtime(texto):
+    """
+    Líneas de `python -X importtime`: lista de (módulo, propio_us, acumulado_us)
+    """
+    modulos = []
+    for linea in texto.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        modulos.append((modulo.strip(), int(propio), int(acumulado)))
+    return modulos
+
+
+class Command(BaseCommand):
+    help = (
+        'Informe del arranque de un worker: tiempo y memoria de importar Django y las URLs, '
+        'paquetes más costosos (python -X importtime) y paquetes de renderizado cargados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modulo', default=None,
+                            help='Módulo a importar tras django.setup() (por defecto ROOT_URLCONF)')
+        parser.add_argument('--limite', type=int, default=15,
+                            help='Paquetes a mostrar, del más costoso al menos costoso')
+        parser.add_argument('--precalentar', action='store_true',
+                            help='Arrancar con CERTIFICADOS_PRECALENTAR=true')
+
+    def handle(self, *args, **options):
+        modulo = options['modulo'] or settings.ROOT_URLCONF
+        entorno = dict(os.environ)
+        entorno.setdefault('DJANGO_SETTINGS_MODULE', 'certificados.settings')
+        entorno['CERTIFICADOS_PRECALENTAR'] = 'true' if options['precalentar'] else 'false'
+
+        # Un intérprete nuevo: en este proceso los módulos ya están importados
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CODIGO_ARRANQUE.format(modulo=modulo)],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f'El arranque falló:\n{proceso.stderr[-2000:]}')
+
+        segundos, rss_mb, cargados = proceso.stdout.strip().splitlines()[-1].split(' ', 2)
+        cargados = set(cargados.split())
+
+        por_paquete = {}
+        for nombre, propio, _ in leer_importtime(proceso.stderr):
+            paquete = nombre.split('.')[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + propio
+
+        self.stdout.write(f'Arranque de {modulo}: {float(segundos):.2f} s, RSS máximo {float(rss_mb):.0f} MB')
+        self.stdout.write(f'{len(cargados)} módulos importados; paquetes más costosos (tiempo propio):')
+        ordenados = sorted(por_paquete.items(), key=lambda par: par[1], reverse=True)
+        for paquete, microsegundos in ordenados[:options['limite']]:
+            self.stdout.write(f'  {microsegundos / 1000:9.1f} ms  {paquete}')
+
+        renderizado = [paquete for paquete in PAQUETES_RENDERIZADO if paquete in cargados]
+        if renderizado:
+            self.stdout.write(self.style.WARNING(f'Paquetes de renderizado cargados: {", ".join(renderizado)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No se cargó ningún paquete de renderizado'))
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from generador.lote_utils import (
+    identificador_worker,
+    numero_procesos_lote,
+    procesar_trabajo_lote,
+    reclamar_trabajo_lote
+)
+
+
+class Command(BaseCommand):
+    help = 'Worker que procesa los lotes de certificados encolados en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar los trabajos pendientes y terminar')
+        parser.add_argument('--intervalo', type=float, default=5.0,
+                            help='Segundos de espera entre consultas cuando la cola está vacía')
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='Procesos para renderizar cada lote (por defecto LOTE_PROCESOS)')
+        parser.add_argument('--expiracion', type=int, default=600,
+                            help='Segundos sin progreso tras los que se recupera un trabajo en proceso')
+
+    def handle(self, *args, **options):
+        worker = identificador_worker()
+        procesos = numero_procesos_lote(options['procesos'])
+        self.stdout.write(f'Worker {worker} iniciado ({procesos} procesos por lote)')
+
+        while True:
+            trabajo = reclamar_trabajo_lote(worker, expiracion=options['expiracion'])
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Procesando lote {trabajo.id_trabajo} ({trabajo.cantidad} certificados)')
+            trabajo = procesar_trabajo_lote(trabajo, procesos=procesos)
+            if trabajo.estado == trabajo.COMPLETADO:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Lote {trabajo.id_trabajo} completado: {trabajo.procesados} generados, {trabajo.fallidos} con error'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'Lote {trabajo.id_trabajo} falló: {trabajo.mensaje_error}'
+                ))
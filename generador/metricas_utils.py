@@ -0,0 +1,139 @@
+"""
+Medición por etapas de la emisión de certificados (QR, plantilla, conversión,
+almacén y base de datos).
+Cada tramo medido se acumula en histogramas del proceso, expuestos en formato de
+texto de Prometheus por la vista /metrics, y en la lista de tramos de la petición
+en curso, que descargar_plantilla devuelve en la cabecera Server-Timing.
+Los histogramas son por proceso: con varios workers de gunicorn cada uno publica los suyos.
+"""
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de las cubetas de los histogramas
+CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+NOMBRE_METRICA = 'certificados_etapa_segundos'
+
+# Tramos de la petición en curso (None fuera de registrar_tramos) y motor de renderizado
+_tramos_actuales = contextvars.ContextVar('tramos_actuales', default=None)
+_motor_actual = contextvars.ContextVar('motor_actual', default='')
+
+
+class Histograma:
+    """
+    Cuenta de observaciones por cubeta, suma y total de un par (etapa, motor)
+    """
+
+    def __init__(self):
+        self.cubetas = [0] * len(CUBETAS_SEGUNDOS)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, segundos):
+        indice = bisect.bisect_left(CUBETAS_SEGUNDOS, segundos)
+        if indice < len(self.cubetas):
+            self.cubetas[indice] += 1
+        self.suma += segundos
+        self.cuenta += 1
+
+
+_histogramas = {}
+_histogramas_lock = threading.Lock()
+
+
+def observar(etapa, motor, segundos):
+    with _histogramas_lock:
+        histograma = _histogramas.get((etapa, motor))
+        if histograma is None:
+            histograma = _histogramas[(etapa, motor)] = Histograma()
+        histograma.observar(segundos)
+
+
+def reiniciar_metricas():
+    """
+    Vacía los histogramas del proceso (útil en pruebas)
+    """
+    with _histogramas_lock:
+        _histogramas.clear()
+
+
+@contextlib.contextmanager
+def medir(etapa, motor=None):
+    """
+    Mide el bloque como un tramo de la etapa indicada. Si no se indica el motor se
+    hereda del tramo que lo contiene, así las etapas internas quedan asociadas al
+    motor con el que se emite el certificado.
+    """
+    motor = motor or _motor_actual.get()
+    token = _motor_actual.set(motor)
+    comienzo = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - comienzo
+        _motor_actual.reset(token)
+        observar(etapa, motor, segundos)
+        tramos = _tramos_actuales.get()
+        if tramos is not None:
+            tramos.append((etapa, segundos))
+        logger.debug('%s (%s): %.1f ms', etapa, motor or '-', segundos * 1000)
+
+
+@contextlib.contextmanager
+def registrar_tramos():
+    """
+    Reúne los tramos medidos dentro del bloque: lista de (etapa, segundos)
+    """
+    tramos = []
+    token = _tramos_actuales.set(tramos)
+    try:
+        yield tramos
+    finally:
+        _tramos_actuales.reset(token)
+
+
+def cabecera_server_timing(tramos):
+    """
+    Valor de la cabecera Server-Timing con la duración de cada etapa en ms
+    (los tramos repetidos de una misma etapa se suman)
+    """
+    duraciones = {}
+    for etapa, segundos in tramos:
+        duraciones[etapa] = duraciones.get(etapa, 0.0) + segundos
+    return ', '.join(f'{etapa};dur={segundos * 1000:.1f}' for etapa, segundos in duraciones.items())
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def texto_prometheus():
+    """
+    Histogramas del proceso en el formato de texto de Prometheus (versión 0.0.4)
+    """
+    with _histogramas_lock:
+        copia = {
+            clave: (list(histograma.cubetas), histograma.suma, histograma.cuenta)
+            for clave, histograma in _histogramas.items()
+        }
+
+    lineas = [
+        f'# HELP {NOMBRE_METRICA} Duración de cada etapa de la emisión de certificados.',
+        f'# TYPE {NOMBRE_METRICA} histogram',
+    ]
+    for (etapa, motor), (cubetas, suma, cuenta) in sorted(copia.items()):
+        etiquetas = f'etapa="{_etiqueta(etapa)}",motor="{_etiqueta(motor)}"'
+        acumulado = 0
+        for limite, cantidad in zip(CUBETAS_SEGUNDOS, cubetas):
+            acumulado += cantidad
+            lineas.append(f'{NOMBRE_METRICA}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+        lineas.append(f'{NOMBRE_METRICA}_bucket{{{etiquetas},le="+Inf"}} {cuenta}')
+        lineas.append(f'{NOMBRE_METRICA}_sum{{{etiquetas}}} {suma}')
+        lineas.append(f'{NOMBRE_METRICA}_count{{{etiquetas}}} {cuenta}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0002_certificadogenerado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Estudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dni', models.CharField(max_length=20)),
+                ('codigo', models.CharField(max_length=50)),
+                ('nombre', models.CharField(max_length=200)),
+                ('carrera', models.CharField(max_length=200)),
+                ('fecha_carga', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dni'], name='estudiante_dni_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dni', 'codigo'), name='estudiante_dni_codigo_uniq')],
+            },
+        ),
+    ]
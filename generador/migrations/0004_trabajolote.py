@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:00
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0003_estudiante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_trabajo', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo_excel', models.FileField(upload_to='lotes/entrada/')),
+                ('archivo_resultado', models.CharField(blank=True, max_length=255, null=True)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('procesados', models.PositiveIntegerField(default=0)),
+                ('fallidos', models.PositiveIntegerField(default=0)),
+                ('mensaje_error', models.TextField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=200, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='trabajolote_cola_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0004_trabajolote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificadogenerado',
+            name='version_plantilla',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='certificadogenerado',
+            index=models.Index(fields=['dni', 'codigo', 'version_plantilla'], name='certgen_emision_idx'),
+        ),
+    ]
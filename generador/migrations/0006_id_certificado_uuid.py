@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:13
+
+import uuid
+from django.db import migrations, models
+
+
+def quitar_guiones(apps, schema_editor):
+    # Fuera de PostgreSQL el UUID se guarda como char(32) sin guiones
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    CertificadoGenerado = apps.get_model('generador', 'CertificadoGenerado')
+    CertificadoGenerado.objects.update(id_certificado=models.Func(
+        models.F('id_certificado'), models.Value('-'), models.Value(''), function='REPLACE'
+    ))
+
+
+def restaurar_guiones(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    CertificadoGenerado = apps.get_model('generador', 'CertificadoGenerado')
+    for pk, id_certificado in CertificadoGenerado.objects.values_list('pk', 'id_certificado').iterator():
+        CertificadoGenerado.objects.filter(pk=pk).update(id_certificado=str(uuid.UUID(id_certificado)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0005_emision_idempotente'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_guiones, restaurar_guiones),
+        migrations.AlterField(
+            model_name='certificadogenerado',
+            name='id_certificado',
+            field=models.UUIDField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificadogenerado',
+            index=models.Index(fields=['fecha_generacion', 'id'], name='certgen_fecha_idx'),
+        ),
+    ]
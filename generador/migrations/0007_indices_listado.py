@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0006_id_certificado_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificadogenerado',
+            index=models.Index(fields=['carrera', 'fecha_generacion', 'id'], name='certgen_carrera_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificadogenerado',
+            index=models.Index(fields=['nombre'], name='certgen_nombre_idx'),
+        ),
+    ]
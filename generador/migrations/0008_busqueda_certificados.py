@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:02
+#
+# Índice de texto para la búsqueda de certificados (ver generador/busqueda_utils.py).
+# En SQLite la tabla FTS5 se sincroniza con triggers: si una migración posterior
+# reconstruye generador_certificadogenerado (AlterField en SQLite) debe volver a crearlos.
+
+from django.db import migrations
+
+TABLA_CERTIFICADOS = 'generador_certificadogenerado'
+TABLA_FTS = 'generador_certificadogenerado_fts'
+EXPRESION_TRIGRAMAS = "(nombre || ' ' || dni || ' ' || carrera)"
+
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5(
+        nombre, dni, carrera,
+        content='{TABLA_CERTIFICADOS}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER certgen_fts_insertar AFTER INSERT ON {TABLA_CERTIFICADOS} BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, nombre, dni, carrera) VALUES (new.id, new.nombre, new.dni, new.carrera);
+    END""",
+    f"""CREATE TRIGGER certgen_fts_eliminar AFTER DELETE ON {TABLA_CERTIFICADOS} BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre, dni, carrera)
+        VALUES ('delete', old.id, old.nombre, old.dni, old.carrera);
+    END""",
+    f"""CREATE TRIGGER certgen_fts_actualizar AFTER UPDATE OF nombre, dni, carrera ON {TABLA_CERTIFICADOS} BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre, dni, carrera)
+        VALUES ('delete', old.id, old.nombre, old.dni, old.carrera);
+        INSERT INTO {TABLA_FTS}(rowid, nombre, dni, carrera) VALUES (new.id, new.nombre, new.dni, new.carrera);
+    END""",
+    # Indexar los certificados emitidos antes de la migración
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')",
+]
+
+SQL_SQLITE_REVERSO = [
+    'DROP TRIGGER IF EXISTS certgen_fts_insertar',
+    'DROP TRIGGER IF EXISTS certgen_fts_eliminar',
+    'DROP TRIGGER IF EXISTS certgen_fts_actualizar',
+    f'DROP TABLE IF EXISTS {TABLA_FTS}',
+]
+
+SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS certgen_busqueda_trgm ON {TABLA_CERTIFICADOS} '
+    f'USING gin ({EXPRESION_TRIGRAMAS} gin_trgm_ops)',
+]
+
+SQL_POSTGRESQL_REVERSO = [
+    'DROP INDEX IF EXISTS certgen_busqueda_trgm',
+]
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'sqlite': SQL_SQLITE, 'postgresql': SQL_POSTGRESQL}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'sqlite': SQL_SQLITE_REVERSO, 'postgresql': SQL_POSTGRESQL_REVERSO}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0007_indices_listado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+def separar_emisiones_duplicadas(apps, schema_editor):
+    # Emisiones repetidas por carreras previas a la restricción: se conserva como
+    # emisión la más antigua; las demás siguen siendo verificables, sin versión
+    CertificadoGenerado = apps.get_model('generador', 'CertificadoGenerado')
+    duplicadas = (
+        CertificadoGenerado.objects.exclude(version_plantilla='')
+        .values('dni', 'codigo', 'version_plantilla')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for emision in duplicadas:
+        ids = list(
+            CertificadoGenerado.objects.filter(
+                dni=emision['dni'], codigo=emision['codigo'], version_plantilla=emision['version_plantilla']
+            ).order_by('fecha_generacion', 'id').values_list('id', flat=True)
+        )
+        CertificadoGenerado.objects.filter(id__in=ids[1:]).update(version_plantilla='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0008_busqueda_certificados'),
+    ]
+
+    operations = [
+        migrations.RunPython(separar_emisiones_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='certificadogenerado',
+            constraint=models.UniqueConstraint(condition=models.Q(('version_plantilla', ''), _negated=True), fields=('dni', 'codigo', 'version_plantilla'), name='certgen_emision_uniq'),
+        ),
+    ]
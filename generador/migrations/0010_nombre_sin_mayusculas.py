@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generador', '0009_emision_unica'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='certificadogenerado',
+            name='certgen_nombre_idx',
+        ),
+        migrations.AddIndex(
+            model_name='certificadogenerado',
+            index=models.Index(django.db.models.functions.text.Upper('nombre'), name='certgen_nombre_upper_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+import uuid
 from django.db import models
+from django.db.models.functions import Upper
 
 class Certificado(models.Model):
     nombre = models.CharField(max_length=200)
@@ -8,7 +10,7 @@ class Certificado(models.Model):
         return self.nombre
 
 class CertificadoGenerado(models.Model):
-    id_certificado = models.CharField(max_length=100, unique=True)
+    id_certificado = models.UUIDField(unique=True)
     codigo = models.CharField(max_length=50)
     dni = models.CharField(max_length=20)
     nombre = models.CharField(max_length=200)
@@ -17,6 +19,91 @@ class CertificadoGenerado(models.Model):
     ruta_pdf = models.CharField(max_length=255, blank=True, null=True)
     ruta_qr = models.CharField(max_length=255, blank=True, null=True)
     url_verificacion = models.CharField(max_length=255, blank=True, null=True)
+    # Motor y hash de la plantilla con que se emitió (ver document_utils.version_plantilla)
+    version_plantilla = models.CharField(max_length=64, blank=True, default='')
+    
+    class Meta:
+        indexes = [
+            # Emisión idempotente: un certificado por estudiante y versión de plantilla
+            models.Index(fields=['dni', 'codigo', 'version_plantilla'], name='certgen_emision_idx'),
+            # Listado del panel, del más reciente al más antiguo
+            models.Index(fields=['fecha_generacion', 'id'], name='certgen_fecha_idx'),
+            # Filtros del listado: carrera (en el orden del listado) y prefijo del nombre
+            # sin distinguir mayúsculas (índice sobre UPPER(nombre))
+            models.Index(fields=['carrera', 'fecha_generacion', 'id'], name='certgen_carrera_idx'),
+            models.Index(Upper('nombre'), name='certgen_nombre_upper_idx'),
+        ]
+        constraints = [
+            # Dos emisiones simultáneas no pueden crear dos certificados para la misma
+            # versión de plantilla. Los registros anteriores a la emisión idempotente
+            # (sin versión) quedan fuera: cada descarga creaba uno nuevo.
+            models.UniqueConstraint(
+                fields=['dni', 'codigo', 'version_plantilla'],
+                condition=~models.Q(version_plantilla=''),
+                name='certgen_emision_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.id_certificado}"
+
+class Estudiante(models.Model):
+    """
+    Padrón de estudiantes habilitados para descargar su certificado
+    """
+    dni = models.CharField(max_length=20)
+    codigo = models.CharField(max_length=50)
+    nombre = models.CharField(max_length=200)
+    carrera = models.CharField(max_length=200)
+    fecha_carga = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dni'], name='estudiante_dni_idx'),
+        ]
+        constraints = [
+            # También sirve como índice para el login por (DNI, CODIGO)
+            models.UniqueConstraint(fields=['dni', 'codigo'], name='estudiante_dni_codigo_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} - {self.dni}"
+
+class TrabajoLote(models.Model):
+    """
+    Lote de certificados encolado para generarse en segundo plano
+    """
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+    ]
+
+    id_trabajo = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    archivo_excel = models.FileField(upload_to='lotes/entrada/')
+    archivo_resultado = models.CharField(max_length=255, blank=True, null=True)
+    cantidad = models.PositiveIntegerField()
+    total = models.PositiveIntegerField(default=0)
+    procesados = models.PositiveIntegerField(default=0)
+    fallidos = models.PositiveIntegerField(default=0)
+    mensaje_error = models.TextField(blank=True, null=True)
+    worker = models.CharField(max_length=200, blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Cola: los workers buscan el trabajo pendiente más antiguo
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajolote_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.id_trabajo} ({self.estado})"
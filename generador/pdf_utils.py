@@ -0,0 +1,512 @@
+"""
+Motor de certificados sobre fondo PDF: la plantilla plantilla_certificadopdf.pdf se carga
+una sola vez como fondo y en cada certificado sólo se estampan los campos variables
+(nombre, QR e ID) con reportlab
+"""
+import os
+import re
+import zlib
+import copy
+import threading
+from contextlib import nullcontext
+from io import BytesIO
+from django.conf import settings
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, ContentStream, DictionaryObject, IndirectObject, NameObject, StreamObject
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from .estilos_pdf_utils import FUENTES_TIMES_INCORPORADAS, obtener_contexto_reportlab
+from .metricas_utils import medir
+
+# Posiciones en puntos PDF (origen abajo a la izquierda) medidas sobre los marcadores
+# {{ nombre }}, {{ qr_code }} e {{ id_certificado }} de la plantilla PDF
+CAMPOS_POR_DEFECTO = {
+    'nombre': {
+        'pagina': 0, 'x': 420.96, 'y': 292.4, 'alineacion': 'centro',
+        'fuente': 'Times-BoldItalic', 'tamano': 28, 'ancho_maximo': 700,
+    },
+    'qr_code': {
+        'pagina': 1, 'x': 700, 'y': 470, 'tamano': 85,
+    },
+    'id_certificado': {
+        'pagina': 1, 'x': 800, 'y': 454.8, 'alineacion': 'derecha',
+        'fuente': 'Times-Roman', 'tamano': 11, 'formato': 'ID de Verificación: {valor}',
+    },
+}
+
+
+def ruta_fondo_pdf():
+    """
+    Ruta del PDF usado como fondo de los certificados
+    """
+    return getattr(
+        settings, 'CERTIFICADO_PDF_FONDO',
+        os.path.join(settings.MEDIA_ROOT, 'plantillas', 'plantilla_certificadopdf.pdf')
+    )
+
+
+def obtener_campos_pdf():
+    """
+    Posiciones de los campos: los valores por defecto combinados con settings.CERTIFICADO_PDF_CAMPOS
+    """
+    campos = copy.deepcopy(CAMPOS_POR_DEFECTO)
+    for nombre, valores in getattr(settings, 'CERTIFICADO_PDF_CAMPOS', {}).items():
+        campos.setdefault(nombre, {}).update(valores)
+    return campos
+
+
+def quitar_texto_de_pagina(pagina, lector):
+    """
+    Elimina los objetos de texto (BT ... ET) de la página. En la plantilla PDF el texto
+    son sólo los marcadores {{ ... }}; el diseño está formado por imágenes.
+    """
+    contenido = ContentStream(pagina.get_contents(), lector)
+    operaciones = []
+    en_texto = False
+    for operandos, operador in contenido.operations:
+        if operador == b'BT':
+            en_texto = True
+        elif operador == b'ET':
+            en_texto = False
+            continue
+        if not en_texto:
+            operaciones.append((operandos, operador))
+    contenido.operations = operaciones
+    pagina[NameObject('/Contents')] = contenido
+
+
+class FondoPDF:
+    """
+    Páginas de la plantilla PDF ya leídas y limpias, listas para copiarse en cada certificado
+    """
+
+    def __init__(self, ruta):
+        lector = PdfReader(ruta)
+        escritor = PdfWriter()
+        for pagina in lector.pages:
+            pagina = escritor.add_page(pagina)
+            quitar_texto_de_pagina(pagina, escritor)
+            pagina.compress_content_streams()
+
+        # Se guarda el fondo limpio ya serializado: leerlo de memoria es barato
+        buffer = BytesIO()
+        escritor.write(buffer)
+        self.lector = PdfReader(BytesIO(buffer.getvalue()))
+        self.paginas = list(self.lector.pages)
+        self.tamanos = [(float(p.mediabox.width), float(p.mediabox.height)) for p in self.paginas]
+        # pypdf resuelve objetos de forma perezosa: el lector compartido no es seguro entre hilos
+        self.lock = threading.Lock()
+
+
+_fondo_cache = None
+_fondo_lock = threading.Lock()
+
+
+def obtener_fondo_pdf(ruta=None):
+    """
+    Devuelve el fondo PDF cargado una vez por proceso; se recarga si el archivo cambia en disco
+    """
+    global _fondo_cache
+    ruta = ruta or ruta_fondo_pdf()
+    stat = os.stat(ruta)
+    version = (ruta, stat.st_mtime_ns, stat.st_size)
+
+    cache = _fondo_cache
+    if cache and cache[0] == version:
+        return cache[1]
+
+    with _fondo_lock:
+        if _fondo_cache and _fondo_cache[0] == version:
+            return _fondo_cache[1]
+        fondo = FondoPDF(ruta)
+        _fondo_cache = (version, fondo)
+        return fondo
+
+
+def tramos_qr(matriz):
+    """
+    Recorre la matriz del QR agrupando los módulos negros consecutivos de cada fila:
+    produce (fila, columna_inicio, columna_fin) para dibujarlos como rectángulos
+    """
+    for fila, celdas in enumerate(matriz):
+        columna = 0
+        while columna < len(celdas):
+            if not celdas[columna]:
+                columna += 1
+                continue
+            inicio = columna
+            while columna < len(celdas) and celdas[columna]:
+                columna += 1
+            yield fila, inicio, columna
+
+
+def _dibujar_qr(lienzo, campo, qr):
+    """
+    Dibuja el QR como trazados vectoriales nativos del PDF o, con settings.QR_MODO = 'imagen',
+    como imagen PNG en memoria
+    """
+    lado = campo.get('tamano', 85)
+    if getattr(settings, 'QR_MODO', 'vectorial') == 'imagen':
+        lienzo.drawImage(ImageReader(qr.imagen()), campo['x'], campo['y'], width=lado, height=lado)
+        return
+
+    matriz = qr.matriz
+    modulo = lado / len(matriz)
+    trazado = lienzo.beginPath()
+    for fila, inicio, fin in tramos_qr(matriz):
+        y = campo['y'] + lado - (fila + 1) * modulo
+        trazado.rect(campo['x'] + inicio * modulo, y, (fin - inicio) * modulo, modulo)
+    lienzo.saveState()
+    lienzo.setFillGray(0)
+    lienzo.drawPath(trazado, stroke=0, fill=1)
+    lienzo.restoreState()
+
+
+def fuente_para_texto(fuente, texto):
+    """
+    Las fuentes Times incorporadas sólo cubren WinAnsiEncoding (cp1252): un texto con
+    otros caracteres (p. ej. Ł o č) se escribe con la variante TrueType de Times New Roman
+    del contexto de reportlab, si se encontró (ver estilos_pdf_utils)
+    """
+    try:
+        texto.encode('cp1252')
+        return fuente
+    except UnicodeEncodeError:
+        pass
+    for variante, incorporada in FUENTES_TIMES_INCORPORADAS.items():
+        if incorporada == fuente:
+            return obtener_contexto_reportlab().fuentes[variante]
+    return fuente
+
+
+def _ubicar_texto(campo, texto):
+    """
+    Fuente, tamaño y coordenada x del texto según la alineación del campo.
+    Reduce la fuente si el texto no cabe en el ancho máximo configurado.
+    """
+    fuente = fuente_para_texto(campo.get('fuente', 'Times-Roman'), texto)
+    tamano = campo.get('tamano', 12)
+    ancho = stringWidth(texto, fuente, tamano)
+    ancho_maximo = campo.get('ancho_maximo')
+    if ancho_maximo and ancho > ancho_maximo:
+        tamano = tamano * ancho_maximo / ancho
+        ancho = ancho_maximo
+
+    alineacion = campo.get('alineacion', 'izquierda')
+    if alineacion == 'centro':
+        x = campo['x'] - ancho / 2
+    elif alineacion == 'derecha':
+        x = campo['x'] - ancho
+    else:
+        x = campo['x']
+    return fuente, tamano, x
+
+
+def generar_capa_variable(fondo, campos, valores, qr):
+    """
+    Genera con reportlab un PDF con una página por página del fondo que contiene
+    únicamente los campos variables del certificado
+    """
+    textos = {}
+    for nombre, campo in campos.items():
+        if nombre != 'qr_code' and valores.get(nombre) is not None:
+            texto = campo.get('formato', '{valor}').format(valor=valores[nombre])
+            textos[nombre] = (texto, *_ubicar_texto(campo, texto))
+
+    # Las fuentes TrueType guardan el subconjunto de glifos del documento en curso:
+    # con ellas se arma un PDF a la vez por proceso, como en ContextoReportlab.construir_pdf
+    truetype = any(isinstance(pdfmetrics.getFont(fuente), TTFont) for _, fuente, _, _ in textos.values())
+    buffer = BytesIO()
+    with obtener_contexto_reportlab().bloqueo if truetype else nullcontext():
+        lienzo = canvas.Canvas(buffer, pagesize=fondo.tamanos[0])
+        for numero, tamano in enumerate(fondo.tamanos):
+            lienzo.setPageSize(tamano)
+            for nombre, campo in campos.items():
+                if campo.get('pagina', 0) != numero:
+                    continue
+                if nombre == 'qr_code':
+                    _dibujar_qr(lienzo, campo, qr)
+                elif nombre in textos:
+                    texto, fuente, tamano_fuente, x = textos[nombre]
+                    lienzo.setFont(fuente, tamano_fuente)
+                    lienzo.drawString(x, campo['y'], texto)
+            lienzo.showPage()
+        lienzo.save()
+    return PdfReader(BytesIO(buffer.getvalue()))
+
+
+def generar_certificado_sobre_fondo(datos, qr, id_certificado):
+    """
+    Genera un certificado estampando nombre, QR e ID sobre el fondo PDF.
+    `qr` es un CodigoQR generado en memoria.
+    """
+    with medir('plantilla', 'fondo_pdf'):
+        return _estampar_sobre_fondo(datos, qr, id_certificado)
+
+
+def _estampar_sobre_fondo(datos, qr, id_certificado):
+    fondo = obtener_fondo_pdf()
+    campos = obtener_campos_pdf()
+    valores = {
+        'nombre': datos['nombre'],
+        'carrera': datos.get('carrera'),
+        'id_certificado': id_certificado,
+    }
+    capa = generar_capa_variable(fondo, campos, valores, qr)
+
+    escritor = PdfWriter()
+    with fondo.lock:
+        for pagina_fondo in fondo.paginas:
+            escritor.add_page(pagina_fondo)
+    for pagina, pagina_capa in zip(escritor.pages, capa.pages):
+        pagina.merge_page(pagina_capa)
+
+    buffer = BytesIO()
+    escritor.write(buffer)
+    return buffer.getvalue()
+
+
+def _numero_pdf(valor):
+    return f'{valor:.2f}'.rstrip('0').rstrip('.').encode()
+
+
+class PrefijoPDFCombinado:
+    """
+    Inicio de un PDF combinado: las páginas del fondo escritas una vez por proceso y
+    copiadas tal cual al comienzo de cada PDF combinado. De cada página se conservan
+    su contenido y sus recursos, que referencian las imágenes y fuentes del prefijo,
+    para convertirla en Form XObject: el fondo se incrusta una sola vez y todas las
+    páginas lo referencian.
+    """
+
+    def __init__(self, fondo):
+        escritor = PdfWriter()
+        with fondo.lock:
+            for pagina_fondo in fondo.paginas:
+                escritor.add_page(pagina_fondo)
+        buffer = BytesIO()
+        escritor.write(buffer)
+        self.datos = buffer.getvalue()
+
+        # Se relee lo escrito: así los recursos quedan con la numeración de objetos del prefijo
+        lector = PdfReader(BytesIO(self.datos))
+        self.formularios = []
+        for pagina in lector.pages:
+            recursos = BytesIO()
+            pagina.get('/Resources', DictionaryObject()).write_to_stream(recursos)
+            caja = b' '.join(_numero_pdf(float(valor)) for valor in pagina.mediabox)
+            self.formularios.append((zlib.compress(pagina.get_contents().get_data()), caja, recursos.getvalue()))
+        self.siguiente_objeto = int(lector.trailer['/Size'])
+        self.xref_anterior = int(re.findall(rb'startxref\s+(\d+)', self.datos)[-1])
+        self.tamanos = fondo.tamanos
+
+
+_prefijo_cache = None
+_prefijo_lock = threading.Lock()
+
+
+def obtener_prefijo_pdf_combinado():
+    global _prefijo_cache
+    fondo = obtener_fondo_pdf()
+    cache = _prefijo_cache
+    if cache and cache[0] is fondo:
+        return cache[1]
+    with _prefijo_lock:
+        if _prefijo_cache and _prefijo_cache[0] is fondo:
+            return _prefijo_cache[1]
+        prefijo = PrefijoPDFCombinado(fondo)
+        _prefijo_cache = (fondo, prefijo)
+        return prefijo
+
+
+class EscritorPDFCombinado:
+    """
+    Escribe un único PDF con todos los certificados de un lote de forma incremental.
+    Cada método devuelve los bytes a enviar; sólo se conservan en memoria los números
+    y posiciones de los objetos, nunca el contenido de las páginas ya escritas.
+    El resultado es el prefijo con el fondo más una actualización incremental
+    (PDF 1.4, sección 3.4.5) que define el árbol de páginas definitivo.
+    Los campos variables de cada certificado se dibujan con generar_capa_variable,
+    igual que en el motor fondo_pdf (mismas fuentes, QR_MODO y texto), y sus objetos
+    se copian a continuación del fondo, que cada página referencia como Form XObject.
+    """
+
+    def __init__(self, campos=None):
+        self.campos = campos or obtener_campos_pdf()
+        # Una fuente desconocida haría fallar cada fila: se rechaza antes de empezar
+        desconocidas = []
+        for nombre, campo in self.campos.items():
+            fuente = campo.get('fuente', 'Times-Roman')
+            if nombre == 'qr_code':
+                continue
+            try:
+                pdfmetrics.getFont(fuente)
+            except KeyError:
+                desconocidas.append(fuente)
+        if desconocidas:
+            raise ValueError(
+                f'Fuentes no disponibles para el PDF combinado: {", ".join(sorted(set(desconocidas)))} '
+                f'(se admiten las fuentes de reportlab y las TrueType registradas)'
+            )
+        self.fondo = obtener_fondo_pdf()
+        self.prefijo = obtener_prefijo_pdf_combinado()
+        self._posicion = 0
+        self._desplazamientos = {}
+        self._siguiente = self.prefijo.siguiente_objeto
+        self._paginas = []
+        self._formularios = []
+        # Objetos sin referencias (p. ej. las fuentes Type1 estándar) que ya se escribieron,
+        # para que todas las páginas compartan uno solo
+        self._compartidos = {}
+        self._numero_arbol = self._reservar()
+
+    def _reservar(self):
+        numero = self._siguiente
+        self._siguiente += 1
+        return numero
+
+    def _objeto(self, numero, cuerpo):
+        datos = b'%d 0 obj\n' % numero + cuerpo + b'\nendobj\n'
+        self._desplazamientos[numero] = self._posicion
+        self._posicion += len(datos)
+        return datos
+
+    def _stream(self, numero, contenido, comprimido=None, entradas=b''):
+        comprimido = comprimido if comprimido is not None else zlib.compress(contenido)
+        cuerpo = (
+            b'<< %s/Length %d /Filter /FlateDecode >>\nstream\n' % (entradas, len(comprimido))
+            + comprimido + b'\nendstream'
+        )
+        return self._objeto(numero, cuerpo)
+
+    def iniciar(self):
+        """
+        Prefijo con el fondo y un Form XObject por página del fondo
+        """
+        partes = [self.prefijo.datos, b'\n']
+        self._posicion = len(self.prefijo.datos) + 1
+        for comprimido, caja, recursos in self.prefijo.formularios:
+            numero = self._reservar()
+            self._formularios.append(numero)
+            partes.append(self._stream(numero, None, comprimido, (
+                b'/Type /XObject /Subtype /Form /BBox [%s] /Resources %s ' % (caja, recursos)
+            )))
+        return b''.join(partes)
+
+    def _serializar(self, valor, partes, copiados):
+        """
+        Bytes del valor con sus referencias renumeradas; los objetos referenciados se
+        copian antes en `partes`. Devuelve (bytes, si contiene referencias).
+        """
+        if isinstance(valor, IndirectObject):
+            if valor.idnum not in copiados:
+                copiados[valor.idnum] = self._copiar_objeto(valor.get_object(), partes, copiados)
+            return b'%d 0 R' % copiados[valor.idnum], True
+        if isinstance(valor, DictionaryObject):
+            return self._serializar_entradas(valor.items(), partes, copiados, b'<<', b'>>')
+        if isinstance(valor, ArrayObject):
+            return self._serializar_entradas(valor, partes, copiados, b'[', b']')
+        buffer = BytesIO()
+        valor.write_to_stream(buffer)
+        return buffer.getvalue(), False
+
+    def _serializar_entradas(self, entradas, partes, copiados, apertura, cierre):
+        elementos = []
+        con_referencias = False
+        for entrada in entradas:
+            for valor in (entrada if isinstance(entrada, tuple) else (entrada,)):
+                datos, referencias = self._serializar(valor, partes, copiados)
+                elementos.append(datos)
+                con_referencias = con_referencias or referencias
+        return apertura + b' '.join(elementos) + cierre, con_referencias
+
+    def _copiar_objeto(self, objeto, partes, copiados):
+        if isinstance(objeto, StreamObject):
+            entradas, _ = self._serializar_entradas(
+                ((clave, valor) for clave, valor in objeto.items() if clave != '/Length'),
+                partes, copiados, b'', b''
+            )
+            # Los datos se copian tal como están codificados, con sus filtros
+            datos = objeto._data
+            numero = self._reservar()
+            partes.append(self._objeto(numero, (
+                b'<< %s /Length %d >>\nstream\n' % (entradas, len(datos)) + datos + b'\nendstream'
+            )))
+            return numero
+
+        cuerpo, con_referencias = self._serializar(objeto, partes, copiados)
+        if not con_referencias and cuerpo in self._compartidos:
+            return self._compartidos[cuerpo]
+        numero = self._reservar()
+        partes.append(self._objeto(numero, cuerpo))
+        if not con_referencias:
+            self._compartidos[cuerpo] = numero
+        return numero
+
+    def agregar_pagina(self, valores, qr):
+        """
+        Agrega las páginas de un certificado. `qr` es el CodigoQR del certificado.
+        """
+        capa = generar_capa_variable(self.fondo, self.campos, valores, qr)
+        partes = []
+        copiados = {}
+        for numero_pagina, ((ancho, alto), pagina) in enumerate(zip(self.prefijo.tamanos, capa.pages)):
+            numero_contenido = self._reservar()
+            partes.append(self._stream(numero_contenido, b'q /Fondo Do Q\n' + pagina.get_contents().get_data()))
+
+            recursos = pagina.get('/Resources', DictionaryObject()).get_object()
+            xobjects = b'/Fondo %d 0 R' % self._formularios[numero_pagina]
+            entradas = []
+            for clave, valor in recursos.items():
+                if clave == '/XObject':
+                    propios, _ = self._serializar_entradas(valor.get_object().items(), partes, copiados, b'', b'')
+                    xobjects += b' ' + propios
+                else:
+                    datos, _ = self._serializar_entradas([(NameObject(clave), valor)], partes, copiados, b'', b'')
+                    entradas.append(datos)
+            entradas.append(b'/XObject << %s >>' % xobjects)
+
+            numero_pagina_pdf = self._reservar()
+            partes.append(self._objeto(numero_pagina_pdf, (
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R /Resources << %s >> >>' % (
+                    self._numero_arbol, _numero_pdf(ancho), _numero_pdf(alto), numero_contenido, b' '.join(entradas)
+                )
+            )))
+            self._paginas.append(numero_pagina_pdf)
+        return b''.join(partes)
+
+    def finalizar(self):
+        """
+        Árbol de páginas, catálogo, tabla de referencias cruzadas y trailer de la actualización
+        """
+        hijos = b' '.join(b'%d 0 R' % numero for numero in self._paginas)
+        partes = [self._objeto(self._numero_arbol, (
+            b'<< /Type /Pages /Kids [%s] /Count %d >>' % (hijos, len(self._paginas))
+        ))]
+        numero_catalogo = self._reservar()
+        partes.append(self._objeto(numero_catalogo, b'<< /Type /Catalog /Pages %d 0 R >>' % self._numero_arbol))
+
+        posicion_xref = self._posicion
+        # El objeto 0 encabeza la lista de objetos libres, también en una actualización incremental
+        xref = [b'xref\n0 1\n0000000000 65535 f \n']
+        numeros = sorted(self._desplazamientos)
+        # Subsecciones de números consecutivos
+        inicio = 0
+        while inicio < len(numeros):
+            fin = inicio
+            while fin + 1 < len(numeros) and numeros[fin + 1] == numeros[fin] + 1:
+                fin += 1
+            xref.append(b'%d %d\n' % (numeros[inicio], fin - inicio + 1))
+            for numero in numeros[inicio:fin + 1]:
+                xref.append(b'%010d 00000 n \n' % self._desplazamientos[numero])
+            inicio = fin + 1
+        partes.append(b''.join(xref))
+        partes.append(
+            b'trailer\n<< /Size %d /Root %d 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n' % (
+                self._siguiente, numero_catalogo, self.prefijo.xref_anterior, posicion_xref
+            )
+        )
+        return b''.join(partes)
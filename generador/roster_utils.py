@@ -0,0 +1,182 @@
+"""
+Utilidades del padrón de estudiantes (BD_CERTIFICADOS.xlsx): lectura en streaming
+e importación masiva a la base de datos, donde se valida el acceso
+"""
+import os
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import Estudiante
+
+COLUMNAS_PADRON = ('DNI', 'NOMBRES', 'CARRERA', 'CODIGO')
+TAMANO_LOTE_IMPORTACION = 1000
+
+
+def ruta_padron():
+    """
+    Ruta del Excel con el padrón de estudiantes habilitados
+    """
+    return os.path.join(settings.MEDIA_ROOT, 'plantillas', 'BD_CERTIFICADOS.xlsx')
+
+
+def normalizar_celda(valor):
+    """
+    Convierte el valor de una celda a texto del mismo modo que pandas con astype(str)
+    para DNIs y códigos (los enteros leídos como float no arrastran el '.0')
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _posiciones_encabezado(encabezado):
+    """
+    Columna de cada campo del padrón según el encabezado; ValueError si falta alguno
+    """
+    posiciones = {str(nombre).strip(): i for i, nombre in enumerate(encabezado or ()) if nombre is not None}
+    faltantes = [c for c in COLUMNAS_PADRON if c not in posiciones]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el Excel: {', '.join(faltantes)}")
+    return posiciones
+
+
+def _iterar_filas_padron(libro, filas, posiciones, limite):
+    try:
+        producidas = 0
+        for fila in filas:
+            if limite is not None and producidas >= limite:
+                # No se lee ni una fila más de las pedidas
+                break
+            if fila is None or all(celda is None for celda in fila):
+                continue
+            valores = {c: fila[posiciones[c]] if posiciones[c] < len(fila) else None for c in COLUMNAS_PADRON}
+            yield {
+                'dni': normalizar_celda(valores['DNI']),
+                'nombre': '' if valores['NOMBRES'] is None else str(valores['NOMBRES']),
+                'carrera': '' if valores['CARRERA'] is None else str(valores['CARRERA']),
+                'codigo': normalizar_celda(valores['CODIGO']),
+            }
+            producidas += 1
+    finally:
+        libro.close()
+
+
+def abrir_padron(excel, limite=None):
+    """
+    Abre el Excel del padrón (ruta o archivo subido) en modo sólo lectura y valida
+    el encabezado de inmediato. Devuelve un generador que lee las filas a medida que
+    se consumen, como diccionarios con dni, nombre, carrera y codigo en texto, y que
+    deja de leer el libro al llegar a `limite` filas.
+    """
+    from openpyxl import load_workbook
+    libro = load_workbook(excel, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        posiciones = _posiciones_encabezado(next(filas, None))
+    except Exception:
+        libro.close()
+        raise
+    return _iterar_filas_padron(libro, filas, posiciones, limite)
+
+
+def leer_filas_padron(excel_path, limite=None):
+    """
+    Recorre el Excel del padrón en modo sólo lectura y devuelve cada fila como diccionario
+    """
+    yield from abrir_padron(excel_path, limite)
+
+
+def contar_filas_padron(excel_path):
+    """
+    Filas de datos que declara el Excel del padrón (sin el encabezado), leídas de
+    las dimensiones de la hoja sin recorrerla. Incluye las filas vacías, así que es
+    una cota superior; None si el libro no declara sus dimensiones.
+    """
+    from openpyxl import load_workbook
+    libro = load_workbook(excel_path, read_only=True)
+    try:
+        max_row = libro.active.max_row
+    finally:
+        libro.close()
+    return max(max_row - 1, 0) if max_row else None
+
+
+def importar_padron(excel_path, tamano_lote=TAMANO_LOTE_IMPORTACION):
+    """
+    Reemplaza el padrón de la base de datos por el del Excel, de forma masiva y en
+    una sola transacción. El Excel subido es el padrón completo: los estudiantes que
+    ya no figuran en él se eliminan y pierden el acceso, los nuevos se insertan con
+    bulk_create y los que cambiaron de nombre o carrera se actualizan con bulk_update,
+    por lotes. Los estudiantes registrados se leen con una sola consulta.
+    Devuelve un diccionario con las estadísticas de la importación.
+    """
+    inicio = time.perf_counter()
+    leidas = 0
+    insertadas = 0
+    actualizadas = 0
+    nuevos = []
+    cambios = []
+
+    with transaction.atomic():
+        existentes = {
+            (dni, codigo): (pk, nombre, carrera)
+            for pk, dni, codigo, nombre, carrera
+            in Estudiante.objects.values_list('pk', 'dni', 'codigo', 'nombre', 'carrera')
+        }
+        vistas = set()
+
+        for datos in leer_filas_padron(excel_path):
+            leidas += 1
+            clave = (datos['dni'], datos['codigo'])
+            # Filas repetidas dentro del mismo archivo: vale la primera
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+
+            registrado = existentes.get(clave)
+            if registrado is None:
+                nuevos.append(Estudiante(
+                    dni=datos['dni'],
+                    codigo=datos['codigo'],
+                    nombre=datos['nombre'],
+                    carrera=datos['carrera']
+                ))
+            elif registrado[1:] != (datos['nombre'], datos['carrera']):
+                cambios.append(Estudiante(pk=registrado[0], nombre=datos['nombre'], carrera=datos['carrera']))
+
+            if len(nuevos) >= tamano_lote:
+                Estudiante.objects.bulk_create(nuevos)
+                insertadas += len(nuevos)
+                nuevos = []
+            if len(cambios) >= tamano_lote:
+                Estudiante.objects.bulk_update(cambios, ['nombre', 'carrera'])
+                actualizadas += len(cambios)
+                cambios = []
+
+        if not vistas:
+            # Un archivo sin filas dejaría a todos sin acceso: se rechaza
+            raise ValueError('El Excel no tiene ningún estudiante')
+
+        if nuevos:
+            Estudiante.objects.bulk_create(nuevos)
+            insertadas += len(nuevos)
+        if cambios:
+            Estudiante.objects.bulk_update(cambios, ['nombre', 'carrera'])
+            actualizadas += len(cambios)
+
+        retirados = [pk for clave, (pk, *_) in existentes.items() if clave not in vistas]
+        for desde in range(0, len(retirados), tamano_lote):
+            Estudiante.objects.filter(pk__in=retirados[desde:desde + tamano_lote]).delete()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'leidas': leidas,
+        'insertadas': insertadas,
+        'actualizadas': actualizadas,
+        'eliminadas': len(retirados),
+        'omitidas': leidas - len(vistas),
+        'segundos': segundos,
+        'filas_por_segundo': leidas / segundos if segundos > 0 else 0.0,
+    }
@@ -1,18 +1,55 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 import os
+import shutil
 import tempfile
+from io import StringIO
 import pandas as pd
-from .models import CertificadoGenerado
+from .models import CertificadoGenerado, Estudiante, TrabajoLote
 from .document_utils import (
+    CodigoQR,
+    construir_url_verificacion,
     generar_certificado_pdf,
-    generar_qr_optimizado,
-    crear_certificado_completo
+    crear_certificado_completo,
+    obtener_plantilla_word,
+    limpiar_cache_plantillas
 )
 
-class DocumentUtilsTests(TestCase):
+
+def copiar_plantillas_media(media_root):
+    """
+    Copia las plantillas del proyecto (fondo PDF del certificado) al MEDIA_ROOT
+    temporal de una prueba, para que los PDFs emitidos no se escriban en media/
+    """
+    shutil.copytree(os.path.join(settings.MEDIA_ROOT, 'plantillas'), os.path.join(media_root, 'plantillas'))
+
+
+class MediaTemporalMixin:
+    """
+    MEDIA_ROOT temporal para cada prueba, eliminado al terminar.
+    Con copiar_plantillas = True incluye las plantillas del proyecto.
+    """
+    copiar_plantillas = False
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        if self.copiar_plantillas:
+            copiar_plantillas_media(self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+class DocumentUtilsTests(MediaTemporalMixin, TestCase):
+    copiar_plantillas = True
+
     def setUp(self):
+        super().setUp()
         self.datos_prueba = {
             'dni': '12345678',
             'nombre': 'Usuario Prueba',
@@ -20,56 +57,42 @@ class DocumentUtilsTests(TestCase):
             'codigo': 'COD123'
         }
         
-    def test_generar_qr_optimizado(self):
+    def test_codigo_qr_en_memoria(self):
         """
         Prueba la generación optimizada de códigos QR
         """
-        qr_path, id_certificado, url_verificacion = generar_qr_optimizado(
-            self.datos_prueba['dni'],
-            self.datos_prueba['nombre'],
-            self.datos_prueba['carrera'],
-            self.datos_prueba['codigo']
-        )
+        id_certificado = 'prueba'
+        url_verificacion = construir_url_verificacion(id_certificado)
+        qr = CodigoQR(url_verificacion)
         
-        self.assertTrue(os.path.exists(qr_path))
+        # El QR se genera en memoria, sin escribir archivos en MEDIA_ROOT/qr
+        self.assertTrue(qr.png().startswith(b'\x89PNG'))
+        self.assertEqual(len(qr.matriz), len(qr.matriz[0]))
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'qr', f'qr_{id_certificado}.png')))
         self.assertIsNotNone(id_certificado)
         self.assertTrue(url_verificacion.startswith(settings.BASE_URL))
-        
-        # Limpiar
-        if os.path.exists(qr_path):
-            os.unlink(qr_path)
     
     def test_generar_certificado_pdf(self):
         """
         Prueba la generación de certificados PDF
         """
-        # Generar QR temporal para la prueba
-        qr_path, id_certificado, _ = generar_qr_optimizado(
-            self.datos_prueba['dni'],
+        # Generar QR en memoria para la prueba
+        id_certificado = 'prueba'
+        qr = CodigoQR(construir_url_verificacion(id_certificado))
+        
+        # Generar PDF
+        pdf_content = generar_certificado_pdf(
             self.datos_prueba['nombre'],
             self.datos_prueba['carrera'],
-            self.datos_prueba['codigo']
+            id_certificado,
+            qr
         )
         
-        try:
-            # Generar PDF
-            pdf_content = generar_certificado_pdf(
-                self.datos_prueba['nombre'],
-                self.datos_prueba['carrera'],
-                id_certificado,
-                qr_path
-            )
-            
-            self.assertIsNotNone(pdf_content)
-            self.assertGreater(len(pdf_content), 0)
-            
-            # Verificar que es un PDF válido
-            self.assertTrue(pdf_content.startswith(b'%PDF-'))
-            
-        finally:
-            # Limpiar
-            if os.path.exists(qr_path):
-                os.unlink(qr_path)
+        self.assertIsNotNone(pdf_content)
+        self.assertGreater(len(pdf_content), 0)
+        
+        # Verificar que es un PDF válido
+        self.assertTrue(pdf_content.startswith(b'%PDF-'))
     
     def test_crear_certificado_completo(self):
         """
@@ -88,8 +111,142 @@ class DocumentUtilsTests(TestCase):
         self.assertEqual(certificado.nombre, self.datos_prueba['nombre'])
         self.assertEqual(certificado.dni, self.datos_prueba['dni'])
 
-class ViewsTests(TestCase):
+class PlantillaCacheTests(TestCase):
+    def setUp(self):
+        limpiar_cache_plantillas()
+        origen = os.path.join(settings.BASE_DIR, 'plantillas_word', 'plantilla_certificado.docx')
+        self.plantilla = tempfile.NamedTemporaryFile(suffix='.docx', delete=False)
+        with open(origen, 'rb') as f:
+            self.plantilla.write(f.read())
+        self.plantilla.close()
+
+    def tearDown(self):
+        limpiar_cache_plantillas()
+        if os.path.exists(self.plantilla.name):
+            os.unlink(self.plantilla.name)
+
+    def test_copias_independientes(self):
+        """
+        Cada llamada devuelve una copia nueva que no altera la plantilla cacheada
+        """
+        primera = obtener_plantilla_word(self.plantilla.name)
+        primera.render({'nombre': 'Primero', 'qr_code': '', 'id_certificado': '1'})
+        segunda = obtener_plantilla_word(self.plantilla.name)
+
+        self.assertIsNot(primera.docx, segunda.docx)
+        self.assertIn('{{nombre}}', [p.text for p in segunda.docx.paragraphs])
+
+    def test_invalidacion_por_cambio_en_disco(self):
+        """
+        Si el archivo cambia en disco, la caché vuelve a analizarlo
+        """
+        obtener_plantilla_word(self.plantilla.name)
+
+        from docx import Document
+        nuevo = Document()
+        nuevo.add_paragraph('Plantilla {{ nombre }} actualizada')
+        nuevo.save(self.plantilla.name)
+        stat = os.stat(self.plantilla.name)
+        os.utime(self.plantilla.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        recargada = obtener_plantilla_word(self.plantilla.name)
+        self.assertEqual(recargada.docx.paragraphs[0].text, 'Plantilla {{ nombre }} actualizada')
+
+class PadronBaseDatosTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'plantillas'))
+
+        self.client = Client()
+        session = self.client.session
+        session['autenticado'] = True
+        session['es_admin'] = True
+        session.save()
+
+    def subir_padron(self, filas):
+        excel = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+        excel.close()
+        try:
+            pd.DataFrame(filas).to_excel(excel.name, index=False)
+            with open(excel.name, 'rb') as f:
+                return self.client.post('/opciones_admin/', {
+                    'excel_file': SimpleUploadedFile('padron.xlsx', f.read())
+                })
+        finally:
+            os.unlink(excel.name)
+
+    def test_subida_reemplaza_padron_sin_emitir_certificados(self):
+        from .views import validar_usuario
+        self.subir_padron([
+            {'CODIGO': 'P001', 'DNI': 12345678, 'NOMBRES': 'Ana Pérez', 'CARRERA': 'Enfermería'},
+            {'CODIGO': 'P002', 'DNI': 87654321, 'NOMBRES': 'Luis Rojas', 'CARRERA': 'Derecho'},
+        ])
+        self.assertTrue(validar_usuario('87654321', 'P002')[0])
+
+        # El nuevo Excel es el padrón completo: quien no figura en él pierde el acceso
+        self.subir_padron([
+            {'CODIGO': 'P001', 'DNI': 12345678, 'NOMBRES': 'Ana Pérez', 'CARRERA': 'Enfermería'},
+        ])
+
+        self.assertEqual(list(Estudiante.objects.values_list('dni', flat=True)), ['12345678'])
+        self.assertFalse(validar_usuario('87654321', 'P002')[0])
+        self.assertEqual(CertificadoGenerado.objects.count(), 0)
+
+    def test_importacion_masiva_reporta_cambios(self):
+        from .roster_utils import importar_padron
+        Estudiante.objects.create(dni='12345678', codigo='P001', nombre='Ana Perez', carrera='Enfermería')
+        Estudiante.objects.create(dni='22222222', codigo='P009', nombre='Retirado', carrera='Derecho')
+        excel = os.path.join(self.media_root, 'padron.xlsx')
+        pd.DataFrame([
+            {'CODIGO': 'P001', 'DNI': 12345678, 'NOMBRES': 'Ana Pérez', 'CARRERA': 'Enfermería'},
+            {'CODIGO': 'P002', 'DNI': 87654321, 'NOMBRES': 'Luis Rojas', 'CARRERA': 'Derecho'},
+            {'CODIGO': 'P002', 'DNI': 87654321, 'NOMBRES': 'Luis Rojas', 'CARRERA': 'Derecho'},
+            {'CODIGO': 'P003', 'DNI': 11111111, 'NOMBRES': 'Eva Soto', 'CARRERA': 'Medicina'},
+        ]).to_excel(excel, index=False)
+
+        # Lectura del padrón, INSERT, UPDATE y DELETE por lote (más SAVEPOINTs de la transacción)
+        with self.assertNumQueries(6):
+            resumen = importar_padron(excel, tamano_lote=1000)
+
+        self.assertEqual(resumen['leidas'], 4)
+        self.assertEqual(resumen['insertadas'], 2)
+        self.assertEqual(resumen['actualizadas'], 1)
+        self.assertEqual(resumen['eliminadas'], 1)
+        self.assertEqual(resumen['omitidas'], 1)
+        self.assertEqual(
+            sorted(Estudiante.objects.values_list('dni', 'nombre')),
+            [('11111111', 'Eva Soto'), ('12345678', 'Ana Pérez'), ('87654321', 'Luis Rojas')]
+        )
+
+    def test_excel_vacio_no_borra_el_padron(self):
+        from .roster_utils import importar_padron
+        Estudiante.objects.create(dni='12345678', codigo='P001', nombre='Ana Pérez', carrera='Enfermería')
+        excel = os.path.join(self.media_root, 'padron.xlsx')
+        pd.DataFrame(columns=['CODIGO', 'DNI', 'NOMBRES', 'CARRERA']).to_excel(excel, index=False)
+
+        with self.assertRaises(ValueError):
+            importar_padron(excel)
+        self.assertEqual(Estudiante.objects.count(), 1)
+
+    def test_validar_usuario_con_una_consulta(self):
+        from .views import validar_usuario
+        Estudiante.objects.create(dni='12345678', codigo='P001', nombre='Ana Pérez', carrera='Enfermería')
+
+        with self.assertNumQueries(1):
+            valido, datos = validar_usuario('12345678', 'P001')
+        self.assertTrue(valido)
+        self.assertEqual(datos['nombre'], 'Ana Pérez')
+
+        # Un usuario que no está en el padrón también cuesta una sola consulta
+        with self.assertNumQueries(1):
+            valido, datos = validar_usuario('12345678', 'OTRO')
+        self.assertFalse(valido)
+
+class ViewsTests(MediaTemporalMixin, TestCase):
+    copiar_plantillas = True
+
     def setUp(self):
+        super().setUp()
         self.client = Client()
         self.datos_prueba = {
             'dni': '12345678',
@@ -98,8 +255,13 @@ class ViewsTests(TestCase):
             'codigo': 'COD123'
         }
         
-        # Crear archivo Excel de prueba
-        self.df = pd.DataFrame([self.datos_prueba])
+        # Crear archivo Excel de prueba con las columnas del padrón
+        self.df = pd.DataFrame([{
+            'DNI': self.datos_prueba['dni'],
+            'NOMBRES': self.datos_prueba['nombre'],
+            'CARRERA': self.datos_prueba['carrera'],
+            'CODIGO': self.datos_prueba['codigo'],
+        }])
         self.excel_file = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
         self.df.to_excel(self.excel_file.name, index=False)
     
@@ -107,14 +269,16 @@ class ViewsTests(TestCase):
         # Limpiar archivos temporales
         if os.path.exists(self.excel_file.name):
             os.unlink(self.excel_file.name)
+        super().tearDown()
     
     def test_descargar_plantilla(self):
         """
         Prueba la descarga de un certificado individual
         """
-        # Simular sesión autenticada
+        # Simular sesión autenticada (el padrón sólo lo puede cargar el administrador)
         session = self.client.session
         session['autenticado'] = True
+        session['es_admin'] = True
         session['dni_validado'] = self.datos_prueba['dni']
         session.save()
         
@@ -151,3 +315,1221 @@ class ViewsTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/zip')
         self.assertIn('certificados_lote.zip', response['Content-Disposition'])
+
+class LoteStreamingTests(MediaTemporalMixin, TestCase):
+    copiar_plantillas = True
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.excel_file = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+        self.excel_file.close()
+        pd.DataFrame([
+            {'CODIGO': 'P001', 'DNI': 12345678, 'NOMBRES': 'Ana Perez', 'CARRERA': 'Enfermería'},
+            {'CODIGO': 'P002', 'DNI': 87654321, 'NOMBRES': 'Luis Rojas', 'CARRERA': 'Derecho'},
+        ]).to_excel(self.excel_file.name, index=False)
+
+    def tearDown(self):
+        if os.path.exists(self.excel_file.name):
+            os.unlink(self.excel_file.name)
+        super().tearDown()
+
+    def test_zip_en_streaming(self):
+        """
+        El modo streaming envía un ZIP válido con los PDF almacenados sin recomprimir
+        """
+        import zipfile
+        from io import BytesIO
+
+        with open(self.excel_file.name, 'rb') as excel:
+            response = self.client.post('/generar_lote/', {
+                'excel_file': SimpleUploadedFile('lote.xlsx', excel.read()),
+                'cantidad': 2,
+                'salida': 'zip_streaming'
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertFalse(response.has_header('Content-Length'))
+
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as zip_file:
+            self.assertEqual(zip_file.namelist(), ['certificado_Ana Perez.pdf', 'certificado_Luis Rojas.pdf'])
+            for info in zip_file.infolist():
+                self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                self.assertTrue(zip_file.read(info).startswith(b'%PDF-'))
+
+    def test_pdf_unico(self):
+        """
+        El modo pdf_unico entrega un solo PDF con el fondo incrustado una vez
+        """
+        from pypdf import PdfReader
+        from io import BytesIO
+
+        with open(self.excel_file.name, 'rb') as excel:
+            response = self.client.post('/generar_lote/', {
+                'excel_file': SimpleUploadedFile('lote.xlsx', excel.read()),
+                'cantidad': 2,
+                'salida': 'pdf_unico'
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        lector = PdfReader(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(len(lector.pages), 4)
+        self.assertIn('Luis Rojas', lector.pages[2].extract_text())
+        fondos = {pagina['/Resources']['/XObject'].raw_get('/Fondo').idnum for pagina in lector.pages}
+        self.assertEqual(len(fondos), 2)
+        self.assertEqual(CertificadoGenerado.objects.count(), 2)
+
+    def test_pdf_unico_sin_advertencias_y_fuente_invalida(self):
+        import warnings
+        from io import BytesIO
+        from pypdf import PdfReader
+        from .lote_utils import iterar_pdf_combinado
+        from .pdf_utils import obtener_campos_pdf
+
+        # La fila repetida aparece una sola vez
+        filas = [{'dni': '12345678', 'nombre': 'Ana Perez', 'carrera': 'Enfermería', 'codigo': 'P001'}] * 2
+        # pypdf no advierte nada al leerlo (p. ej. "Xref table not zero-indexed")
+        with self.assertNoLogs('pypdf', 'WARNING'), warnings.catch_warnings():
+            warnings.simplefilter('error')
+            partes = list(iterar_pdf_combinado(filas))
+            lector = PdfReader(BytesIO(b''.join(partes)))
+            self.assertEqual(len(lector.pages), 2)
+            self.assertIn('Ana Perez', lector.pages[0].extract_text())
+        # La tabla de la actualización incremental empieza por el objeto 0
+        self.assertIn(b'xref\n0 1\n0000000000 65535 f \n', partes[-1])
+        self.assertEqual(CertificadoGenerado.objects.count(), 1)
+
+        # Una fuente no admitida se rechaza antes de generar ninguna fila
+
+        from unittest import mock
+        from . import pdf_utils
+        campos = obtener_campos_pdf()
+        campos['nombre']['fuente'] = 'Arial'
+        with mock.patch.object(pdf_utils, 'obtener_campos_pdf', return_value=campos):
+            with self.assertRaisesMessage(ValueError, 'Arial'):
+                iterar_pdf_combinado(filas)
+
+    def test_pdf_unico_igual_al_motor_fondo_pdf(self):
+        """
+        Las páginas del PDF combinado salen del mismo motor que los certificados
+        individuales: nombres fuera de Latin-1 y QR_MODO incluidos
+        """
+        import reportlab
+        from io import BytesIO
+        from pypdf import PdfReader
+        from .lote_utils import iterar_pdf_combinado
+
+        # Fuentes TTF de reportlab con los nombres de Liberation Serif, como en ContextoReportlabTests
+        fuentes = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, fuentes, ignore_errors=True)
+        origen = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+        for vera, liberation in (('Vera.ttf', 'Regular'), ('VeraBd.ttf', 'Bold'),
+                                 ('VeraIt.ttf', 'Italic'), ('VeraBI.ttf', 'BoldItalic')):
+            shutil.copy(os.path.join(origen, vera), os.path.join(fuentes, f'LiberationSerif-{liberation}.ttf'))
+
+        datos = {'dni': '12345678', 'nombre': 'Łukasz Čapek', 'carrera': 'Derecho', 'codigo': 'P001'}
+        with override_settings(FUENTES_PDF_DIR=fuentes, QR_MODO='imagen'):
+            individual = crear_certificado_completo(datos, formato='pdf', motor='fondo_pdf')
+            combinado = PdfReader(BytesIO(b''.join(iterar_pdf_combinado([
+                datos, {'dni': '87654321', 'nombre': 'Luis Rojas', 'carrera': 'Derecho', 'codigo': 'P002'}
+            ]))))
+
+        individual = PdfReader(BytesIO(individual['contenido']))
+        self.assertIn('Łukasz Čapek', individual.pages[0].extract_text())
+        self.assertIn('Łukasz Čapek', combinado.pages[0].extract_text())
+        self.assertIn('Luis Rojas', combinado.pages[2].extract_text())
+        for lector in (individual, combinado):
+            # QR_MODO = 'imagen': el QR de la segunda página es una imagen
+            xobjects = lector.pages[1]['/Resources']['/XObject']
+            self.assertTrue(any(xobjects[nombre]['/Subtype'] == '/Image' for nombre in xobjects))
+
+    def test_cantidad_acota_la_lectura(self):
+        """
+        Sólo se generan y se leen las filas pedidas, aunque el Excel tenga más
+        """
+        import zipfile
+        from io import BytesIO
+
+        with open(self.excel_file.name, 'rb') as excel:
+            response = self.client.post('/generar_lote/', {
+                'excel_file': SimpleUploadedFile('lote.xlsx', excel.read()),
+                'cantidad': 1,
+                'salida': 'zip_streaming'
+            })
+
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as zip_file:
+            self.assertEqual(zip_file.namelist(), ['certificado_Ana Perez.pdf'])
+        self.assertEqual(CertificadoGenerado.objects.count(), 1)
+
+    def test_encabezado_invalido_antes_de_responder(self):
+        """
+        Un Excel sin las columnas del padrón se rechaza antes de empezar el streaming
+        """
+        pd.DataFrame([{'DNI': 12345678, 'NOMBRES': 'Ana Perez'}]).to_excel(self.excel_file.name, index=False)
+        with open(self.excel_file.name, 'rb') as excel:
+            response = self.client.post('/generar_lote/', {
+                'excel_file': SimpleUploadedFile('lote.xlsx', excel.read()),
+                'cantidad': 1,
+                'salida': 'zip_streaming'
+            })
+
+        self.assertFalse(response.streaming)
+        self.assertContains(response, 'Faltan columnas en el Excel: CARRERA, CODIGO')
+
+class LoteParaleloTests(MediaTemporalMixin, TransactionTestCase):
+    # Sin la transacción de TestCase: dentro de un bloque atomic el lote se genera en serie
+
+    def test_orden_determinista_y_errores_por_fila(self):
+        """
+        El pool de procesos conserva el orden de las filas, reporta los errores
+        por fila y el proceso padre registra los certificados en la base de datos
+        """
+        from .lote_utils import generar_certificados_lote_paralelo
+        filas = [
+            {'dni': str(10000000 + i), 'nombre': f'Estudiante {i}', 'carrera': 'Derecho', 'codigo': f'P{i:03d}'}
+            for i in range(5)
+        ]
+        # Una fila sin carrera provoca un error al renderizar
+        del filas[2]['carrera']
+
+        errores = []
+        certificados = list(generar_certificados_lote_paralelo(filas, 2, errores))
+
+        self.assertEqual(
+            [nombre for nombre, _ in certificados],
+            ['certificado_Estudiante 0.pdf', 'certificado_Estudiante 1.pdf',
+             'certificado_Estudiante 3.pdf', 'certificado_Estudiante 4.pdf']
+        )
+        self.assertTrue(all(contenido.startswith(b'%PDF-') for _, contenido in certificados))
+        self.assertEqual([error['fila'] for error in errores], [3])
+        self.assertEqual(CertificadoGenerado.objects.count(), 4)
+
+    def test_pool_reutilizado_entre_lotes(self):
+        from .lote_utils import generar_certificados_lote_paralelo, obtener_pool_lote
+        filas = [{'dni': '10000000', 'nombre': 'Ana', 'carrera': 'Derecho', 'codigo': 'P000'}]
+
+        list(generar_certificados_lote_paralelo(filas, 2))
+        pool = obtener_pool_lote(2)
+        list(generar_certificados_lote_paralelo([dict(filas[0], dni='10000001')], 2))
+        self.assertIs(obtener_pool_lote(2), pool)
+
+    def test_en_serie_dentro_de_una_transaccion(self):
+        """
+        Dentro de un bloque atomic no se usa el pool ni se cierran conexiones
+        """
+        from unittest import mock
+        from django.db import transaction
+        from . import lote_utils
+        filas = [{'dni': '10000000', 'nombre': 'Ana', 'carrera': 'Derecho', 'codigo': 'P000'}]
+
+        with transaction.atomic(), mock.patch.object(lote_utils, 'obtener_pool_lote') as pool:
+            certificados = list(lote_utils.generar_certificados_lote_paralelo(filas, 2))
+            self.assertEqual(CertificadoGenerado.objects.count(), 1)
+        pool.assert_not_called()
+        self.assertEqual(len(certificados), 1)
+
+    def test_descarga_simultanea_y_filas_repetidas(self):
+        """
+        Una descarga individual que registra al estudiante mientras el lote lo renderiza
+        no interrumpe el ZIP: se entrega su certificado. Un estudiante repetido se genera una vez.
+        """
+        from unittest import mock
+        from . import lote_utils
+        filas = [
+            {'dni': '10000000', 'nombre': 'Ana', 'carrera': 'Derecho', 'codigo': 'P000'},
+            {'dni': '10000001', 'nombre': 'Luis', 'carrera': 'Derecho', 'codigo': 'P001'},
+            {'dni': '10000000', 'nombre': 'Ana', 'carrera': 'Derecho', 'codigo': 'P000'},
+        ]
+        guardar = lote_utils.guardar_pdf_almacenado
+        ganadora = {}
+        def guardar_con_descarga_simultanea(contenido):
+            if not ganadora:
+                ganadora.update(crear_certificado_completo(filas[0], formato='pdf'))
+            return guardar(contenido)
+
+        with mock.patch.object(lote_utils, 'guardar_pdf_almacenado', guardar_con_descarga_simultanea):
+            certificados = list(lote_utils.generar_certificados_lote_paralelo(filas, 2))
+
+        self.assertEqual([nombre for nombre, _ in certificados], ['certificado_Ana.pdf', 'certificado_Luis.pdf'])
+        self.assertEqual(certificados[0][1], ganadora['contenido'])
+        self.assertEqual(CertificadoGenerado.objects.count(), 2)
+        self.assertEqual(str(CertificadoGenerado.objects.get(dni='10000000').id_certificado), ganadora['id_certificado'])
+
+class TrabajoLoteTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.client = Client()
+        session = self.client.session
+        session['autenticado'] = True
+        session['es_admin'] = True
+        session.save()
+
+        excel = os.path.join(self.media_root, 'lote.xlsx')
+        pd.DataFrame([
+            {'CODIGO': f'P{i:03d}', 'DNI': 10000000 + i, 'NOMBRES': f'Estudiante {i}', 'CARRERA': 'Derecho'}
+            for i in range(3)
+        ]).to_excel(excel, index=False)
+        with open(excel, 'rb') as f:
+            self.contenido_excel = f.read()
+
+    def encolar(self, cantidad):
+        return self.client.post('/lotes/', {
+            'excel_file': SimpleUploadedFile('lote.xlsx', self.contenido_excel),
+            'cantidad': cantidad
+        })
+
+    def test_encolar_procesar_y_descargar(self):
+        import zipfile
+        from io import BytesIO
+        from django.core.management import call_command
+
+        response = self.encolar(2)
+        self.assertEqual(response.status_code, 202)
+        url_estado = response.json()['url_estado']
+        self.assertEqual(self.client.get(url_estado).json()['estado'], TrabajoLote.PENDIENTE)
+
+        call_command('procesar_lotes', una_vez=True, stdout=StringIO())
+
+        estado = self.client.get(url_estado).json()
+        self.assertEqual(estado['estado'], TrabajoLote.COMPLETADO)
+        self.assertEqual(estado['procesados'], 2)
+        self.assertEqual(estado['porcentaje'], 100.0)
+
+        response = self.client.get(estado['url_descarga'])
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as zip_file:
+            self.assertEqual(len(zip_file.namelist()), 2)
+
+    def test_un_trabajo_se_reclama_una_sola_vez(self):
+        from .lote_utils import reclamar_trabajo_lote
+        self.encolar(1)
+
+        trabajo = reclamar_trabajo_lote('worker-a')
+        self.assertIsNotNone(trabajo)
+        self.assertEqual(trabajo.estado, TrabajoLote.EN_PROCESO)
+        self.assertIsNone(reclamar_trabajo_lote('worker-b'))
+
+    def test_descarga_antes_de_terminar(self):
+        id_trabajo = self.encolar(1).json()['id_trabajo']
+        response = self.client.get(f'/lotes/{id_trabajo}/descargar/')
+        self.assertEqual(response.status_code, 409)
+
+
+class ConversorPrueba:
+    """
+    Conversor sustituto para las pruebas: no requiere LibreOffice ni docx2pdf
+    """
+    def convertir(self, docx_bytes):
+        return b'%PDF-prueba ' + str(len(docx_bytes)).encode()
+
+    def cerrar(self):
+        pass
+
+SERVIDOR_UNO_FALSO = """
+import argparse, time, xmlrpc.client
+from xmlrpc.server import SimpleXMLRPCServer
+parser = argparse.ArgumentParser()
+parser.add_argument('--interface')
+parser.add_argument('--port', type=int)
+parser.add_argument('--uno-port')
+parser.add_argument('--user-installation')
+parser.add_argument('--quiet', action='store_true')
+args = parser.parse_args()
+server = SimpleXMLRPCServer((args.interface, args.port), logRequests=False, allow_none=True)
+def convert(inpath=None, indata=None, outpath=None, convert_to=None, *resto):
+    if indata.data == b'lento':
+        time.sleep(30)
+    return xmlrpc.client.Binary(b'%PDF-uno ' + indata.data[::-1])
+server.register_function(convert)
+server.serve_forever()
+"""
+
+class ConversorPDFTests(TestCase):
+    @override_settings(CONVERSOR_PDF='generador.tests.ConversorPrueba')
+    def test_conversor_reemplazable(self):
+        from .document_utils import generar_certificado_desde_plantilla
+        qr = CodigoQR(construir_url_verificacion('prueba'))
+        contenido = generar_certificado_desde_plantilla(
+            {'nombre': 'Ana', 'carrera': 'Derecho'}, qr, 'prueba'
+        )
+        self.assertTrue(contenido.startswith(b'%PDF-prueba '))
+
+    def test_pool_libreoffice_con_servidor_local(self):
+        """
+        El pool mantiene los servidores activos entre conversiones
+        """
+        import sys
+        from .conversion_utils import ConversorLibreOffice
+
+        directorio = tempfile.mkdtemp()
+        comando = os.path.join(directorio, 'unoserver')
+        with open(comando, 'w') as f:
+            f.write(f'#!{sys.executable}\n' + SERVIDOR_UNO_FALSO)
+        os.chmod(comando, 0o755)
+
+        conversor = ConversorLibreOffice(instancias=2, comando=comando, timeout_arranque=20)
+        try:
+            self.assertEqual(conversor.convertir(b'abc'), b'%PDF-uno cba')
+            procesos = [instancia.proceso.pid for instancia in conversor._activas]
+
+            resultados = [conversor.convertir(docx) for docx in [b'1', b'22', b'333', b'4444']]
+            self.assertEqual(resultados, [b'%PDF-uno 1', b'%PDF-uno 22', b'%PDF-uno 333', b'%PDF-uno 4444'])
+            self.assertEqual([instancia.proceso.pid for instancia in conversor._activas], procesos)
+        finally:
+            conversor.cerrar()
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def test_instancia_caida_sin_reemplazo_sale_del_pool(self):
+        """
+        Si una instancia muere y la nueva no arranca, el pool sigue con las demás
+        """
+        import sys
+        from .conversion_utils import ConversorLibreOffice, ConversorPDF
+
+        with self.assertRaises(TypeError):
+            ConversorPDF()
+
+        directorio = tempfile.mkdtemp()
+        comando = os.path.join(directorio, 'unoserver')
+        with open(comando, 'w') as f:
+            f.write(f'#!{sys.executable}\n' + SERVIDOR_UNO_FALSO)
+        os.chmod(comando, 0o755)
+
+        conversor = ConversorLibreOffice(instancias=2, comando=comando, timeout_arranque=20)
+        try:
+            conversor.convertir(b'abc')
+            # La próxima conversión toma la primera instancia de la cola
+            caida = conversor._pool.queue[0]
+            viva, = [instancia for instancia in conversor._activas if instancia is not caida]
+            caida.proceso.kill()
+            caida.proceso.wait()
+            conversor.comando = os.path.join(directorio, 'inexistente')
+
+            with self.assertRaises(OSError):
+                conversor.convertir(b'abc')
+            self.assertEqual(conversor._activas, [viva])
+            self.assertEqual(conversor.convertir(b'abc'), b'%PDF-uno cba')
+            self.assertEqual(conversor.convertir(b'xyz'), b'%PDF-uno zyx')
+        finally:
+            conversor.cerrar()
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def test_instancia_sin_respuesta_se_reemplaza(self):
+        """
+        Una conversión que no responde vence y la instancia colgada se reemplaza
+        """
+        import sys
+        from .conversion_utils import ConversorLibreOffice
+
+        directorio = tempfile.mkdtemp()
+        comando = os.path.join(directorio, 'unoserver')
+        with open(comando, 'w') as f:
+            f.write(f'#!{sys.executable}\n' + SERVIDOR_UNO_FALSO)
+        os.chmod(comando, 0o755)
+
+        conversor = ConversorLibreOffice(instancias=2, comando=comando, timeout_arranque=20, timeout_conversion=1)
+        try:
+            conversor._asegurar_pool()
+            colgada = conversor._pool.queue[0]
+            with self.assertRaises(TimeoutError):
+                conversor.convertir(b'lento')
+            self.assertIsNotNone(colgada.proceso.poll())
+            self.assertNotIn(colgada, conversor._activas)
+            self.assertEqual(len(conversor._activas), 2)
+            self.assertEqual(conversor.convertir(b'abc'), b'%PDF-uno cba')
+        finally:
+            conversor.cerrar()
+            shutil.rmtree(directorio, ignore_errors=True)
+
+class MotorFondoPDFTests(MediaTemporalMixin, TestCase):
+    copiar_plantillas = True
+
+    def setUp(self):
+        super().setUp()
+        self.datos_prueba = {
+            'dni': '12345678',
+            'nombre': 'Usuario Prueba',
+            'carrera': 'Carrera Prueba',
+            'codigo': 'COD123'
+        }
+
+    def test_estampa_campos_sobre_fondo(self):
+        """
+        El motor fondo_pdf quita los marcadores de la plantilla y estampa los datos reales
+        """
+        from pypdf import PdfReader
+        from io import BytesIO
+
+        resultado = crear_certificado_completo(self.datos_prueba, formato='pdf', motor='fondo_pdf')
+        lector = PdfReader(BytesIO(resultado['contenido']))
+        texto = ''.join(pagina.extract_text() for pagina in lector.pages)
+
+        self.assertEqual(len(lector.pages), 2)
+        self.assertIn('Usuario Prueba', texto)
+        self.assertIn(resultado['id_certificado'], texto)
+        self.assertNotIn('{{', texto)
+
+    def test_qr_vectorial_sin_imagenes(self):
+        """
+        En modo vectorial la capa variable no incrusta imágenes y es más liviana que la raster
+        """
+        from .document_utils import CodigoQR, generar_certificado_pdf
+        qr = CodigoQR('http://localhost:8000/verificar/prueba/')
+
+        with override_settings(QR_MODO='vectorial'):
+            vectorial = generar_certificado_pdf('Ana', 'Derecho', 'prueba', qr)
+        with override_settings(QR_MODO='imagen'):
+            imagen = generar_certificado_pdf('Ana', 'Derecho', 'prueba', qr)
+
+        self.assertLess(len(vectorial), len(imagen))
+
+    def test_motor_desconocido(self):
+        with self.assertRaises(Exception):
+            crear_certificado_completo(self.datos_prueba, formato='pdf', motor='inexistente')
+
+class EmisionIdempotenteTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.datos_prueba = {
+            'dni': '12345678',
+            'nombre': 'Usuario Prueba',
+            'carrera': 'Carrera Prueba',
+            'codigo': 'COD123'
+        }
+
+    def test_reemision_reutiliza_id_y_pdf(self):
+        primero = crear_certificado_completo(self.datos_prueba, formato='pdf')
+        segundo = crear_certificado_completo(self.datos_prueba, formato='pdf')
+
+        self.assertFalse(primero['reutilizado'])
+        self.assertTrue(segundo['reutilizado'])
+        self.assertEqual(primero['id_certificado'], segundo['id_certificado'])
+        self.assertEqual(primero['contenido'], segundo['contenido'])
+        self.assertEqual(CertificadoGenerado.objects.filter(dni='12345678').count(), 1)
+
+        # Si el PDF almacenado se pierde se vuelve a renderizar con el mismo ID
+        certificado = CertificadoGenerado.objects.get(id_certificado=primero['id_certificado'])
+        os.unlink(os.path.join(self.media_root, *certificado.ruta_pdf.split('/')))
+        tercero = crear_certificado_completo(self.datos_prueba, formato='pdf')
+        self.assertEqual(tercero['id_certificado'], primero['id_certificado'])
+        certificado.refresh_from_db()
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, *certificado.ruta_pdf.split('/'))))
+        self.assertEqual(CertificadoGenerado.objects.count(), 1)
+
+    def test_lote_reutiliza_emitidos(self):
+        from .lote_utils import asignar_emisiones
+        from .document_utils import version_plantilla
+
+        emitido = crear_certificado_completo(self.datos_prueba, formato='pdf')
+        otro = {'dni': '87654321', 'nombre': 'Otra Persona', 'carrera': 'Derecho', 'codigo': 'COD999'}
+        filas = [self.datos_prueba, otro, otro]
+
+        emisiones = list(asignar_emisiones(filas, version_plantilla(), tamano=2))
+
+        self.assertEqual(emisiones[0][2], emitido['id_certificado'])
+        self.assertTrue(emisiones[0][4])
+        self.assertFalse(emisiones[1][4])
+        # La fila repetida en el mismo lote se omite: sólo se emite la primera
+        self.assertIsNone(emisiones[2][2])
+        self.assertTrue(emisiones[2][4])
+
+    def test_reclamar_emisiones_respeta_la_emision_simultanea(self):
+        """
+        Si otra descarga registró al estudiante después de asignar los IDs del lote,
+        el registro se inserta sin IntegrityError y prevalece el de la otra descarga
+        """
+        from .lote_utils import asignar_emisiones, reclamar_emisiones
+        from .document_utils import version_plantilla
+
+        otro = {'dni': '87654321', 'nombre': 'Otra Persona', 'carrera': 'Derecho', 'codigo': 'COD999'}
+        version = version_plantilla()
+        emisiones = list(asignar_emisiones([self.datos_prueba, otro], version))
+        ganadora = crear_certificado_completo(self.datos_prueba, formato='pdf')
+
+        reclamadas = reclamar_emisiones(
+            [(datos, id_certificado, url, '') for _, datos, id_certificado, url, _, _ in emisiones], version
+        )
+
+        (primero, propio_primero), (segundo, propio_segundo) = reclamadas
+        self.assertFalse(propio_primero)
+        self.assertEqual(str(primero.id_certificado), ganadora['id_certificado'])
+        self.assertTrue(propio_segundo)
+        self.assertEqual(str(segundo.id_certificado), emisiones[1][2])
+        self.assertEqual(CertificadoGenerado.objects.count(), 2)
+
+    def test_emision_simultanea_reutiliza_la_ganadora(self):
+        """
+        Si otra descarga registra el certificado mientras éste se renderiza,
+        se devuelve el de la ganadora en lugar de crear un segundo registro
+        """
+        from unittest import mock
+        from . import document_utils
+
+        ganadora = crear_certificado_completo(self.datos_prueba, formato='pdf')
+        # La búsqueda inicial no ve todavía el registro de la otra descarga
+        with mock.patch.object(document_utils, 'buscar_certificado_emitido', return_value=None):
+            perdedora = crear_certificado_completo(self.datos_prueba, formato='pdf')
+
+        self.assertTrue(perdedora['reutilizado'])
+        self.assertEqual(perdedora['id_certificado'], ganadora['id_certificado'])
+        self.assertEqual(CertificadoGenerado.objects.count(), 1)
+
+    def test_error_al_renderizar_no_deja_registro(self):
+        from unittest import mock
+        from . import document_utils
+
+        with mock.patch.dict(document_utils.MOTORES_CERTIFICADO, {'plantilla_word': mock.Mock(side_effect=OSError('sin conversor'))}):
+            with self.assertRaises(Exception):
+                crear_certificado_completo(self.datos_prueba, formato='pdf')
+        self.assertEqual(CertificadoGenerado.objects.count(), 0)
+
+    def test_restriccion_de_emision_unica(self):
+        from django.db import IntegrityError, transaction
+        import uuid
+        campos = {'dni': '1', 'codigo': 'A', 'nombre': 'x', 'carrera': 'y'}
+        CertificadoGenerado.objects.create(id_certificado=uuid.uuid4(), version_plantilla='fondo_pdf:abc', **campos)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CertificadoGenerado.objects.create(id_certificado=uuid.uuid4(), version_plantilla='fondo_pdf:abc', **campos)
+        # Los registros sin versión (anteriores a la emisión idempotente) pueden repetirse
+        CertificadoGenerado.objects.create(id_certificado=uuid.uuid4(), **campos)
+        CertificadoGenerado.objects.create(id_certificado=uuid.uuid4(), **campos)
+
+class AlmacenPDFTests(MediaTemporalMixin, TestCase):
+    def test_direccionado_por_contenido(self):
+        from .almacen_utils import AlmacenPDF
+
+        almacen = AlmacenPDF(os.path.join(self.media_root, 'certificados'))
+        ruta = almacen.guardar(b'%PDF-1.4 uno')
+
+        self.assertRegex(ruta, r'^certificados/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(almacen.guardar(b'%PDF-1.4 uno'), ruta)
+        self.assertEqual(almacen.leer(ruta), b'%PDF-1.4 uno')
+        self.assertIsNone(almacen.leer('/certificados/certificado_inexistente.pdf'))
+        self.assertIsNone(almacen.leer('certificados/../../settings.py'))
+
+    def test_desalojo_lru(self):
+        from .almacen_utils import AlmacenPDF
+
+        almacen = AlmacenPDF(os.path.join(self.media_root, 'certificados'), limite_bytes=3500)
+        rutas = []
+        for i in range(3):
+            rutas.append(almacen.guardar(bytes([i]) * 1000))
+            # Fechas de uso distintas; el primero se lee y pasa a ser el más reciente
+            os.utime(almacen.ruta_absoluta(rutas[-1]), (i, i))
+        almacen.leer(rutas[0])
+        almacen.guardar(b'\xff' * 1000)
+
+        self.assertIsNotNone(almacen.leer(rutas[0]))
+        self.assertIsNone(almacen.leer(rutas[1]))
+        self.assertIsNotNone(almacen.leer(rutas[2]))
+        self.assertLessEqual(almacen.uso_total(), 3500)
+
+    def test_presupuesto_compartido_entre_procesos(self):
+        """
+        Dos procesos que escriben en el mismo almacén (aquí dos instancias) vuelven
+        a medir el disco y no superan juntos el presupuesto
+        """
+        from .almacen_utils import AlmacenPDF
+
+        raiz = os.path.join(self.media_root, 'certificados')
+        procesos = [AlmacenPDF(raiz, limite_bytes=10000), AlmacenPDF(raiz, limite_bytes=10000)]
+        for i in range(30):
+            procesos[i % 2].guardar(bytes([i]) * 1000)
+            self.assertLessEqual(procesos[0].uso_total(), 10000)
+
+    def test_ver_pdf_renderiza_si_fue_desalojado(self):
+        resultado = crear_certificado_completo({
+            'dni': '12345678', 'nombre': 'Usuario Prueba', 'carrera': 'Carrera Prueba', 'codigo': 'COD123'
+        }, formato='pdf')
+        certificado = CertificadoGenerado.objects.get(id_certificado=resultado['id_certificado'])
+        ruta = os.path.join(self.media_root, *certificado.ruta_pdf.split('/'))
+        self.assertTrue(os.path.exists(ruta))
+
+        url = f"/verificar/{certificado.id_certificado}/pdf/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, resultado['contenido'])
+
+        os.unlink(ruta)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF-'))
+        certificado.refresh_from_db()
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, *certificado.ruta_pdf.split('/'))))
+
+        self.assertEqual(self.client.get('/verificar/inexistente/pdf/').status_code, 404)
+
+class VerificacionCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        # Caché compartida entre procesos (en producción, CACHE_URL con Redis)
+        directorio_cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio_cache, ignore_errors=True)
+        self.cache_compartida = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio_cache
+        }})
+        self.certificado = CertificadoGenerado.objects.create(
+            id_certificado='6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f', codigo='COD123', dni='12345678',
+            nombre='Usuario Prueba', carrera='Carrera Prueba',
+            url_verificacion='http://localhost:8000/verificar/6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f/'
+        )
+
+    def test_cache_y_peticion_condicional(self):
+        response = self.client.get('/verificar/6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Usuario Prueba')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('public', response['Cache-Control'])
+
+        # Las siguientes consultas no llegan a la base de datos
+        with self.assertNumQueries(0):
+            response = self.client.get('/verificar/6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertNumQueries(0):
+            datos = self.client.get('/api/verificar/6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f/').json()
+        self.assertTrue(datos['valido'])
+        self.assertEqual(datos['nombre'], 'Usuario Prueba')
+
+    def test_verificacion_masiva(self):
+        import json
+        id_valido = '6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f'
+        id_inexistente = '00000000-0000-4000-8000-000000000000'
+        cuerpo = json.dumps({'ids': [id_valido, id_inexistente, 'mal-formado']})
+
+        with self.cache_compartida, self.assertNumQueries(1):
+            response = self.client.post('/api/verificar/', cuerpo, content_type='application/json')
+        resultados = response.json()['resultados']
+        self.assertEqual([r['valido'] for r in resultados], [True, False, False])
+        self.assertEqual(resultados[0]['nombre'], 'Usuario Prueba')
+
+        # La caché se comparte con la verificación individual
+        with self.cache_compartida, self.assertNumQueries(0):
+            self.client.post('/api/verificar/', cuerpo, content_type='application/json')
+            self.assertEqual(self.client.get(f'/api/verificar/{id_inexistente}/').status_code, 404)
+            self.assertTrue(self.client.get(f'/api/verificar/{id_valido}/').json()['valido'])
+
+    def test_verificacion_masiva_ids_repetidos(self):
+        """
+        Cada ID recibido tiene su resultado, en el mismo orden, aunque se repita
+        """
+        import json
+        id_valido = '6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f'
+        ids = [id_valido, 'mal-formado', id_valido.upper(), id_valido, 'mal-formado']
+
+        response = self.client.post('/api/verificar/', json.dumps({'ids': ids}), content_type='application/json')
+        resultados = response.json()['resultados']
+        self.assertEqual(len(resultados), len(ids))
+        self.assertEqual([r['valido'] for r in resultados], [True, False, True, True, False])
+        self.assertEqual(resultados[1]['id_certificado'], 'mal-formado')
+
+    @override_settings(VERIFICACION_LOTE_MAXIMO=2)
+    def test_verificacion_masiva_limites(self):
+        import json
+        response = self.client.post('/api/verificar/', json.dumps({'ids': ['a', 'b', 'c']}), content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        response = self.client.post('/api/verificar/', 'no es json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_consultas_negativas_en_cache(self):
+        with self.cache_compartida:
+            with self.assertNumQueries(1):
+                self.client.get('/verificar/00000000-0000-4000-8000-000000000000/')
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/verificar/00000000-0000-4000-8000-000000000000/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['valido'])
+        # La respuesta negativa no se guarda en proxies ni en el navegador
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+        # Un ID mal formado se descarta sin consultar la base de datos
+        with self.assertNumQueries(0):
+            response = self.client.get('/verificar/inexistente/')
+        self.assertContains(response, 'no es válido')
+
+    def test_sin_cache_negativa_en_la_cache_de_cada_proceso(self):
+        """
+        Con la caché en memoria de cada worker un ID inexistente no se guarda: si se
+        registra en otro worker, éste lo encuentra en la siguiente consulta
+        """
+        import uuid
+        id_certificado = '00000000-0000-4000-8000-000000000000'
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(f'/api/verificar/{id_certificado}/').status_code, 404)
+
+        # Registro en otro proceso: aquí no se invalida nada
+        CertificadoGenerado.objects.bulk_create([CertificadoGenerado(
+            id_certificado=uuid.UUID(id_certificado), codigo='P001', dni='87654321',
+            nombre='Otra Persona', carrera='Derecho'
+        )])
+        self.assertTrue(self.client.get(f'/api/verificar/{id_certificado}/').json()['valido'])
+
+class PlanesConsultaTests(MediaTemporalMixin, TestCase):
+    """
+    Revisa con EXPLAIN QUERY PLAN las consultas de cada vista: ninguna debe recorrer
+    una tabla completa de la aplicación
+    """
+
+    def setUp(self):
+        from django.db import connection
+        if connection.vendor != 'sqlite':
+            self.skipTest('Los planes de consulta se revisan en SQLite')
+
+        super().setUp()
+
+        Estudiante.objects.create(dni='12345678', codigo='COD123', nombre='Usuario Prueba', carrera='Derecho')
+        self.certificado = CertificadoGenerado.objects.create(
+            id_certificado='6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f', codigo='COD123', dni='12345678',
+            nombre='Usuario Prueba', carrera='Derecho', version_plantilla='plantilla_word:prueba',
+            url_verificacion='http://localhost:8000/verificar/6f1c2b8e-3d4a-4c5b-9e7f-0a1b2c3d4e5f/'
+        )
+        self.trabajo = TrabajoLote.objects.create(archivo_excel='lotes/entrada/lote.xlsx', cantidad=1)
+
+    def recorridos_completos(self, consultas):
+        from django.db import connection
+        recorridos = []
+        with connection.cursor() as cursor:
+            for consulta in consultas:
+                sql = consulta['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for *_, detalle in cursor.fetchall():
+                    # "SCAN tabla" sin "USING ... INDEX" es un recorrido completo
+                    if detalle.startswith('SCAN generador_') and 'INDEX' not in detalle:
+                        recorridos.append(f'{detalle}: {sql}')
+        return recorridos
+
+    def capturar(self, funcion):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.core.cache import cache
+        cache.clear()
+        with CaptureQueriesContext(connection) as contexto:
+            funcion()
+        return contexto.captured_queries
+
+    def test_vistas_sin_recorridos_completos(self):
+        from .document_utils import buscar_certificado_emitido
+        from .lote_utils import asignar_emisiones, reclamar_trabajo_lote
+
+        admin = Client()
+        admin.post('/', {'form_type': 'login', 'username': 'Upla_123', 'password': 'Upla321'})
+        estudiante = Client()
+
+        id_certificado = str(self.certificado.id_certificado)
+        recorridos = {
+            'index': lambda: estudiante.post('/', {'form_type': 'login', 'username': '12345678', 'password': 'COD123'}),
+            'verificar': lambda: self.client.get(f'/verificar/{id_certificado}/'),
+            'verificar_json': lambda: self.client.get(f'/api/verificar/{id_certificado}/'),
+            'verificar_lote': lambda: self.client.post(
+                '/api/verificar/', {'ids': [id_certificado]}, content_type='application/json'
+            ),
+            'ver_pdf': lambda: self.client.get(f'/verificar/{id_certificado}/pdf/'),
+            'listar_certificados': lambda: admin.get('/listar_certificados/'),
+            'listar_filtros': lambda: admin.get('/listar_certificados/', {'dni': '12345678'}),
+            'listar_carrera': lambda: admin.get('/listar_certificados/', {'carrera': 'Derecho', 'cursor': 'MjAyNi0wMS0wMVQwMDowMDowMCswMDowMHwxMA'}),
+            'listar_nombre': lambda: admin.get('/listar_certificados/', {'nombre': 'USUARIO'}),
+            'busqueda': lambda: admin.get('/listar_certificados/', {'q': 'usuario 1234'}),
+            'exportar': lambda: b''.join(admin.get('/listar_certificados/exportar/', {
+                'formato': 'csv', 'desde': '2020-01-01', 'hasta': '2030-12-31'
+            }).streaming_content),
+            'exportar_carrera': lambda: b''.join(admin.get('/listar_certificados/exportar/', {
+                'formato': 'xlsx', 'carrera': 'Derecho', 'desde': '2020-01-01'
+            }).streaming_content),
+            'estado_lote': lambda: admin.get(f'/lotes/{self.trabajo.id_trabajo}/'),
+            'emision': lambda: buscar_certificado_emitido('12345678', 'COD123', 'plantilla_word:prueba'),
+            'emision_lote': lambda: list(asignar_emisiones(
+                [{'dni': '12345678', 'codigo': 'COD123'}], 'plantilla_word:prueba'
+            )),
+            'cola_lotes': lambda: reclamar_trabajo_lote('worker-a', expiracion=60),
+        }
+        for nombre, funcion in recorridos.items():
+            with self.subTest(vista=nombre):
+                self.assertEqual(self.recorridos_completos(self.capturar(funcion)), [])
+
+class ListadoCertificadosTests(TestCase):
+    def setUp(self):
+        import datetime
+        from django.utils import timezone
+        base = timezone.now()
+        for i in range(25):
+            certificado = CertificadoGenerado.objects.create(
+                id_certificado=f'00000000-0000-4000-8000-{i:012d}', codigo=f'P{i:03d}', dni=str(10000000 + i),
+                nombre=f'{"GARCIA" if i % 2 else "PEREZ"} ESTUDIANTE {i}', carrera='DERECHO' if i < 5 else 'MEDICINA'
+            )
+            # Algunas fechas repetidas para comprobar el desempate por id
+            CertificadoGenerado.objects.filter(pk=certificado.pk).update(
+                fecha_generacion=base - datetime.timedelta(minutes=i // 2)
+            )
+        self.client = Client()
+        self.client.post('/', {'form_type': 'login', 'username': 'Upla_123', 'password': 'Upla321'})
+
+    def test_paginacion_por_cursor_sin_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        vistos = []
+        url = '/listar_certificados/'
+        while url:
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT(' in consulta['sql'] for consulta in contexto.captured_queries))
+            vistos.extend(c['id_certificado'] for c in response.context['certificados'])
+            cursor = response.context['cursor_siguiente']
+            url = f'/listar_certificados/?cursor={cursor}' if cursor else None
+
+        esperados = list(CertificadoGenerado.objects.order_by('-fecha_generacion', '-id').values_list('id_certificado', flat=True))
+        self.assertEqual(vistos, esperados)
+
+        # Volver a la página anterior desde la segunda
+        primera = self.client.get('/listar_certificados/')
+        segunda = self.client.get(f"/listar_certificados/?cursor={primera.context['cursor_siguiente']}")
+        anterior = self.client.get(
+            f"/listar_certificados/?cursor={segunda.context['cursor_anterior']}&direccion=anterior"
+        )
+        self.assertEqual(anterior.context['certificados'], primera.context['certificados'])
+        self.assertIsNone(anterior.context['cursor_anterior'])
+
+    def test_filtros(self):
+        response = self.client.get('/listar_certificados/', {'carrera': 'DERECHO'})
+        self.assertEqual(len(response.context['certificados']), 5)
+        self.assertIsNone(response.context['cursor_siguiente'])
+
+        response = self.client.get('/listar_certificados/', {'nombre': 'garcia', 'carrera': 'DERECHO'})
+        self.assertEqual([c['dni'] for c in response.context['certificados']], ['10000001', '10000003'])
+
+        response = self.client.get('/listar_certificados/', {'dni': '10000007'})
+        self.assertContains(response, 'GARCIA ESTUDIANTE 7')
+
+    def test_filtro_nombre_sin_distinguir_mayusculas(self):
+        # Nombres emitidos antes de normalizar el padrón, en mayúsculas y minúsculas
+        CertificadoGenerado.objects.create(
+            id_certificado='00000000-0000-4000-8000-100000000000', codigo='Q001', dni='20000000',
+            nombre='Quispe Mamani Rosa', carrera='DERECHO'
+        )
+        for nombre in ('quispe', 'QUISPE MAM', 'Quispe'):
+            with self.subTest(nombre=nombre):
+                response = self.client.get('/listar_certificados/', {'nombre': nombre})
+                self.assertEqual([c['dni'] for c in response.context['certificados']], ['20000000'])
+
+
+class BusquedaCertificadosTests(TestCase):
+    def setUp(self):
+        from django.db import connection
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('Búsqueda con índice de texto sólo en SQLite y PostgreSQL')
+        CertificadoGenerado.objects.create(
+            id_certificado='00000000-0000-4000-8000-000000000001', codigo='P001', dni='75272715',
+            nombre='CHAVEZ RICALDI NOELIA', carrera='TECNOLOGÍA MÉDICA - TERAPIA FÍSICA Y REHABILITACIÓN'
+        )
+        CertificadoGenerado.objects.bulk_create([
+            CertificadoGenerado(
+                id_certificado='00000000-0000-4000-8000-000000000002', codigo='P002', dni='41554752',
+                nombre='FLORES MALPICA EDWIN EDER', carrera='DERECHO'
+            ),
+            CertificadoGenerado(
+                id_certificado='00000000-0000-4000-8000-000000000003', codigo='P003', dni='75211111',
+                nombre='RICALDI FLORES ANA', carrera='DERECHO'
+            ),
+        ])
+
+    def test_busqueda_parcial_y_sincronizada(self):
+        from .busqueda_utils import buscar_certificados
+
+        self.assertEqual([c['dni'] for c in buscar_certificados('chav')], ['75272715'])
+        self.assertEqual({c['dni'] for c in buscar_certificados('7527')}, {'75272715'})
+        self.assertEqual({c['dni'] for c in buscar_certificados('medica')}, {'75272715'})
+        self.assertEqual({c['dni'] for c in buscar_certificados('flores derecho')}, {'41554752', '75211111'})
+        self.assertEqual(buscar_certificados('"*) OR ('), [])
+
+        # Los cambios en la tabla se reflejan en el índice
+        CertificadoGenerado.objects.filter(dni='41554752').update(nombre='QUISPE MAMANI EDWIN')
+        self.assertEqual({c['dni'] for c in buscar_certificados('flores')}, {'75211111'})
+        CertificadoGenerado.objects.filter(dni='75211111').delete()
+        self.assertEqual(buscar_certificados('flores'), [])
+
+    def test_busqueda_en_listado(self):
+        client = Client()
+        client.post('/', {'form_type': 'login', 'username': 'Upla_123', 'password': 'Upla321'})
+        response = client.get('/listar_certificados/', {'q': 'ricaldi'})
+        self.assertEqual(len(response.context['certificados']), 2)
+        self.assertIsNone(response.context['cursor_siguiente'])
+
+
+class ExportacionCertificadosTests(TestCase):
+    def setUp(self):
+        import datetime
+        from django.utils import timezone
+        for i in range(5):
+            certificado = CertificadoGenerado.objects.create(
+                id_certificado=f'00000000-0000-4000-8000-{i:012d}', codigo=f'P{i:03d}', dni=str(10000000 + i),
+                nombre=f'ESTUDIANTE {i}', carrera='DERECHO' if i % 2 else 'MEDICINA'
+            )
+            CertificadoGenerado.objects.filter(pk=certificado.pk).update(
+                fecha_generacion=timezone.make_aware(datetime.datetime(2025, 3, 1 + i, 12))
+            )
+        self.client = Client()
+        self.client.post('/', {'form_type': 'login', 'username': 'Upla_123', 'password': 'Upla321'})
+
+    def test_csv_en_streaming_con_filtros(self):
+        import csv
+        response = self.client.get('/listar_certificados/exportar/', {
+            'formato': 'csv', 'desde': '2025-03-02', 'hasta': '2025-03-04', 'carrera': 'DERECHO'
+        })
+        self.assertTrue(response.streaming)
+        texto = b''.join(response.streaming_content).decode('utf-8-sig')
+        filas = list(csv.reader(texto.splitlines()))
+        self.assertEqual(filas[0][1], 'DNI')
+        self.assertEqual([fila[1] for fila in filas[1:]], ['10000001', '10000003'])
+        self.assertEqual(filas[1][5], '2025-03-02 12:00:00')
+
+    def test_xlsx(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        response = self.client.get('/listar_certificados/exportar/', {'formato': 'xlsx'})
+        libro = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        filas = list(libro.active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[1][3], 'ESTUDIANTE 0')
+
+    @override_settings(EXPORTACION_XLSX_MAXIMO_FILAS=4)
+    def test_xlsx_con_maximo_de_filas(self):
+        response = self.client.get('/listar_certificados/exportar/', {'formato': 'xlsx'})
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('CSV', response.json()['error'])
+        # Con filtros que quedan dentro del máximo sí se exporta; el CSV no tiene límite
+        response = self.client.get('/listar_certificados/exportar/', {'formato': 'xlsx', 'carrera': 'MEDICINA'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/listar_certificados/exportar/', {'formato': 'csv'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_formato_desconocido(self):
+        response = self.client.get('/listar_certificados/exportar/', {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkCertificadosTests(TestCase):
+    def test_informe_y_comparacion_con_linea_base(self):
+        import json
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        salida = StringIO()
+        call_command('benchmark_certificados', filas=3, etapas='qr_png,registro_bd', stdout=salida, stderr=StringIO())
+        informe = json.loads(salida.getvalue())
+
+        self.assertEqual(set(informe['etapas']), {'qr_png', 'registro_bd'})
+        self.assertEqual(informe['etapas']['qr_png']['n'], 3)
+        self.assertLessEqual(informe['etapas']['qr_png']['p50_ms'], informe['etapas']['qr_png']['max_ms'])
+        # El benchmark no deja registros
+        self.assertEqual(CertificadoGenerado.objects.count(), 0)
+
+        # Una línea base mucho más rápida hace fallar la comparación
+        informe['etapas']['qr_png']['p95_ms'] /= 100
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(informe, f)
+        try:
+            with self.assertRaises(CommandError):
+                call_command('benchmark_certificados', filas=3, etapas='qr_png', linea_base=f.name,
+                             stdout=StringIO(), stderr=StringIO())
+        finally:
+            os.unlink(f.name)
+
+
+class MetricasEtapasTests(MediaTemporalMixin, TestCase):
+    copiar_plantillas = True
+
+    def setUp(self):
+        super().setUp()
+        from .metricas_utils import reiniciar_metricas
+        reiniciar_metricas()
+        self.datos_prueba = {
+            'dni': '12345678',
+            'nombre': 'Usuario Prueba',
+            'carrera': 'Carrera Prueba',
+            'codigo': 'COD123'
+        }
+
+    def test_tramos_por_etapa_y_server_timing(self):
+        from .metricas_utils import cabecera_server_timing, registrar_tramos
+
+        with registrar_tramos() as tramos:
+            crear_certificado_completo(self.datos_prueba, formato='pdf', motor='fondo_pdf')
+
+        etapas = {etapa for etapa, _ in tramos}
+        self.assertEqual(etapas, {'total', 'bd', 'qr', 'plantilla', 'almacen'})
+        cabecera = cabecera_server_timing(tramos)
+        self.assertRegex(cabecera, r'^(\w+;dur=\d+\.\d)(, \w+;dur=\d+\.\d)*$')
+        # Los tramos de la misma etapa se suman en una sola entrada
+        self.assertEqual(cabecera.count('bd;'), 1)
+
+    def test_endpoint_prometheus_por_etapa_y_motor(self):
+        crear_certificado_completo(self.datos_prueba, formato='pdf', motor='fondo_pdf')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE certificados_etapa_segundos histogram', texto)
+        self.assertIn('certificados_etapa_segundos_count{etapa="plantilla",motor="fondo_pdf"} 1', texto)
+        # Las etapas internas heredan el motor de la emisión
+        self.assertIn('certificados_etapa_segundos_bucket{etapa="qr",motor="fondo_pdf",le="+Inf"} 1', texto)
+
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, 403)
+
+
+class EmitirLoteTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.padron = os.path.join(self.directorio, 'padron.xlsx')
+        pd.DataFrame([
+            {'CODIGO': f'P{i:03d}', 'DNI': 10000000 + i, 'NOMBRES': f'Estudiante {i}', 'CARRERA': 'Derecho'}
+            for i in range(3)
+        ]).to_excel(self.padron, index=False)
+        self.salida = os.path.join(self.directorio, 'salida')
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def emitir(self, **opciones):
+        from django.core.management import call_command
+        call_command('emitir_lote', self.padron, self.salida, procesos=2, stdout=StringIO(), **opciones)
+        with open(os.path.join(self.salida, '.avance_emision.json')) as f:
+            import json
+            return json.load(f)
+
+    def test_emite_reanuda_y_omite_emitidos(self):
+        avance = self.emitir()
+        self.assertEqual((avance['fila'], avance['generados'], avance['omitidos']), (3, 3, 0))
+        self.assertEqual(CertificadoGenerado.objects.count(), 3)
+        ruta = os.path.join(self.salida, 'certificado_10000002_P002.pdf')
+        with open(ruta, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF-'))
+
+        # Ejecución interrumpida tras la segunda fila: sólo se retoma la tercera
+        CertificadoGenerado.objects.filter(dni='10000002').delete()
+        os.remove(ruta)
+        import json
+        with open(os.path.join(self.salida, '.avance_emision.json'), 'w') as f:
+            json.dump({**avance, 'fila': 2, 'generados': 2}, f)
+        avance = self.emitir()
+        self.assertEqual((avance['fila'], avance['generados'], avance['omitidos']), (3, 3, 0))
+        self.assertTrue(os.path.exists(ruta))
+        self.assertEqual(CertificadoGenerado.objects.count(), 3)
+
+        # Desde el principio, todos los estudiantes ya tienen certificado
+        avance = self.emitir(reiniciar=True)
+        self.assertEqual((avance['generados'], avance['omitidos']), (0, 3))
+        self.assertEqual(CertificadoGenerado.objects.count(), 3)
+
+    def test_filas_con_error_se_reintentan(self):
+        from unittest import mock
+        from . import lote_utils
+
+        # La segunda fila falla al escribirse; el avance sigue, pero la fila queda pendiente
+        escribir = lote_utils.escribir_pdf_directorio
+        def escribir_con_error(directorio, nombre_archivo, contenido):
+            if '10000001' in nombre_archivo:
+                raise OSError('disco lleno')
+            return escribir(directorio, nombre_archivo, contenido)
+
+        with mock.patch.object(lote_utils, 'escribir_pdf_directorio', escribir_con_error):
+            avance = self.emitir()
+        self.assertEqual((avance['fila'], avance['generados'], avance['fallidos']), (3, 2, 1))
+        self.assertEqual(avance['pendientes'], [2])
+
+        avance = self.emitir()
+        self.assertEqual((avance['fila'], avance['generados'], avance['omitidos']), (3, 3, 0))
+        self.assertEqual((avance['fallidos'], avance['pendientes']), (0, []))
+        self.assertTrue(os.path.exists(os.path.join(self.salida, 'certificado_10000001_P001.pdf')))
+        self.assertEqual(CertificadoGenerado.objects.count(), 3)
+
+    def test_avance_de_otro_padron(self):
+        from django.core.management.base import CommandError
+        self.emitir()
+        os.utime(self.padron, ns=(0, 0))
+        with self.assertRaises(CommandError):
+            self.emitir()
+
+
+class ArranqueWorkerTests(TestCase):
+    def test_urls_sin_paquetes_de_renderizado(self):
+        """
+        Importar las URLs (lo que hace cada worker al arrancar) no carga el motor de renderizado
+        """
+        from django.core.management import call_command
+        salida = StringIO()
+        call_command('perfil_arranque', limite=3, stdout=salida)
+        self.assertIn('No se cargó ningún paquete de renderizado', salida.getvalue())
+
+    def test_precalentamiento_opcional(self):
+        from django.apps import apps
+        from . import document_utils
+        document_utils.limpiar_cache_plantillas()
+
+        with override_settings(CERTIFICADOS_PRECALENTAR=False):
+            apps.get_app_config('generador').ready()
+        self.assertEqual(document_utils._plantillas_cache, {})
+
+        with override_settings(CERTIFICADOS_PRECALENTAR=True, MOTOR_CERTIFICADO='plantilla_word'):
+            apps.get_app_config('generador').ready()
+        self.assertIn(document_utils.ruta_plantilla_motor('plantilla_word'), document_utils._plantillas_cache)
+
+
+class ContextoReportlabTests(TestCase):
+    def setUp(self):
+        import reportlab
+        # Fuentes TTF de reportlab con los nombres de Liberation Serif
+        self.fuentes = tempfile.mkdtemp()
+        origen = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+        for vera, liberation in (('Vera.ttf', 'Regular'), ('VeraBd.ttf', 'Bold'),
+                                 ('VeraIt.ttf', 'Italic'), ('VeraBI.ttf', 'BoldItalic')):
+            shutil.copy(os.path.join(origen, vera), os.path.join(self.fuentes, f'LiberationSerif-{liberation}.ttf'))
+        self.override = override_settings(FUENTES_PDF_DIR=self.fuentes)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.fuentes, ignore_errors=True)
+
+    def test_fuentes_registradas_una_vez_y_compartidas(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from io import BytesIO
+        from docx import Document
+        from pypdf import PdfReader
+        from .document_utils import generar_pdf_directo
+        from .estilos_pdf_utils import obtener_contexto_reportlab
+
+        contexto = obtener_contexto_reportlab()
+        self.assertTrue(contexto.usa_times_new_roman)
+        self.assertIs(obtener_contexto_reportlab(), contexto)
+
+        def pdf_de_usuario(i):
+            docx = BytesIO()
+            documento = Document()
+            documento.add_paragraph(f'Usuario {i}')
+            documento.save(docx)
+            docx.seek(0)
+            return generar_pdf_directo(docx)
+
+        with ThreadPoolExecutor(4) as executor:
+            pdfs = list(executor.map(pdf_de_usuario, range(8)))
+
+        for i, pdf in enumerate(pdfs):
+            self.assertTrue(pdf.startswith(b'%PDF-'))
+            # Times New Roman incrustada como subconjunto TrueType
+            self.assertIn(b'/FontFile2', pdf)
+            # Cada PDF armado en paralelo trae su propio texto con los glifos correctos
+            self.assertIn(f'Usuario {i}', PdfReader(BytesIO(pdf)).pages[0].extract_text())
+        self.assertIs(obtener_contexto_reportlab(), contexto)
@@ -10,7 +10,15 @@ urlpatterns = [
     path('descargar_plantilla/', views.descargar_plantilla, name='descargar_plantilla'),
     path('generar_lote/', views.generar_lote, name='generar_lote'),
     path('verificar/<str:id_certificado>/', views.verificar_certificado, name='verificar_certificado'),
+    path('api/verificar/', views.verificar_certificados_lote, name='verificar_certificados_lote'),
+    path('api/verificar/<str:id_certificado>/', views.verificar_certificado_json, name='verificar_certificado_json'),
+    path('verificar/<str:id_certificado>/pdf/', views.ver_pdf_certificado, name='ver_pdf_certificado'),
     path('listar_certificados/', views.listar_certificados, name='listar_certificados'),
+    path('listar_certificados/exportar/', views.exportar_certificados, name='exportar_certificados'),
+    path('lotes/', views.encolar_lote, name='encolar_lote'),
+    path('lotes/<uuid:id_trabajo>/', views.estado_lote, name='estado_lote'),
+    path('lotes/<uuid:id_trabajo>/descargar/', views.descargar_lote, name='descargar_lote'),
+    path('metrics', views.metricas, name='metricas'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,145 @@
+"""
+Consulta de certificados para la verificación pública (la URL de cada QR).
+Las respuestas se guardan en la caché de Django para que las ráfagas de escaneos no
+lleguen a la base de datos. Las de IDs inexistentes sólo se guardan si la caché es
+compartida por todos los procesos: con una caché en memoria por worker, el registro
+de un certificado sólo invalidaría la del worker que lo emitió.
+"""
+import uuid
+import hashlib
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from .models import CertificadoGenerado
+
+PREFIJO_CACHE = 'verificacion:'
+
+# Marca guardada en la caché para los IDs que no existen
+NO_ENCONTRADO = 'no_encontrado'
+
+CAMPOS_VERIFICACION = ('id_certificado', 'nombre', 'dni', 'carrera', 'codigo', 'fecha_generacion')
+
+# IDs por consulta id__in en la verificación masiva
+TAMANO_BLOQUE_VERIFICACION = 200
+
+
+def normalizar_id_certificado(valor):
+    """
+    UUID del certificado o None si el valor no puede ser un ID válido
+    """
+    try:
+        return uuid.UUID(str(valor))
+    except ValueError:
+        return None
+
+
+def clave_verificacion(id_certificado):
+    # Los IDs se hashean para respetar el largo y los caracteres permitidos en las claves
+    return PREFIJO_CACHE + hashlib.sha1(str(id_certificado).encode()).hexdigest()
+
+
+def segundos_cache_negativa():
+    """
+    Segundos que se guarda la consulta de un ID inexistente; 0 si la caché es
+    propia de cada proceso (LocMemCache) y no se puede invalidar en los demás
+    """
+    if isinstance(caches['default'], LocMemCache):
+        return 0
+    return getattr(settings, 'VERIFICACION_CACHE_NEGATIVA_SEGUNDOS', 60)
+
+
+def etag_certificado(datos):
+    contenido = '|'.join(str(datos[campo]) for campo in CAMPOS_VERIFICACION)
+    return hashlib.sha1(contenido.encode()).hexdigest()
+
+
+def consultar_verificacion(id_certificado):
+    """
+    Datos públicos del certificado (con su ETag) o None si no existe.
+    Se consulta la base de datos sólo cuando el ID no está en la caché.
+    """
+    id_certificado = normalizar_id_certificado(id_certificado)
+    if id_certificado is None:
+        # Un ID mal formado no puede existir: no hace falta consultar la caché ni la base de datos
+        return None
+
+    clave = clave_verificacion(id_certificado)
+    datos = cache.get(clave)
+    if datos == NO_ENCONTRADO:
+        return None
+    if datos is not None:
+        return datos
+
+    datos = CertificadoGenerado.objects.filter(
+        id_certificado=id_certificado
+    ).values(*CAMPOS_VERIFICACION).first()
+
+    if datos is None:
+        segundos = segundos_cache_negativa()
+        if segundos:
+            cache.set(clave, NO_ENCONTRADO, segundos)
+        return None
+
+    datos['etag'] = etag_certificado(datos)
+    cache.set(clave, datos, getattr(settings, 'VERIFICACION_CACHE_SEGUNDOS', 300))
+    return datos
+
+
+def consultar_verificaciones(ids_certificado, tamano_bloque=TAMANO_BLOQUE_VERIFICACION):
+    """
+    Verificación de varios certificados a la vez: lista de (id, datos o None) con
+    una entrada por cada ID recibido, en el mismo orden y con los repetidos incluidos.
+    Usa la misma caché que consultar_verificacion; los IDs que no están en ella se
+    resuelven con una consulta id__in por bloque y luego se guardan en la caché.
+    """
+    segundos_negativa = segundos_cache_negativa()
+    uuids = {}
+    for id_certificado in ids_certificado:
+        uuids.setdefault(id_certificado, normalizar_id_certificado(id_certificado))
+
+    claves = {clave_verificacion(valor): valor for valor in set(uuids.values()) if valor is not None}
+    en_cache = cache.get_many(list(claves))
+    encontrados = {
+        claves[clave]: None if datos == NO_ENCONTRADO else datos for clave, datos in en_cache.items()
+    }
+
+    pendientes = [valor for clave, valor in claves.items() if clave not in en_cache]
+    for inicio in range(0, len(pendientes), tamano_bloque):
+        bloque = pendientes[inicio:inicio + tamano_bloque]
+        consulta = CertificadoGenerado.objects.filter(id_certificado__in=bloque).values(*CAMPOS_VERIFICACION)
+        nuevos = {}
+        for datos in consulta:
+            datos['etag'] = etag_certificado(datos)
+            encontrados[datos['id_certificado']] = datos
+            nuevos[clave_verificacion(datos['id_certificado'])] = datos
+        cache.set_many(nuevos, getattr(settings, 'VERIFICACION_CACHE_SEGUNDOS', 300))
+        if segundos_negativa:
+            cache.set_many(
+                {clave_verificacion(valor): NO_ENCONTRADO for valor in bloque if valor not in encontrados},
+                segundos_negativa
+            )
+
+    return [(id_certificado, encontrados.get(uuids[id_certificado])) for id_certificado in ids_certificado]
+
+
+def invalidar_verificacion(ids_certificado):
+    """
+    Descarta de la caché las consultas de estos IDs (p. ej. una consulta negativa
+    hecha antes de que el certificado quedara registrado)
+    """
+    cache.delete_many([
+        clave_verificacion(normalizar_id_certificado(id_certificado)) for id_certificado in ids_certificado
+    ])
+
+
+def datos_verificacion_json(datos):
+    """
+    Representación compacta de un certificado para la variante JSON
+    """
+    return {
+        'valido': True,
+        'id_certificado': str(datos['id_certificado']),
+        'nombre': datos['nombre'],
+        'carrera': datos['carrera'],
+        'fecha_generacion': datos['fecha_generacion'].isoformat(),
+    }
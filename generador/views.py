@@ -1,263 +1,43 @@
 from django.shortcuts import render, redirect
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST, require_safe
 from django.conf import settings
+from io import BytesIO
+from urllib.parse import urlencode
 import os
-import tempfile
-import pandas as pd
-import datetime
-from .document_utils import crear_certificado_completo, generar_qr_optimizado
+import zipfile
+import json
+from .busqueda_utils import buscar_certificados
+from .exportacion_utils import FORMATOS_EXPORTACION, ITERADORES_EXPORTACION, consulta_exportacion, leer_fecha
+from .listado_utils import SIGUIENTE, pagina_certificados
+from .metricas_utils import cabecera_server_timing, registrar_tramos, texto_prometheus
+from .roster_utils import abrir_padron, importar_padron
+from .verificacion_utils import (
+    consultar_verificacion,
+    consultar_verificaciones,
+    datos_verificacion_json,
+    normalizar_id_certificado
+)
 
 
-def procesar_plantilla_word_y_generar_pdf(plantilla_path, datos, qr_path, id_certificado):
-    """
-    Procesa la plantilla de Word usando docxtpl y genera PDF usando reportlab
-    Mantiene EXACTAMENTE el diseño de la plantilla original
-    """
-    try:
-        # 1. Procesar la plantilla de Word usando docxtpl (como antes)
-        doc = DocxTemplate(plantilla_path)
-        
-        # Crear un RichText para el nombre con Times New Roman (como antes)
-        nombre_rt = RichText()
-        nombre_rt.add(datos['nombre'], font='Times New Roman', size=56, bold=True, italic=True)
-        
-        # Preparar el contexto con el nombre estilizado (como antes)
-        context = {
-            'nombre': nombre_rt,
-            'qr_code': InlineImage(doc, qr_path, width=Mm(30), height=Mm(30)),
-            'id_certificado': id_certificado
-        }
-        
-        # Renderizar la plantilla (como antes)
-        doc.render(context)
-        
-        # Guardar temporalmente el documento procesado
-        temp_docx = os.path.join(tempfile.gettempdir(), f'certificado_temp_{id_certificado}.docx')
-        doc.save(temp_docx)
-        
-        # 2. Convertir el documento Word procesado a PDF usando reportlab
-        # Esto mantiene el diseño exacto de tu plantilla
-        pdf_content = convertir_docx_a_pdf_con_plantilla(temp_docx, datos, qr_path)
-        
-        # Limpiar archivo temporal
-        os.remove(temp_docx)
-        
-        return pdf_content
-        
-    except Exception as e:
-        print(f"Error al procesar plantilla Word: {e}")
-        # Fallback: usar la función original si hay error
-        return generar_certificado_pdf_multiplataforma(datos['nombre'], datos['carrera'], id_certificado, qr_path)
-
-
-def convertir_docx_a_pdf_con_plantilla(temp_docx_path, datos, qr_path):
-    """
-    Convierte el documento Word procesado a PDF manteniendo el diseño exacto de la plantilla
-    Usa una alternativa multiplataforma que preserve el formato
-    """
-    try:
-        # Opción 1: Usar python-docx2pdf si está disponible (requiere LibreOffice)
-        try:
-            from docx2pdf import convert
-            import tempfile
-            
-            # Crear archivo PDF temporal
-            temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            temp_pdf.close()
-            
-            # Convertir usando docx2pdf (requiere LibreOffice en Linux/macOS)
-            convert(temp_docx_path, temp_pdf.name)
-            
-            # Leer el contenido del PDF
-            with open(temp_pdf.name, 'rb') as f:
-                pdf_content = f.read()
-            
-            # Limpiar archivo temporal
-            os.remove(temp_pdf.name)
-            
-            return pdf_content
-            
-        except ImportError:
-            print("docx2pdf no disponible, usando alternativa...")
-            pass
-        except Exception as e:
-            print(f"Error con docx2pdf: {e}, usando alternativa...")
-            pass
-        
-        # Opción 2: Usar reportlab para recrear el diseño de la plantilla
-        # Esto mantiene el contenido pero con un diseño similar
-        return generar_pdf_basado_en_plantilla(temp_docx_path, qr_path)
-        
-    except Exception as e:
-        print(f"Error al convertir DOCX a PDF: {e}")
-        # Fallback: generar PDF básico con los datos correctos
-        return generar_certificado_pdf_multiplataforma(datos['nombre'], datos['carrera'], datos.get('id_certificado', 'ID'), qr_path)
-
-
-def generar_pdf_basado_en_plantilla(docx_path, qr_path):
-    """
-    Genera PDF basado en el contenido de la plantilla Word procesada
-    Extrae el contenido exacto incluyendo el nombre insertado
-    """
-    from docx import Document
-    
-    # Leer el documento Word procesado (ya contiene el nombre insertado)
-    doc = Document(docx_path)
-    
-    buffer = BytesIO()
-    pdf_doc = SimpleDocTemplate(buffer, pagesize=A4, 
-                              rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-    
-    # Crear estilos
-    styles = getSampleStyleSheet()
-    
-    # Estilo para el título principal
-    titulo_style = ParagraphStyle(
-        'TituloPersonalizado',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Times-Bold'
-    )
-    
-    # Estilo para el nombre del estudiante (Times New Roman, bold, italic)
-    nombre_style = ParagraphStyle(
-        'NombrePersonalizado',
-        parent=styles['Normal'],
-        fontSize=18,
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        fontName='Times-BoldItalic'
-    )
-    
-    # Estilo para el texto del certificado
-    texto_style = ParagraphStyle(
-        'TextoPersonalizado',
-        parent=styles['Normal'],
-        fontSize=12,
-        spaceAfter=15,
-        alignment=TA_LEFT,
-        fontName='Times-Roman'
-    )
-    
-    story = []
-
-    # Passthrough: insertar todos los párrafos tal cual (sin textos adicionales)
-    normal_style = styles['Normal']
-    for paragraph in doc.paragraphs:
-        text = paragraph.text.strip()
-        if text:
-            story.append(Paragraph(text, normal_style))
-            story.append(Spacer(1, 6))
-
-    # Agregar código QR si existe
-    if os.path.exists(qr_path):
-        try:
-            from reportlab.lib.units import inch
-            from reportlab.platypus import Image as RLImage
-            qr_image = RLImage(qr_path, width=2*inch, height=2*inch)
-            story.append(qr_image)
-        except Exception:
-            # Si no es posible agregar la imagen, se omite
-            pass
-
-    # Construir el PDF
-    pdf_doc.build(story)
-
-    # Obtener el contenido del buffer
-    pdf_content = buffer.getvalue()
-    buffer.close()
-
-    return pdf_content
-
-
-def generar_certificado_pdf_multiplataforma(nombre, carrera, id_certificado, qr_path):
-    """
-    Genera un certificado PDF usando reportlab (multiplataforma)
-    Reemplaza la conversión de Word a PDF que requiere pythoncom
-    """
-    buffer = BytesIO()
-
-    # Crear el documento PDF
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                          rightMargin=72, leftMargin=72,
-                          topMargin=72, bottomMargin=18)
-
-    # Estilos mínimos
-    styles = getSampleStyleSheet()
-    normal_style = styles['Normal']
-
-    # Contenido mínimo: sólo el nombre y el QR
-    story = []
-    try:
-        from reportlab.lib.enums import TA_CENTER
-        nombre_style = ParagraphStyle('NombrePersonalizado', parent=styles['Normal'], fontSize=18, alignment=TA_CENTER)
-    except Exception:
-        nombre_style = normal_style
-
-    # Nombre del estudiante (destacado)
-    story.append(Paragraph(nombre, nombre_style))
-    story.append(Spacer(1, 12))
-
-    # Agregar código QR si existe
-    if os.path.exists(qr_path):
-        try:
-            from reportlab.lib.units import inch
-            from reportlab.platypus import Image as RLImage
-            qr_image = RLImage(qr_path, width=2*inch, height=2*inch)
-            story.append(qr_image)
-        except Exception:
-            pass
-
-    # Construir el PDF
-    doc.build(story)
-
-    # Obtener el contenido del buffer
-    pdf_content = buffer.getvalue()
-    buffer.close()
-
-    return pdf_content
-
-
-def generar_qr(dni, nombre, carrera, codigo):
+def validar_usuario(dni, codigo=None, solo_dni=False):
     """
-    Función legada para mantener compatibilidad.
-    Usa la nueva implementación optimizada.
+    Busca al usuario en el padrón de la base de datos con una sola consulta indexada.
+    La tabla Estudiante es el padrón vigente: cada Excel subido la reemplaza.
     """
-    return generar_qr_optimizado(dni, nombre, carrera, codigo)
+    from .models import Estudiante
 
-def validar_usuario(dni, codigo=None, solo_dni=False):
-    # Ruta al archivo Excel
-    excel_path = os.path.join(settings.MEDIA_ROOT, 'plantillas', 'BD_CERTIFICADOS.xlsx')
-    
-    if not os.path.exists(excel_path):
-        return False, None
-    
     try:
-        # Cargar el archivo Excel
-        df = pd.read_excel(excel_path)
-        
-        # Convertir DNI y CODIGO a string para comparación
-        df['DNI'] = df['DNI'].astype(str)
-        df['CODIGO'] = df['CODIGO'].astype(str)
-        
-        # Buscar el usuario en el DataFrame
         if solo_dni:
-            # Si solo_dni es True, buscar solo por DNI
-            resultado = df[df['DNI'] == str(dni)]
+            consulta = Estudiante.objects.filter(dni=str(dni))
         else:
-            # Si no, buscar por DNI y CODIGO
-            resultado = df[(df['DNI'] == str(dni)) & (df['CODIGO'] == str(codigo))]
-        
-        if not resultado.empty:
-            datos = {
-                'dni': resultado['DNI'].values[0],
-                'nombre': resultado['NOMBRES'].values[0],
-                'carrera': resultado['CARRERA'].values[0],
-                'codigo': resultado['CODIGO'].values[0]
-            }
+            consulta = Estudiante.objects.filter(dni=str(dni), codigo=str(codigo))
+
+        datos = next(iter(consulta.values('dni', 'nombre', 'carrera', 'codigo')[:1]), None)
+        if datos:
             return True, datos
         else:
             return False, None
@@ -274,7 +54,7 @@ def index(request):
             return redirect('opciones_admin')
         else:
             dni = request.session.get('dni_validado')
-            valido, datos = validar_usuario(dni, None)
+            valido, datos = validar_usuario(dni, solo_dni=True)
             if valido:
                 return render(request, 'generador/confirmacion.html', {
                     'nombre': datos['nombre'],
@@ -349,36 +129,16 @@ def opciones_admin(request):
                     for chunk in excel_file.chunks():
                         destination.write(chunk)
                 
-                # Cargar los datos del Excel a la base de datos
-                from .models import CertificadoGenerado
-                df = pd.read_excel(excel_path)
-                
-                # Convertir columnas a string para evitar problemas
-                df['DNI'] = df['DNI'].astype(str)
-                df['CODIGO'] = df['CODIGO'].astype(str)
+                # Reemplazar el padrón de la base de datos por el del Excel (importación masiva)
+                resumen = importar_padron(excel_path)
                 
-                # Importar datos a la base de datos
-                registros_importados = 0
-                for _, row in df.iterrows():
-                    # Verificar si ya existe un registro con el mismo DNI y CODIGO
-                    if not CertificadoGenerado.objects.filter(dni=row['DNI'], codigo=row['CODIGO']).exists():
-                        # Generar un ID único para cada registro
-                        id_certificado = str(uuid.uuid4())
-                        # Crear URL de verificación
-                        url_verificacion = f"http://localhost:8000/verificar/{id_certificado}/"
-                        
-                        # Crear registro en la base de datos
-                        CertificadoGenerado.objects.create(
-                            id_certificado=id_certificado,
-                            codigo=row['CODIGO'],
-                            dni=row['DNI'],
-                            nombre=row['NOMBRES'],
-                            carrera=row['CARRERA'],
-                            url_verificacion=url_verificacion
-                        )
-                        registros_importados += 1
-                
-                mensaje_exito = f'Archivo cargado exitosamente. {registros_importados} registros importados a la base de datos.'
+                mensaje_exito = (
+                    f"Archivo cargado exitosamente. Padrón reemplazado: {resumen['insertadas']} estudiantes nuevos, "
+                    f"{resumen['actualizadas']} actualizados y {resumen['eliminadas']} retirados; "
+                    f"{resumen['omitidas']} filas omitidas por estar repetidas. "
+                    f"{resumen['leidas']} filas en {resumen['segundos']:.2f} s "
+                    f"({resumen['filas_por_segundo']:.0f} filas/s)."
+                )
             except Exception as e:
                 mensaje_error = f'Error al procesar el archivo: {str(e)}'
     
@@ -391,21 +151,59 @@ def listar_certificados(request):
     if not request.session.get('autenticado') or not request.session.get('es_admin'):
         return redirect('index')
     
-    from .models import CertificadoGenerado
-    from django.core.paginator import Paginator
+    # Filtros del listado (DNI, nombre y carrera) que se conservan al cambiar de página
+    filtros = {campo: request.GET.get(campo, '').strip() for campo in ('dni', 'nombre', 'carrera')}
     
-    # Obtener todos los certificados ordenados por fecha de generación (más reciente primero)
-    certificados = CertificadoGenerado.objects.all().order_by('-fecha_generacion')
+    busqueda = request.GET.get('q', '').strip()
     
-    # Configurar la paginación (10 por página)
-    paginator = Paginator(certificados, 10)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    if busqueda:
+        # Búsqueda de texto: los resultados más relevantes, sin paginar
+        pagina = {'certificados': buscar_certificados(busqueda), 'cursor_siguiente': None, 'cursor_anterior': None}
+    else:
+        # Página por cursor: del certificado más reciente al más antiguo, sin COUNT ni OFFSET
+        pagina = pagina_certificados(
+            cursor=request.GET.get('cursor'),
+            direccion=request.GET.get('direccion', SIGUIENTE),
+            **filtros
+        )
     
     return render(request, 'generador/listar_certificados.html', {
-        'page_obj': page_obj,
+        **pagina,
+        'busqueda': busqueda,
+        'filtros': filtros,
+        'filtros_query': urlencode({campo: valor for campo, valor in filtros.items() if valor}),
     })
 
+def exportar_certificados(request):
+    """
+    Exporta el registro de certificados emitidos en CSV (en streaming) o XLSX
+    (armado antes de enviarse y con un máximo de filas).
+    Filtros opcionales: desde / hasta (AAAA-MM-DD, incluidos) y carrera.
+    """
+    if not _admin_autenticado(request):
+        return redirect('index')
+    
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        return JsonResponse({'error': 'Formato no soportado'}, status=400)
+    
+    consulta = consulta_exportacion(
+        desde=leer_fecha(request.GET.get('desde')),
+        hasta=leer_fecha(request.GET.get('hasta')),
+        carrera=request.GET.get('carrera', '')
+    )
+    if formato == 'xlsx':
+        maximo = getattr(settings, 'EXPORTACION_XLSX_MAXIMO_FILAS', 100000)
+        if consulta.count() > maximo:
+            return JsonResponse({
+                'error': f'La exportación a Excel admite como máximo {maximo} certificados; '
+                         f'use el formato CSV o acote el rango de fechas'
+            }, status=413)
+    content_type, extension = FORMATOS_EXPORTACION[formato]
+    response = StreamingHttpResponse(ITERADORES_EXPORTACION[formato](consulta), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="certificados_emitidos.{extension}"'
+    return response
+
 def admin_panel(request):
     # Redirigir a opciones_admin para evitar conflictos
     return redirect('opciones_admin')
@@ -414,6 +212,10 @@ def descargar_plantilla(request):
     """
     Vista optimizada para descargar certificados
     """
+    # El motor de renderizado se importa sólo en las vistas que generan certificados,
+    # así los workers que sirven la verificación no cargan docxtpl, reportlab ni qrcode
+    from .document_utils import crear_certificado_completo
+    
     if not request.session.get('autenticado'):
         return redirect('index')
     
@@ -428,7 +230,8 @@ def descargar_plantilla(request):
     
     try:
         # Usar la nueva función optimizada para crear el certificado
-        resultado = crear_certificado_completo(datos, formato='pdf')
+        with registrar_tramos() as tramos:
+            resultado = crear_certificado_completo(datos, formato='pdf')
         
         # Preparar respuesta
         response = HttpResponse(
@@ -436,6 +239,8 @@ def descargar_plantilla(request):
             content_type=resultado['mime_type']
         )
         response['Content-Disposition'] = f'attachment; filename="{resultado["nombre_archivo"]}"'
+        # Duración de cada etapa de la emisión (visible en las herramientas del navegador)
+        response['Server-Timing'] = cabecera_server_timing(tramos)
         
         return response
             
@@ -445,15 +250,40 @@ def descargar_plantilla(request):
         })
             
 
+def _verificacion_de_la_peticion(request, id_certificado):
+    # @condition y la vista consultan el mismo ID: se resuelve una sola vez por petición
+    # (un ID inexistente no siempre queda en la caché, ver verificacion_utils)
+    if not hasattr(request, '_verificacion'):
+        request._verificacion = consultar_verificacion(id_certificado)
+    return request._verificacion
+
+def _etag_verificacion(request, id_certificado):
+    datos = _verificacion_de_la_peticion(request, id_certificado)
+    return datos['etag'] if datos else None
+
+def _ultima_modificacion_verificacion(request, id_certificado):
+    datos = _verificacion_de_la_peticion(request, id_certificado)
+    return datos['fecha_generacion'] if datos else None
+
+def _cachear_verificacion(response, encontrado):
+    # Sólo un certificado existente se puede cachear en proxies y CDN; un ID
+    # inexistente no debe quedar guardado fuera del servidor
+    if encontrado:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'VERIFICACION_CACHE_SEGUNDOS', 300))
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@require_safe
+@condition(etag_func=_etag_verificacion, last_modified_func=_ultima_modificacion_verificacion)
 def verificar_certificado(request, id_certificado):
     """
     Vista para verificar la autenticidad de un certificado mediante su ID único.
     Esta vista se accede al escanear el código QR.
+    La consulta se sirve desde la caché y las peticiones condicionales reciben 304.
     """
-    from .models import CertificadoGenerado
-    
-    # Buscar el certificado en la base de datos
-    certificado = CertificadoGenerado.objects.filter(id_certificado=id_certificado).first()
+    # Buscar el certificado (caché o base de datos)
+    certificado = _verificacion_de_la_peticion(request, id_certificado)
     
     if certificado:
         # Si el certificado existe, mostrar la información
@@ -469,18 +299,82 @@ def verificar_certificado(request, id_certificado):
             'mensaje': 'El certificado no es válido o no existe en nuestros registros.',
         }
     
-    return render(request, 'generador/verificar.html', context)
+    return _cachear_verificacion(render(request, 'generador/verificar.html', context), certificado is not None)
+
+@require_safe
+@condition(etag_func=_etag_verificacion, last_modified_func=_ultima_modificacion_verificacion)
+def verificar_certificado_json(request, id_certificado):
+    """
+    Variante JSON de la verificación para lectores de QR y otros sistemas
+    """
+    certificado = _verificacion_de_la_peticion(request, id_certificado)
+    if certificado is None:
+        response = JsonResponse({'valido': False, 'id_certificado': id_certificado}, status=404)
+    else:
+        response = JsonResponse(datos_verificacion_json(certificado))
+    return _cachear_verificacion(response, certificado is not None)
+
+@csrf_exempt
+@require_POST
+def verificar_certificados_lote(request):
+    """
+    Verificación masiva para empresas e instituciones: recibe {"ids": [...]} en JSON
+    y devuelve el estado de cada ID en el mismo orden, resuelto desde la caché o
+    con consultas id__in por bloques
+    """
+    try:
+        ids = json.loads(request.body).get('ids')
+    except (ValueError, AttributeError):
+        ids = None
+    if not isinstance(ids, list) or not all(isinstance(valor, str) for valor in ids):
+        return JsonResponse({'error': 'Se espera un objeto JSON con la lista "ids"'}, status=400)
+    
+    maximo = getattr(settings, 'VERIFICACION_LOTE_MAXIMO', 500)
+    if len(ids) > maximo:
+        return JsonResponse({'error': f'Se permiten como máximo {maximo} IDs por solicitud'}, status=413)
+    
+    resultados = [
+        datos_verificacion_json(datos) if datos else {'valido': False, 'id_certificado': id_certificado}
+        for id_certificado, datos in consultar_verificaciones(ids)
+    ]
+    return JsonResponse({'resultados': resultados}, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+def ver_pdf_certificado(request, id_certificado):
+    """
+    Muestra el PDF de un certificado emitido. Se sirve desde el almacén en disco
+    y sólo se vuelve a renderizar si el archivo fue desalojado.
+    """
+    from .models import CertificadoGenerado
+    from .document_utils import obtener_pdf_certificado
+    
+    id_certificado = normalizar_id_certificado(id_certificado)
+    certificado = id_certificado and CertificadoGenerado.objects.filter(id_certificado=id_certificado).first()
+    if not certificado:
+        raise Http404('Certificado no encontrado')
+    
+    response = HttpResponse(obtener_pdf_certificado(certificado), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="certificado_{certificado.id_certificado}.pdf"'
+    return response
 
 def generar_lote(request):
     """
     Vista optimizada para generar lotes de certificados
     """
+    from .lote_utils import (
+        generar_certificados_lote,
+        generar_certificados_lote_paralelo,
+        numero_procesos_lote,
+        escribir_zip_certificados,
+        iterar_pdf_combinado,
+        iterar_zip_certificados
+    )
+    
     if request.method != 'POST':
         return redirect('index')
     
     if 'excel_file' not in request.FILES:
         return render(request, 'generador/admin.html', {
-            'error': 'Por favor, seleccione un archivo Excel.'
+            'mensaje_error': 'Por favor, seleccione un archivo Excel.'
         })
     
     excel_file = request.FILES['excel_file']
@@ -488,59 +382,58 @@ def generar_lote(request):
     
     if cantidad <= 0:
         return render(request, 'generador/admin.html', {
-            'error': 'Por favor, ingrese una cantidad válida.'
+            'mensaje_error': 'Por favor, ingrese una cantidad válida.'
         })
     
+    # Modo de salida: 'zip' (archivo completo), 'zip_streaming' (se envía mientras se genera)
+    # o 'pdf_unico' (un solo PDF con todos los certificados, listo para imprimir)
+    salida = request.POST.get('salida', 'zip')
+    
     try:
-        # Leer el archivo Excel
-        df = pd.read_excel(excel_file)
-        df = df.head(cantidad)
-        
-        # Lista para almacenar los archivos temporales
-        temp_files = []
+        procesos = numero_procesos_lote(request.POST.get('procesos') or None)
+    except ValueError:
+        return render(request, 'generador/admin.html', {
+            'mensaje_error': 'Por favor, ingrese una cantidad de procesos válida.'
+        })
+    
+    try:
+        # Leer el archivo Excel: el encabezado se valida aquí y las filas se leen
+        # a medida que se generan los certificados, sin pasar de `cantidad`
+        filas = abrir_padron(excel_file, limite=cantidad)
         
-        # Generar certificados
-        for _, row in df.iterrows():
-            datos = {
-                'dni': str(row['DNI']),
-                'nombre': row['NOMBRES'],
-                'carrera': row['CARRERA'],
-                'codigo': str(row['CODIGO'])
-            }
-            
-            # Usar la función optimizada para crear el certificado
-            try:
-                resultado = crear_certificado_completo(datos, formato='pdf')
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-                temp_file.write(resultado['contenido'])
-                temp_file.close()
-                temp_files.append((temp_file.name, datos['nombre'], 'pdf'))
-            except Exception as e:
-                print(f"Error al generar certificado para {datos['nombre']}: {e}")
-                continue
+        if salida == 'pdf_unico':
+            response = StreamingHttpResponse(iterar_pdf_combinado(filas), content_type='application/pdf')
+            response['Content-Disposition'] = 'attachment; filename="certificados_lote.pdf"'
+            response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+            return response
         
-        # Crear ZIP en memoria
-        from io import BytesIO
-        import zipfile
+        # Filas que no se pudieron generar; se incluyen en el ZIP como errores_lote.txt
+        errores = []
+        if procesos > 1:
+            certificados = generar_certificados_lote_paralelo(filas, procesos, errores)
+        else:
+            certificados = generar_certificados_lote(filas, errores)
         
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            for temp_file, nombre, extension in temp_files:
-                try:
-                    with open(temp_file, 'rb') as f:
-                        zip_file.writestr(f'certificado_{nombre}.{extension}', f.read())
-                finally:
-                    # Limpiar archivos temporales
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
+        if salida == 'zip_streaming':
+            # Cada certificado se escribe en el ZIP en cuanto se genera
+            response = StreamingHttpResponse(
+                iterar_zip_certificados(certificados, errores),
+                content_type='application/zip'
+            )
+        else:
+            # Crear ZIP en memoria sin archivos temporales
+            zip_buffer = BytesIO()
+            with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
+                escribir_zip_certificados(zip_file, certificados, errores)
+            
+            zip_content = zip_buffer.getvalue()
+            zip_buffer.close()
+            
+            response = HttpResponse(zip_content, content_type='application/zip')
+            response['Content-Length'] = len(zip_content)
         
         # Preparar respuesta
-        zip_content = zip_buffer.getvalue()
-        zip_buffer.close()
-        
-        response = HttpResponse(zip_content, content_type='application/zip')
         response['Content-Disposition'] = 'attachment; filename="certificados_lote.zip"'
-        response['Content-Length'] = len(zip_content)
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response['Pragma'] = 'no-cache'
         response['Expires'] = '0'
@@ -549,5 +442,109 @@ def generar_lote(request):
         
     except Exception as e:
         return render(request, 'generador/admin.html', {
-            'error': f'Error al procesar el archivo: {str(e)}'
+            'mensaje_error': f'Error al procesar el archivo: {str(e)}'
         })
+
+
+def _admin_autenticado(request):
+    return request.session.get('autenticado') and request.session.get('es_admin')
+
+def encolar_lote(request):
+    """
+    Encola un lote de certificados para generarse en segundo plano
+    (worker: python manage.py procesar_lotes). Devuelve el ID del trabajo.
+    """
+    from .models import TrabajoLote
+    
+    if not _admin_autenticado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    if 'excel_file' not in request.FILES:
+        return JsonResponse({'error': 'Por favor, seleccione un archivo Excel.'}, status=400)
+    
+    try:
+        cantidad = int(request.POST.get('cantidad', 0))
+    except ValueError:
+        cantidad = 0
+    if cantidad <= 0:
+        return JsonResponse({'error': 'Por favor, ingrese una cantidad válida.'}, status=400)
+    
+    trabajo = TrabajoLote.objects.create(
+        archivo_excel=request.FILES['excel_file'],
+        cantidad=cantidad
+    )
+    
+    return JsonResponse({
+        'id_trabajo': str(trabajo.id_trabajo),
+        'estado': trabajo.estado,
+        'url_estado': reverse('estado_lote', args=[trabajo.id_trabajo]),
+    }, status=202)
+
+def estado_lote(request, id_trabajo):
+    """
+    Progreso de un trabajo de lote para consultas periódicas
+    """
+    from .models import TrabajoLote
+    
+    if not _admin_autenticado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    
+    trabajo = TrabajoLote.objects.filter(id_trabajo=id_trabajo).first()
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado'}, status=404)
+    
+    datos = {
+        'id_trabajo': str(trabajo.id_trabajo),
+        'estado': trabajo.estado,
+        'cantidad': trabajo.cantidad,
+        'total': trabajo.total,
+        'procesados': trabajo.procesados,
+        'fallidos': trabajo.fallidos,
+        'porcentaje': round(100 * (trabajo.procesados + trabajo.fallidos) / trabajo.total, 1) if trabajo.total else 0,
+        'error': trabajo.mensaje_error,
+        'fecha_creacion': trabajo.fecha_creacion.isoformat(),
+        'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
+    if trabajo.estado == TrabajoLote.COMPLETADO:
+        datos['url_descarga'] = reverse('descargar_lote', args=[trabajo.id_trabajo])
+    return JsonResponse(datos)
+
+def descargar_lote(request, id_trabajo):
+    """
+    Descarga el ZIP de un trabajo de lote ya completado
+    """
+    from .models import TrabajoLote
+    
+    if not _admin_autenticado(request):
+        return redirect('index')
+    
+    trabajo = TrabajoLote.objects.filter(id_trabajo=id_trabajo).first()
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado'}, status=404)
+    if trabajo.estado != TrabajoLote.COMPLETADO or not trabajo.archivo_resultado:
+        return JsonResponse({'error': 'El lote aún no está listo', 'estado': trabajo.estado}, status=409)
+    
+    ruta = os.path.join(settings.MEDIA_ROOT, trabajo.archivo_resultado)
+    if not os.path.exists(ruta):
+        return JsonResponse({'error': 'El archivo del lote ya no está disponible'}, status=410)
+    
+    return FileResponse(
+        open(ruta, 'rb'),
+        as_attachment=True,
+        filename=f'certificados_lote_{trabajo.id_trabajo}.zip',
+        content_type='application/zip'
+    )
+
+
+@require_safe
+def metricas(request):
+    """
+    Histogramas de duración por etapa y motor en formato de texto de Prometheus.
+    Sólo se sirven a las direcciones de settings.METRICAS_IPS_PERMITIDAS.
+    """
+    permitidas = getattr(settings, 'METRICAS_IPS_PERMITIDAS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in permitidas:
+        return HttpResponse(status=403)
+    return HttpResponse(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,36 @@
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio del proyecto):
+
+    gunicorn certificados.wsgi
+
+Con preload_app la aplicación Django se importa una sola vez en el proceso maestro
+y los workers la heredan al hacer fork, compartiendo esa memoria. Si además
+CERTIFICADOS_PRECALENTAR=true, la plantilla, las fuentes y el motor de renderizado
+también se cargan antes del fork (ver GeneradorConfig.ready).
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+
+preload_app = True
+
+# La conversión DOCX → PDF de un certificado puede tardar varios segundos
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de vez en cuando acota el crecimiento de memoria de reportlab y lxml
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el maestro durante la precarga no deben compartirse entre workers
+    from django.db import connections
+    connections.close_all()